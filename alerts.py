@@ -0,0 +1,272 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+from config import get_token, get_chat_id, has_telegram_config
+
+
+class TTLCache:
+    """Muddati o'tgan yozuvlarni o'zi o'chiradigan cheklangan kesh"""
+
+    def __init__(self, ttl=600.0, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.items = OrderedDict()
+
+    def _evict(self, now):
+        while self.items:
+            key, expires = next(iter(self.items.items()))
+            if expires > now and len(self.items) <= self.max_size:
+                break
+            self.items.popitem(last=False)
+
+    def add(self, key, now=None):
+        now = now or time.monotonic()
+        self.items.pop(key, None)
+        self.items[key] = now + self.ttl
+        self._evict(now)
+
+    def __contains__(self, key):
+        now = time.monotonic()
+        self._evict(now)
+        expires = self.items.get(key)
+        return expires is not None and expires > now
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Alert:
+    def __init__(self, stream_id, class_name, tracker_id, frame):
+        self.stream_id = stream_id
+        self.class_name = class_name
+        self.tracker_id = tracker_id
+        self.frame = frame
+        self.created_at = time.time()
+        self.image = None
+
+    @property
+    def caption(self):
+        track = f", ID:{self.tracker_id}" if self.tracker_id is not None else ""
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.created_at))
+        return f"⚠️ {self.class_name} (kamera {self.stream_id}{track}) {when}"
+
+
+class TelegramSink:
+    """Ogohlantirishlarni Telegramga yuborish: bitta rasm yoki album"""
+
+    def __init__(self, token, chat_id):
+        from telegram import Bot
+
+        self.bot = Bot(token=token)
+        self.chat_id = chat_id
+        # Bot so'rovlari faqat dispatcher threadidagi shu event loopda bajariladi
+        self.loop = asyncio.new_event_loop()
+
+    def send(self, alerts):
+        self.loop.run_until_complete(self._send(alerts))
+
+    async def _send(self, alerts):
+        if len(alerts) == 1:
+            await self.bot.send_photo(chat_id=self.chat_id, photo=alerts[0].image, caption=alerts[0].caption)
+            return
+
+        from telegram import InputMediaPhoto
+
+        media = [InputMediaPhoto(alert.image, caption=alert.caption) for alert in alerts]
+        await self.bot.send_media_group(chat_id=self.chat_id, media=media)
+
+    def close(self):
+        self.loop.close()
+
+
+class HttpSink:
+    """Ogohlantirishlarni HTTP POST (multipart) orqali yuborish - test va lokal integratsiyalar uchun"""
+
+    def __init__(self, url, timeout=10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts):
+        import requests
+
+        files = [
+            ('photos', (f"alert_{i}.jpg", alert.image, 'image/jpeg'))
+            for i, alert in enumerate(alerts)
+        ]
+        data = {'captions': [alert.caption for alert in alerts]}
+        response = requests.post(self.url, files=files, data=data, timeout=self.timeout)
+        response.raise_for_status()
+
+    def close(self):
+        pass
+
+
+class AlertDispatcher:
+    """Video pipeline ni to'xtatmasdan ogohlantirish yuborish: navbat, birlashtirish, cooldown, retry"""
+
+    def __init__(self, sink, queue_size=32, cooldown=30.0, dedup_ttl=600.0, batch_window=2.0,
+                 max_batch=10, max_retries=3, backoff=1.0, jpeg_quality=85, listeners=()):
+        # sink None bo'lsa ogohlantirishlar faqat tinglovchilarga (masalan, WebSocket) beriladi
+        self.sink = sink
+        # listener(alerts) - rasm kodlangandan keyin darhol, batch oynasini kutmasdan chaqiriladi
+        self.listeners = list(listeners)
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Bir xil class uchun ogohlantirishlar orasidagi minimal vaqt (soniya)
+        self.cooldown = cooldown
+        self.seen_tracks = TTLCache(ttl=dedup_ttl)
+        self.last_sent = {}
+        # Shu oyna ichida kelgan ogohlantirishlar bitta albumga yig'iladi
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.jpeg_quality = jpeg_quality
+
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+        # Statistika
+        self.enqueued = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name="alert-dispatcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.running = False
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+            self.thread = None
+        if self.sink is not None:
+            self.sink.close()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def notify(self, stream_id, class_name, tracker_id, frame):
+        """Hot pathdan chaqiriladi: bloklanmaydi, kerak bo'lmasa darhol qaytadi"""
+        now = time.monotonic()
+        with self.lock:
+            if tracker_id is not None and (stream_id, class_name, tracker_id) in self.seen_tracks:
+                return False
+            last = self.last_sent.get((stream_id, class_name))
+            if last is not None and now - last < self.cooldown:
+                self.suppressed += 1
+                return False
+
+            try:
+                self.queue.put_nowait(Alert(stream_id, class_name, tracker_id, frame.copy()))
+            except queue.Full:
+                self.dropped += 1
+                return False
+
+            self.last_sent[(stream_id, class_name)] = now
+            if tracker_id is not None:
+                self.seen_tracks.add((stream_id, class_name, tracker_id), now)
+            self.enqueued += 1
+        return True
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                alert = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if alert is None:
+                self.running = False
+                break
+            batch.append(alert)
+        return batch
+
+    def _send_with_retry(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.send(batch)
+                self.sent += len(batch)
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Ogohlantirish yuborilmadi: {e}")
+                    break
+                # Telegram RetryAfter bo'lsa ko'rsatilgan vaqtni kutish
+                delay = getattr(e, 'retry_after', None) or self.backoff * (2 ** attempt)
+                if hasattr(delay, 'total_seconds'):
+                    delay = delay.total_seconds()
+                print(f"Ogohlantirish xatolik ({attempt + 1}-urinish), {delay:.1f}s dan keyin qayta: {e}")
+                time.sleep(delay)
+        self.failed += len(batch)
+        return False
+
+    def _prepare(self, alerts):
+        # JPEG kodlash ham pipeline threadidan tashqarida
+        for alert in alerts:
+            ok, buffer = cv2.imencode('.jpg', alert.frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            alert.image = buffer.tobytes() if ok else b''
+            alert.frame = None
+            print(f"Ogohlantirish: {alert.class_name}, Tracker ID: {alert.tracker_id}")
+        for listener in self.listeners:
+            try:
+                listener(alerts)
+            except Exception as e:
+                print(f"Ogohlantirish tinglovchisi xatolik: {e}")
+
+    def _worker(self):
+        while self.running:
+            try:
+                first = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if first is None:
+                continue
+
+            # Jonli tinglovchilar birinchi ogohlantirishni album yig'ilishini kutmasdan oladi
+            self._prepare([first])
+            if self.sink is None:
+                continue
+            batch = self._collect(first)
+            self._prepare(batch[1:])
+            self._send_with_retry(batch)
+
+    def get_stats(self):
+        return {
+            'enqueued': self.enqueued,
+            'suppressed': self.suppressed,
+            'dropped': self.dropped,
+            'sent': self.sent,
+            'failed': self.failed,
+            'queued': self.queue.qsize(),
+            'tracked_ids': len(self.seen_tracks),
+        }
+
+
+def create_alert_dispatcher(sink=None, listeners=(), **options):
+    """sink (berilmasa .env da sozlangan Telegram) va tinglovchilar uchun dispatcher; ikkisi ham bo'lmasa None"""
+    if sink is None and has_telegram_config():
+        sink = TelegramSink(get_token(), get_chat_id())
+    if sink is None and not listeners:
+        print("Telegram sozlanmagan - ogohlantirishlar o'chirilgan")
+        return None
+    return AlertDispatcher(sink, listeners=listeners, **options).start()
@@ -1,18 +1,73 @@
-from flask import Flask, Response, render_template, request, jsonify
-import tracking
+from flask import Flask, Response, render_template, request, jsonify, send_file
+from pipeline import PipelineManager
+from offline import OfflineEngine
+from jobs import JobStore, JobQueue
+from result_cache import ResultCache
+from config import get_cache_max_bytes
+from uploads import UploadManager, GrowingFileCapture, OffsetMismatch
+from alerts import create_alert_dispatcher
+from metrics import REGISTRY
+from encoder import TIERS
 import os
 from werkzeug.utils import secure_filename
 import threading
 
 app = Flask(__name__)
 
+# Bu server bitta asosiy oqim bilan ishlaydi (kamera yoki yuklangan video)
+MAIN_STREAM = 'main'
+
 # Video yuklash uchun papka
 UPLOAD_FOLDER = 'uploads'
+# Offline qayta ishlash natijalari (annotatsiyalangan video + detections)
+OUTPUT_FOLDER = 'outputs'
+# Job navbati shu SQLite faylda - server qayta ishga tushsa ham saqlanadi
+JOBS_DB = 'jobs.db'
+# Natijalar keshi: video mazmuni + og'irliklar + parametrlar bo'yicha
+CACHE_FOLDER = 'cache'
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm', 'flv', 'wmv'}
 
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB limit
+# Bo'laklab yuklashda har bir so'rov MAX_CONTENT_LENGTH dan kichik, butun fayl esa shu chegarada
+MAX_UPLOAD_SIZE = 5 * 1024 ** 3
+# Oqimli konteynerda shuncha bayt kelgach jonli tahlil boshlanadi
+EARLY_START_BYTES = 2 * 1024 * 1024
+# python app.py debug reloader bilan ishlaydi: kuzatuvchi jarayon serverni bola jarayonda qayta ochadi
+USE_RELOADER = True
+
+# Servislar create_services() da yaratiladi. OfflineEngine ning spawn workerlari ishga tushirilgan
+# skriptni __mp_main__ sifatida qayta import qiladi - ularda PipelineManager, Telegram dispatcher,
+# SQLite bazalar va papkalar yaratilmasligi kerak, workerlarga faqat offline moduli kerak
+pipeline_manager = None
+offline_engine = None
+result_cache = None
+job_queue = None
+upload_manager = None
+
+def create_services():
+    """Server obyektlarini bir marta yaratish"""
+    global pipeline_manager, offline_engine, result_cache, job_queue, upload_manager
+    if pipeline_manager is not None:
+        return
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    pipeline_manager = PipelineManager(alert_dispatcher=create_alert_dispatcher())
+    REGISTRY.register_collector(pipeline_manager.collect_metrics)
+    # Yuklangan videolarni jonli oqimdan tashqari, jarayonlar pulida to'liq qayta ishlash
+    offline_engine = OfflineEngine(output_folder=OUTPUT_FOLDER)
+    result_cache = ResultCache(CACHE_FOLDER, max_bytes=get_cache_max_bytes())
+    job_queue = JobQueue(offline_engine, JobStore(JOBS_DB), cache=result_cache)
+    upload_manager = UploadManager(UPLOAD_FOLDER, max_size=MAX_UPLOAD_SIZE)
+    # Navbat so'rovlarga xizmat qiladigan jarayonda ishlaydi (reloadersiz, ASGI yoki reloader bolasi)
+    if not is_reloader_parent():
+        job_queue.start()
+
+def is_reloader_parent():
+    """Reloaderning kuzatuvchi jarayoni so'rovlarga xizmat qilmaydi - unda navbat ikkinchi marta ochilmaydi"""
+    return __name__ == '__main__' and USE_RELOADER and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+if __name__ != '__mp_main__':
+    create_services()
 
 def allowed_file(filename):
     """Fayl formatini tekshirish"""
@@ -27,7 +82,16 @@ def index():
 def video_feed():
     """Video stream - kamera yoki yuklangan video"""
     try:
-        return Response(tracking.generate_frames(), 
+        processor = pipeline_manager.get_stream(MAIN_STREAM)
+        if processor is None:
+            return jsonify({'status': 'error', 'message': 'Oqim ishga tushirilmagan'}), 404
+        # ?overlay=0 - chizilmagan kadr + X-Detections sarlavhasida boxlar (mijoz o'zi chizadi)
+        overlay = request.args.get('overlay', '1') != '0'
+        # ?tier=w640 (kenglik 640) yoki thumb (kenglik 320) - kichik o'lcham (mobil ko'rinish)
+        tier = request.args.get('tier', 'full')
+        if tier not in TIERS:
+            return jsonify({'status': 'error', 'message': f"Noma'lum tier: {tier}"}), 400
+        return Response(processor.generate_frames(overlay=overlay, tier=tier), 
                        mimetype='multipart/x-mixed-replace; boundary=frame')
     except Exception as e:
         print(f"Video feed xatolik: {e}")
@@ -38,7 +102,8 @@ def start_camera():
     """Kamerani ishga tushirish"""
     try:
         # Kamera index 0 dan boshlash
-        tracking.set_video(0)
+        if pipeline_manager.add_stream(MAIN_STREAM, 0) is None:
+            raise RuntimeError('Kamera ochilmadi')
         
         return jsonify({
             'status': 'success', 
@@ -54,6 +119,37 @@ def start_camera():
             'message': f'Xatolik: {str(e)}'
         }), 500
 
+def start_processing(filepath, filename, mode):
+    """Saqlangan videoni keshdan berish, navbatga qo'yish yoki jonli oqimda ochish"""
+    cached = job_queue.is_cached(filepath)
+    
+    # mode=offline - jonli ko'rsatishsiz, bo'laklab to'liq tezlikda qayta ishlash.
+    # Avval ishlangan video esa darhol keshdan beriladi
+    if mode == 'offline' or cached:
+        return {
+            'status': 'success',
+            'message': 'Natija keshdan olindi' if cached else 'Video yuklandi, offline qayta ishlash navbatga qo\'yildi',
+            'filename': filename,
+            'job': job_queue.submit(filepath),
+            'cached': cached,
+            'source': 'offline'
+        }, 200
+    
+    # Videoni qayta ishlashni boshlash
+    if pipeline_manager.add_stream(MAIN_STREAM, filepath) is None:
+        return {
+            'status': 'error',
+            'message': 'Videoni ochib bo\'lmadi'
+        }, 500
+    
+    return {
+        'status': 'success', 
+        'message': 'Video yuklandi va qayta ishlanmoqda',
+        'filename': filename,
+        'filepath': filepath,
+        'source': 'file'
+    }, 200
+
 @app.route('/upload_video', methods=['POST'])
 def upload_video():
     """Video yuklash va qayta ishlashni boshlash"""
@@ -96,16 +192,10 @@ def upload_video():
                 'message': 'Video saqlashda xatolik'
             }), 500
         
-        # Videoni qayta ishlashni boshlash
-        tracking.set_video(filepath)
-        
-        return jsonify({
-            'status': 'success', 
-            'message': 'Video yuklandi va qayta ishlanmoqda',
-            'filename': filename,
-            'filepath': filepath,
-            'source': 'file'
-        })
+        # Xesh bir marta hisoblanadi va eslab qolinadi
+        result_cache.file_hash(filepath)
+        body, code = start_processing(filepath, filename, request.form.get('mode'))
+        return jsonify(body), code
     
     except Exception as e:
         print(f"Upload xatolik: {e}")
@@ -116,11 +206,174 @@ def upload_video():
             'message': f'Xatolik: {str(e)}'
         }), 500
 
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """Bo'laklab yuklashni boshlash: {filename, size, mode}"""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename', ''))
+    size = data.get('size')
+    
+    if not filename or not allowed_file(filename):
+        return jsonify({
+            'status': 'error',
+            'message': f'Noto\'g\'ri fayl formati. Ruxsat etilgan: {", ".join(ALLOWED_EXTENSIONS)}'
+        }), 400
+    if size is not None and (not isinstance(size, int) or size <= 0 or size > MAX_UPLOAD_SIZE):
+        return jsonify({
+            'status': 'error',
+            'message': f'Noto\'g\'ri fayl hajmi. Maksimal: {MAX_UPLOAD_SIZE // (1024 ** 3)}GB'
+        }), 400
+    
+    session = upload_manager.create(filename, size=size, mode=data.get('mode', 'live'))
+    return jsonify({'status': 'success', 'upload': session.get_status()})
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Yuklash holati - uzilgan yuklash shu offsetdan davom ettiriladi"""
+    session = upload_manager.get(upload_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'Yuklash topilmadi'}), 404
+    return jsonify({'status': 'success', 'upload': session.get_status()})
+
+def start_growing_stream(session):
+    """Yuklanayotgan faylni jonli oqimda ochish. Fayl hali ochilmasa (masalan, moov katta) asosiy oqimga
+    tegilmaydi, capture yopiladi va keyingi urinish yangi baytlar kelgandan keyin"""
+    cap = GrowingFileCapture(session)
+    if not cap.isOpened():
+        cap.release()
+        session.stream_failed_offset = session.offset
+        return False
+    if pipeline_manager.add_stream(MAIN_STREAM, session.final_path, cap=cap) is None:
+        session.stream_failed_offset = session.offset
+        return False
+    session.stream_started = True
+    print(f"Yuklash davom etmoqda, tahlil boshlandi: {session.filename}")
+    return True
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Navbatdagi bo'lak: tana to'g'ridan-to'g'ri diskka yoziladi (Upload-Offset sarlavhasi)"""
+    session = upload_manager.get(upload_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'Yuklash topilmadi'}), 404
+    
+    offset = request.headers.get('Upload-Offset', request.args.get('offset', '0'))
+    try:
+        session.write(request.stream, int(offset))
+    except OffsetMismatch as e:
+        return jsonify({
+            'status': 'error',
+            'message': 'Offset mos emas',
+            'offset': e.expected
+        }), 409
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    # Oqimli konteynerlarda tahlil yuklash tugashini kutmaydi
+    if (session.mode == 'live' and not session.stream_started and session.offset >= EARLY_START_BYTES
+            and session.offset != session.stream_failed_offset and session.is_streamable()):
+        start_growing_stream(session)
+    
+    return jsonify({'status': 'success', 'upload': session.get_status()})
+
+@app.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """Yuklashni yakunlash va qayta ishlashni boshlash"""
+    session = upload_manager.get(upload_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'Yuklash topilmadi'}), 404
+    
+    try:
+        content_hash = session.finish()
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e), 'upload': session.get_status()}), 409
+    upload_manager.remove(upload_id)
+    # Yuklash paytida hisoblangan xesh - fayl qayta o'qilmaydi
+    result_cache.remember_hash(session.final_path, content_hash)
+    
+    if session.stream_started:
+        return jsonify({
+            'status': 'success',
+            'message': 'Video yuklandi va qayta ishlanmoqda',
+            'filename': session.filename,
+            'upload': session.get_status(),
+            'source': 'file'
+        })
+    
+    body, code = start_processing(session.final_path, session.filename, session.mode)
+    body['upload'] = session.get_status()
+    return jsonify(body), code
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    """Tugallanmagan yuklashni bekor qilish"""
+    session = upload_manager.get(upload_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'Yuklash topilmadi'}), 404
+    session.abort()
+    upload_manager.remove(upload_id)
+    return jsonify({'status': 'success', 'message': 'Yuklash bekor qilindi'})
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Avval yuklangan videoni navbatga qo'yish"""
+    data = request.get_json(silent=True) or {}
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(data.get('filename', '')))
+    
+    if not os.path.isfile(filepath) or not allowed_file(filepath):
+        return jsonify({
+            'status': 'error',
+            'message': 'Fayl topilmadi'
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'job': job_queue.submit(filepath)
+    })
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Joblar ro'yxati (?status=queued|running|done|failed|cancelled)"""
+    return jsonify({
+        'status': 'success',
+        'jobs': job_queue.list(status=request.args.get('status'))
+    })
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job holati va progressi"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job topilmadi'}), 404
+    return jsonify({'status': 'success', 'job': job})
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Jobni bekor qilish"""
+    if not job_queue.cancel(job_id):
+        return jsonify({'status': 'error', 'message': 'Job topilmadi yoki allaqachon tugagan'}), 404
+    return jsonify({'status': 'success', 'message': 'Job bekor qilinmoqda'})
+
+@app.route('/jobs/<job_id>/download/<kind>', methods=['GET'])
+def download_job_result(job_id, kind):
+    """Natijani yuklab olish: video yoki detections"""
+    job = job_queue.get(job_id)
+    if job is None or job['status'] != 'done':
+        return jsonify({'status': 'error', 'message': 'Natija tayyor emas'}), 404
+    
+    paths = {'video': job['output_video'], 'detections': job['output_detections'], 'summary': job['output_summary']}
+    if kind not in paths:
+        return jsonify({'status': 'error', 'message': 'Noma\'lum natija turi'}), 400
+    if not paths[kind] or not os.path.exists(paths[kind]):
+        # Kesh yozuvi LRU bo'yicha o'chirilgan bo'lishi mumkin
+        return jsonify({'status': 'error', 'message': 'Natija fayli topilmadi'}), 404
+    return send_file(os.path.abspath(paths[kind]), as_attachment=True)
+
 @app.route('/stop_video', methods=['POST'])
 def stop_video():
     """Videoni to'xtatish"""
     try:
-        tracking.stop_video()
+        pipeline_manager.remove_stream(MAIN_STREAM)
         return jsonify({
             'status': 'success', 
             'message': 'Video qayta ishlash to\'xtatildi'
@@ -132,12 +385,18 @@ def stop_video():
             'message': str(e)
         }), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus uchun bosqichlar kechikishi, navbatlar va tomoshabinlar"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/check_status', methods=['GET'])
 def check_status():
     """Video qayta ishlash holatini tekshirish"""
     try:
-        is_active = tracking.processing_active
-        current_video = tracking.current_video
+        processor = pipeline_manager.get_stream(MAIN_STREAM)
+        is_active = processor.processing_active if processor is not None else False
+        current_video = processor.current_source if processor is not None else None
         
         # Agar current_video 0 bo'lsa, bu kamera ekanligini ko'rsatish
         source_type = 'camera' if current_video == 0 else 'file' if current_video else None
@@ -167,12 +426,14 @@ def uploaded_videos():
                     videos.append({
                         'filename': filename,
                         'size': size,
-                        'size_mb': round(size / (1024 * 1024), 2)
+                        'size_mb': round(size / (1024 * 1024), 2),
+                        'cached': job_queue.is_cached(filepath)
                     })
         
         return jsonify({
             'status': 'success',
-            'videos': videos
+            'videos': videos,
+            'cache': result_cache.get_stats()
         })
     except Exception as e:
         return jsonify({
@@ -227,4 +488,4 @@ if __name__ == '__main__':
     print("📡 Lokal: http://localhost:5000")
     print("📹 Kamera index: 0")
     print("=" * 50)
-    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True, use_reloader=USE_RELOADER)
\ No newline at end of file
@@ -0,0 +1,221 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+
+from encoder import TIERS, mjpeg_part
+
+# Production rejimi: bitta event loop barcha MJPEG tomoshabinlarga xizmat qiladi.
+#   uvicorn --factory asgi:create_dashboard_app --host 0.0.0.0 --port 5000   (flask_app.py)
+#   uvicorn --factory asgi:create_upload_app --host 0.0.0.0 --port 5000      (app.py)
+#   python asgi.py dashboard --port 5000
+# Oqim endpointlari async generatorlar (FrameHub.subscribe_async), qolgan Flask routelari a2wsgi
+# (WSGIMiddleware) orqali cheklangan threadlar pulida. Inference, kodlash va capture avvalgidek o'z
+# threadlarida - loop faqat I/O qiladi.
+# Socket.IO (dashboard) python-socketio AsyncServer da, live.AsyncLiveChannel orqali - long-polling
+# so'rovlari ham API threadlarini band qilmaydi.
+
+# Flask (API) so'rovlari uchun threadlar - tomoshabinlar soniga bog'liq emas
+API_WORKERS = 16
+SOCKETIO_PATH = '/socket.io/'
+STREAM_HEADERS = [
+    (b'content-type', b'multipart/x-mixed-replace; boundary=frame'),
+    (b'cache-control', b'no-cache, no-store'),
+]
+
+
+async def send_json(send, status, body):
+    payload = json.dumps(body).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+def terminated_input(wsgi_app):
+    """ASGI server so'rov tanasini o'zi ajratib beradi (chunked ham) - oqim oxiri har doim ma'lum.
+    wsgi.input_terminated bo'lmasa Werkzeug Content-Length siz (chunked) tanani bo'sh deb o'qiydi"""
+    def app(environ, start_response):
+        environ['wsgi.input_terminated'] = True
+        return wsgi_app(environ, start_response)
+    return app
+
+
+class StreamingASGI:
+    """MJPEG oqimlari event loopda, qolgan so'rovlar WSGI (Flask) ilovasiga a2wsgi threadlar pulida"""
+
+    def __init__(self, wsgi_app, resolve_stream, socketio_app=None, api_workers=API_WORKERS,
+                 on_startup=(), on_shutdown=()):
+        self.wsgi_app = WSGIMiddleware(terminated_input(wsgi_app), workers=api_workers)
+        # /socket.io/ so'rovlari (ASGI ilova); None bo'lsa rad etiladi va mijoz MJPEG ga qaytadi
+        self.socketio_app = socketio_app
+        # resolve_stream(path) -> None (oqim emas) yoki processor / False (oqim topilmadi)
+        self.resolve_stream = resolve_stream
+        self.on_startup = list(on_startup)
+        self.on_shutdown = list(on_shutdown)
+        # Statistika
+        self.viewers = 0
+        self.api_requests = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['path'].startswith(SOCKETIO_PATH):
+            await self.socketio(scope, receive, send)
+        elif scope['type'] == 'http':
+            processor = self.resolve_stream(scope['path']) if scope['method'] == 'GET' else None
+            if processor is None:
+                self.api_requests += 1
+                await self.wsgi_app(scope, receive, send)
+            elif processor is False:
+                await send_json(send, 404, {'status': 'error', 'message': 'Oqim topilmadi'})
+            else:
+                await self.stream(scope, receive, send, processor)
+        elif scope['type'] == 'websocket':
+            await receive()
+            await send({'type': 'websocket.close', 'code': 1000})
+
+    async def socketio(self, scope, receive, send):
+        if self.socketio_app is not None:
+            await self.socketio_app(scope, receive, send)
+        elif scope['type'] == 'http':
+            # WSGI ga o'tkazilmaydi: Flask-SocketIO threading rejimidagi long-polling API threadlarini band qiladi
+            await send_json(send, 404, {'status': 'error', 'message': 'Socket.IO bu rejimda mavjud emas'})
+        else:
+            await receive()
+            await send({'type': 'websocket.close', 'code': 1000})
+
+    async def lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                for callback in self.on_startup:
+                    await loop.run_in_executor(None, callback)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for callback in self.on_shutdown:
+                    try:
+                        await loop.run_in_executor(None, callback)
+                    except Exception as e:
+                        print(f"To'xtatishda xatolik: {e}")
+                self.wsgi_app.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def stream(self, scope, receive, send, processor):
+        """MJPEG tomoshabin: thread ajratilmaydi, kadrlar FrameHub dan loopga keladi"""
+        query = parse_qs(scope['query_string'].decode('latin-1'))
+        overlay = query.get('overlay', ['1'])[0] != '0'
+        tier = query.get('tier', ['full'])[0]
+        if tier not in TIERS:
+            await send_json(send, 400, {'status': 'error', 'message': f"Noma'lum tier: {tier}"})
+            return
+        if processor.current_source is None:
+            await send_json(send, 404, {'status': 'error', 'message': 'Manba tanlanmagan'})
+            return
+
+        loop = asyncio.get_running_loop()
+        processor.start_producer()
+        hub = processor.hub if overlay else processor.raw_hub
+        subscriber = hub.subscribe_async(loop, tier=tier)
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        self.viewers += 1
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': STREAM_HEADERS})
+            while not subscriber.closed and not disconnected.done():
+                item = await subscriber.get(timeout=1.0)
+                if item is None:
+                    continue
+                jpeg, metadata = item
+                headers = b'X-Detections: ' + metadata + b'\r\n' if not overlay and metadata else b''
+                await send({'type': 'http.response.body', 'body': mjpeg_part(jpeg, headers), 'more_body': True})
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        except OSError:
+            # Mijoz uzilib qoldi
+            pass
+        finally:
+            self.viewers -= 1
+            disconnected.cancel()
+            hub.unsubscribe(subscriber)
+
+    async def wait_disconnect(self, receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    def get_stats(self):
+        return {'viewers': self.viewers, 'api_requests': self.api_requests}
+
+
+def create_dashboard_app():
+    """flask_app.py: /streams/<id>/video_feed va Socket.IO (AsyncServer)"""
+    import socketio
+    import flask_app
+    from live import AsyncLiveChannel
+
+    pattern = re.compile(r'^/streams/([^/]+)/video_feed$')
+
+    def resolve_stream(path):
+        match = pattern.match(path)
+        if match is None:
+            return None
+        return flask_app.pipeline_manager.get_stream(match.group(1)) or False
+
+    sio = socketio.AsyncServer(async_mode='asgi')
+    # Ogohlantirishlar tinglovchisi va /live_stats shu kanalga o'tadi
+    flask_app.live_channel = AsyncLiveChannel(sio, flask_app.pipeline_manager)
+    return StreamingASGI(
+        flask_app.app,
+        resolve_stream,
+        socketio_app=socketio.ASGIApp(sio, socketio_path=SOCKETIO_PATH.strip('/')),
+        on_shutdown=[flask_app.pipeline_manager.stop_all, flask_app.event_store.stop]
+    )
+
+
+def create_upload_app():
+    """app.py: /video_feed (asosiy oqim); offline navbat import paytida shu jarayonda ishga tushadi"""
+    import app
+
+    def resolve_stream(path):
+        if path != '/video_feed':
+            return None
+        return app.pipeline_manager.get_stream(app.MAIN_STREAM) or False
+
+    return StreamingASGI(
+        app.app,
+        resolve_stream,
+        on_shutdown=[app.pipeline_manager.stop_all, app.job_queue.stop]
+    )
+
+
+APPS = {
+    'dashboard': 'asgi:create_dashboard_app',
+    'upload': 'asgi:create_upload_app',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASGI (uvicorn) rejimida ishga tushirish")
+    parser.add_argument("app", choices=list(APPS), help="dashboard (flask_app.py) yoki upload (app.py)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv('PORT', 5000)))
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("ASGI rejimi uchun uvicorn kerak: pip install uvicorn")
+    # Bitta worker: modellar, oqimlar va navbatlar jarayon ichida bitta nusxada
+    uvicorn.run(APPS[args.app], factory=True, host=args.host, port=args.port, workers=1, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
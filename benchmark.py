@@ -0,0 +1,433 @@
+import argparse
+import importlib
+import json
+import os
+import resource
+import sys
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+# Pipeline ni ekransiz (headless) o'lchash: video fayl yoki sintetik kadrlar
+# VideoProcessor (flask_app/app.py) yoki camera-tracking.py dagi uch modelli pipeline orqali o'tkaziladi.
+# Natija JSON: o'tkazuvchanlik, bosqichlar bo'yicha p50/p95/p99, eng yuqori RSS va CPU.
+# --baseline berilsa natija saqlangan baseline bilan solishtiriladi va regressiyada exit code 1.
+# --postprocess: modelsiz, detectiondan keyingi bosqichlar 1/50/500 box uchun (micro-benchmark).
+
+PERCENTILES = (50, 95, 99)
+# Shundan qisqa bosqichlarda foizli o'zgarish shovqin hisoblanadi
+MIN_STAGE_MS = 1.0
+
+
+class StageRecorder:
+    """Har bir bosqich kechikishini to'liq saqlash; VideoProcessor ga controller sifatida beriladi"""
+
+    def __init__(self, imgsz=640, warmup=10):
+        self.imgsz = imgsz
+        # Birinchi kadrlar (model isishi) statistikaga kirmaydi
+        self.warmup = warmup
+        self.samples = defaultdict(list)
+        self.frames = 0
+        self.frame_start = None
+        self.first_frame_at = None
+        self.last_frame_at = None
+
+    # LatencyController interfeysi: sifat o'zgarmaydi, faqat o'lchanadi
+    def reset(self):
+        pass
+
+    def should_detect(self):
+        return True
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+
+    def record(self, stage, seconds):
+        if self.frames >= self.warmup:
+            self.samples[stage].append(seconds)
+
+    def end_frame(self, detected):
+        now = time.perf_counter()
+        self.record('frame', now - self.frame_start)
+        self.frames += 1
+        if self.frames == self.warmup:
+            self.first_frame_at = now
+        self.last_frame_at = now
+
+    def get_status(self):
+        return {'frames': self.frames, 'imgsz': self.imgsz}
+
+    def throughput(self):
+        measured = self.frames - self.warmup
+        if measured <= 0 or self.first_frame_at is None or self.last_frame_at <= self.first_frame_at:
+            return 0.0
+        return measured / (self.last_frame_at - self.first_frame_at)
+
+    def summary(self):
+        stages = {}
+        for stage, values in self.samples.items():
+            values = np.array(values) * 1000
+            stages[stage] = {
+                'count': len(values),
+                'mean_ms': round(float(values.mean()), 3),
+                **{f'p{q}_ms': round(float(np.percentile(values, q)), 3) for q in PERCENTILES},
+            }
+        return stages
+
+
+class SyntheticCapture:
+    """Takrorlanuvchi sintetik video: shovqinli fon ustida harakatlanuvchi to'rtburchaklar"""
+
+    def __init__(self, frames=300, width=1280, height=720, fps=30, objects=8, seed=0):
+        self.frames = frames
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.position = 0
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        self.background = cv2.GaussianBlur(self.background, (0, 0), 3)
+        # (x, y, w, h, dx, dy, rang)
+        self.objects = [
+            (
+                rng.uniform(0, width), rng.uniform(0, height),
+                rng.integers(40, 160), rng.integers(80, 240),
+                rng.uniform(-6, 6), rng.uniform(-4, 4),
+                tuple(int(c) for c in rng.integers(0, 256, 3))
+            )
+            for _ in range(objects)
+        ]
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.frames
+        return 0
+
+    def set(self, prop, value):
+        return False
+
+    def read(self):
+        if not self.opened or self.position >= self.frames:
+            return False, None
+        frame = self.background.copy()
+        for x, y, w, h, dx, dy, color in self.objects:
+            # Chegaradan qaytib harakatlanish
+            px = int(abs((x + dx * self.position) % (2 * self.width) - self.width))
+            py = int(abs((y + dy * self.position) % (2 * self.height) - self.height))
+            cv2.rectangle(frame, (px, py), (px + int(w), py + int(h)), color, -1)
+        self.position += 1
+        return True, frame
+
+    def release(self):
+        self.opened = False
+
+
+class TimedCapture:
+    """Har qanday capture ustidan o'qish vaqtini 'capture' bosqichi sifatida yozish"""
+
+    def __init__(self, cap, recorder):
+        self.cap = cap
+        self.recorder = recorder
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def read(self):
+        started = time.perf_counter()
+        ret, frame = self.cap.read()
+        if ret:
+            self.recorder.record('capture', time.perf_counter() - started)
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+def open_source(args):
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        if not cap.isOpened():
+            sys.exit(f"Video ochilmadi: {args.video}")
+        return cap, args.video
+    cap = SyntheticCapture(frames=args.frames, width=args.width, height=args.height, seed=args.seed)
+    return cap, f"synthetic:{args.frames}x{args.width}x{args.height}:seed{args.seed}"
+
+
+def run_tracking(args, cap, recorder):
+    """flask_app/app.py dagi yo'l: PipelineManager -> BatchScheduler -> VideoProcessor -> FrameHub"""
+    from pipeline import PipelineManager
+
+    manager = PipelineManager(model_path=args.model, backend=args.backend)
+    manager.load_model()
+
+    processor = manager.add_stream('benchmark', 'benchmark', cap=cap)
+    if processor is None:
+        sys.exit("Manba ochilmadi")
+    # Fayl manbasida producer birinchi obunachini kutadi - controller undan oldin almashtiriladi
+    processor.controller = recorder
+    subscriber = processor.hub.subscribe(queue_size=64)
+    try:
+        for frame_part in subscriber:
+            if args.limit and recorder.frames >= args.limit:
+                break
+    finally:
+        processor.hub.unsubscribe(subscriber)
+        manager.stop_all()
+    return manager.model_load_seconds
+
+
+def run_construction(args, cap, recorder):
+    """camera-tracking.py dagi uch model + fusion + ByteTrack, imshow o'rniga JPEG encode"""
+    construction = importlib.import_module('camera-tracking')
+    from inference import MultiModelExecutor
+    from fusion import FusionEngine
+    from registry import ClassRegistry
+    from detectors import partition_threads
+
+    # camera-tracking.main() dagi qiymatlar
+    model_paths = ["models/person20k.pt", "models/build25k.pt", "models/fire-smoke-model.pt"]
+    confidence_threshold = 0.5
+    nms_iou_threshold = 0.4
+
+    started = time.perf_counter()
+    threads = partition_threads(len(model_paths))
+    models = [construction.load_model(path, num_threads=threads) for path in model_paths]
+    model_load_seconds = time.perf_counter() - started
+
+    schedulers = construction.create_schedulers(models)
+    executor = MultiModelExecutor(schedulers, names=construction.MODEL_LABELS)
+    registry = ClassRegistry()
+    for label, model in zip(construction.MODEL_LABELS, models):
+        registry.register_model(label, model.names)
+    fusion_engine = FusionEngine(registry, construction.MODEL_LABELS, policy=construction.FUSION_POLICY)
+    renderer = construction.create_renderer(registry)
+    tracker = construction.setup_tracking(cap.get(cv2.CAP_PROP_FPS) or 30)
+
+    for scheduler in schedulers:
+        scheduler.register('benchmark')
+    try:
+        while not args.limit or recorder.frames < args.limit:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            recorder.begin_frame()
+
+            stage_start = time.perf_counter()
+            detections_list = executor.run('benchmark', frame, imgsz=args.imgsz)
+            recorder.record('inference', time.perf_counter() - stage_start)
+
+            stage_start = time.perf_counter()
+            detections_list = [d[d.confidence > confidence_threshold] for d in detections_list]
+            merged = fusion_engine.fuse(detections_list).with_nms(nms_iou_threshold)
+            recorder.record('fusion', time.perf_counter() - stage_start)
+
+            stage_start = time.perf_counter()
+            merged = tracker.update_with_detections(merged)
+            recorder.record('tracking', time.perf_counter() - stage_start)
+
+            stage_start = time.perf_counter()
+            annotated_frame, _ = construction.annotate_frame(frame, registry, merged, renderer)
+            recorder.record('annotate', time.perf_counter() - stage_start)
+
+            stage_start = time.perf_counter()
+            cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            recorder.record('encode', time.perf_counter() - stage_start)
+
+            recorder.end_frame(True)
+    finally:
+        for scheduler in schedulers:
+            scheduler.unregister('benchmark')
+            scheduler.stop()
+    return model_load_seconds
+
+
+def synthetic_detections(rng, count, registry, width, height):
+    import supervision as sv
+
+    class_ids = rng.integers(0, len(registry), count)
+    x1 = rng.uniform(0, width - 100, count)
+    y1 = rng.uniform(0, height - 200, count)
+    xyxy = np.stack([x1, y1, x1 + rng.uniform(30, 100, count), y1 + rng.uniform(60, 200, count)], axis=1)
+    return sv.Detections(
+        xyxy=xyxy.astype(np.float32),
+        confidence=rng.uniform(0.35, 1.0, count).astype(np.float32),
+        class_id=class_ids.astype(np.int64)
+    )
+
+
+def run_postprocess(args):
+    """Detectiondan keyingi bosqichlar (tracking, sanash, overlay=0 metadata, chizish) 1/50/500 box uchun"""
+    import supervision as sv
+    from registry import ClassRegistry, CLASS_SPECS
+    from tracking import VideoProcessor, associate_tracks, MODEL_KEY
+    from render import detection_metadata
+
+    registry = ClassRegistry()
+    registry.register_model(MODEL_KEY, dict(enumerate(list(CLASS_SPECS)[:4])))
+    processor = VideoProcessor(registry=registry)
+    frame = np.zeros((args.height, args.width, 3), dtype=np.uint8)
+    rng = np.random.default_rng(args.seed)
+    recorder = StageRecorder(warmup=0)
+
+    for count in args.boxes:
+        base = synthetic_detections(rng, count, registry, args.width, args.height)
+        tracker = sv.ByteTrack(frame_rate=30)
+        for _ in range(args.repeats):
+            # Boxlar biroz siljiydi - tracker ularni har kadrda qayta moslaydi
+            detections = base[np.arange(len(base))]
+            detections.xyxy = detections.xyxy + rng.normal(0, 2, detections.xyxy.shape).astype(np.float32)
+
+            started = time.perf_counter()
+            detections.tracker_id = associate_tracks(tracker, detections, registry)
+            recorder.record(f'tracking@{count}', time.perf_counter() - started)
+
+            started = time.perf_counter()
+            registry.count(detections.class_id)
+            recorder.record(f'count@{count}', time.perf_counter() - started)
+
+            started = time.perf_counter()
+            detection_metadata(detections, registry, frame.shape)
+            recorder.record(f'metadata@{count}', time.perf_counter() - started)
+
+            started = time.perf_counter()
+            processor.annotate_frame(frame, detections)
+            recorder.record(f'annotate@{count}', time.perf_counter() - started)
+
+    return {
+        'pipeline': 'postprocess',
+        'boxes': args.boxes,
+        'repeats': args.repeats,
+        'frame': [args.width, args.height],
+        'stages': recorder.summary(),
+    }
+
+
+PIPELINES = {
+    'tracking': run_tracking,
+    'construction': run_construction,
+}
+
+
+def run_benchmark(args):
+    recorder = StageRecorder(imgsz=args.imgsz, warmup=args.warmup)
+    cap, source = open_source(args)
+    cap = TimedCapture(cap, recorder)
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    wall_start = time.perf_counter()
+    model_load_seconds = PIPELINES[args.pipeline](args, cap, recorder)
+    wall = time.perf_counter() - wall_start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    cap.release()
+
+    cpu_seconds = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    return {
+        'pipeline': args.pipeline,
+        'source': source,
+        'backend': args.backend,
+        'imgsz': args.imgsz,
+        'frames': recorder.frames,
+        'warmup_frames': args.warmup,
+        'fps': round(recorder.throughput(), 2),
+        'wall_seconds': round(wall, 3),
+        'model_load_seconds': round(model_load_seconds, 3),
+        'stages': recorder.summary(),
+        # Linux da ru_maxrss KB da
+        'peak_rss_mb': round(usage_after.ru_maxrss / 1024, 1),
+        # 100% - bitta yadro to'liq band
+        'cpu_percent': round(cpu_seconds / wall * 100, 1) if wall > 0 else 0.0,
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(report, baseline, threshold):
+    """Baseline dan threshold ulushidan ko'proq yomonlashgan ko'rsatkichlar ro'yxati"""
+    regressions = []
+    if baseline.get('fps') and report.get('fps', 0) < baseline['fps'] * (1 - threshold):
+        regressions.append(f"fps: {baseline['fps']} -> {report['fps']}")
+
+    for stage, base in baseline.get('stages', {}).items():
+        current = report['stages'].get(stage)
+        if current is None:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if base[key] < MIN_STAGE_MS:
+                continue
+            if current[key] > base[key] * (1 + threshold):
+                regressions.append(f"{stage}.{key}: {base[key]} -> {current[key]}")
+
+    if baseline.get('peak_rss_mb') and report.get('peak_rss_mb', 0) > baseline['peak_rss_mb'] * (1 + threshold):
+        regressions.append(f"peak_rss_mb: {baseline['peak_rss_mb']} -> {report['peak_rss_mb']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline benchmark (headless)")
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="tracking")
+    parser.add_argument("--video", help="Video fayl; berilmasa sintetik kadrlar")
+    parser.add_argument("--frames", type=int, default=300, help="Sintetik kadrlar soni")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=0, help="Shuncha kadrdan keyin to'xtash (0 - oxirigacha)")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--model", default="models/zakladchik_model.pt")
+    parser.add_argument("--backend", default=None, help="torch yoki onnx (default: DETECTOR_BACKEND)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--output", help="Natijani JSON faylga yozish")
+    parser.add_argument("--baseline", help="Solishtiriladigan baseline JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Ruxsat etilgan yomonlashish ulushi")
+    parser.add_argument("--save-baseline", help="Natijani yangi baseline sifatida saqlash")
+    parser.add_argument("--postprocess", action="store_true",
+                        help="Modelsiz micro-benchmark: detectiondan keyingi bosqichlar")
+    parser.add_argument("--boxes", type=int, nargs='+', default=[1, 50, 500])
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.postprocess:
+        report = run_postprocess(args)
+    else:
+        if args.backend is None:
+            from config import get_detector_backend
+            args.backend = get_detector_backend()
+        report = run_benchmark(args)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        report['baseline'] = {'path': args.baseline, 'threshold': args.threshold, 'regressions': regressions}
+
+    print(json.dumps(report, indent=2))
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline and report['baseline']['regressions']:
+        print("Regressiya:")
+        for line in report['baseline']['regressions']:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
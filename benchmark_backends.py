@@ -0,0 +1,72 @@
+import argparse
+import json
+import time
+
+import cv2
+from supervision.metrics import MeanAveragePrecision
+
+from detectors import load_detector, list_images
+
+# PyTorch va ONNX backendlarni FPS va aniqlik (mAP) bo'yicha solishtirish.
+# Belgilangan ma'lumot bo'lmasa, PyTorch natijalari "haqiqat" sifatida olinadi
+# va ONNX/INT8 natijalarining undan og'ishi (mAP drift) o'lchanadi.
+
+
+def run_backend(detector, images, imgsz, batch_size, warmup=3):
+    for image in images[:warmup]:
+        detector.predict([image], imgsz=imgsz)
+
+    predictions = []
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        predictions.extend(detector.predict(images[i:i + batch_size], imgsz=imgsz))
+    elapsed = time.perf_counter() - start
+    return predictions, len(images) / elapsed if elapsed > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector backendlarini solishtirish")
+    parser.add_argument("--model", default="models/zakladchik_model.pt")
+    parser.add_argument("--images", required=True, help="Rasmlar papkasi yoki glob")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--calibration", help="INT8 uchun kalibratsiya rasmlari (berilsa INT8 ham o'lchanadi)")
+    parser.add_argument("--output", help="Natijani JSON faylga yozish")
+    args = parser.parse_args()
+
+    images = [image for image in (cv2.imread(p) for p in list_images(args.images, args.limit)) if image is not None]
+    if not images:
+        print("Rasmlar topilmadi!")
+        return
+
+    variants = [('torch', {}), ('onnx', {})]
+    if args.calibration:
+        variants.append(('onnx_int8', {'int8': True, 'calibration_source': args.calibration}))
+
+    report = {'images': len(images), 'imgsz': args.imgsz, 'batch_size': args.batch_size, 'backends': {}}
+    reference = None
+
+    for name, options in variants:
+        backend = 'torch' if name == 'torch' else 'onnx'
+        detector = load_detector(args.model, backend=backend, imgsz=args.imgsz, **options)
+        predictions, fps = run_backend(detector, images, args.imgsz, args.batch_size)
+
+        entry = {'fps': round(fps, 2)}
+        if reference is None:
+            reference = predictions
+        else:
+            result = MeanAveragePrecision().update(predictions, reference).compute()
+            entry['map50_vs_torch'] = round(float(result.map50), 4)
+            entry['map50_95_vs_torch'] = round(float(result.map50_95), 4)
+        report['backends'][name] = entry
+        print(f"{name}: {entry}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
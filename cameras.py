@@ -0,0 +1,401 @@
+import ctypes
+import ctypes.util
+import glob
+import os
+import select
+import struct
+import threading
+import time
+
+import cv2
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: V4L2 yo'q, qurilmalar OpenCV orqali aniqlanadi
+    fcntl = None
+
+try:
+    import pyudev
+except ImportError:
+    # udev (netlink) bo'lmasa /dev inotify orqali kuzatiladi
+    pyudev = None
+
+SYSFS_ROOT = '/sys/class/video4linux'
+DEV_ROOT = '/dev'
+BY_ID_ROOT = '/dev/v4l/by-id'
+# Hodisa kutishda to'xtash bayrog'i shu oraliqda tekshiriladi
+WAIT_SLICE = 1.0
+# Qurilma paydo bo'lgach udev by-id symlinklari va ruxsatlarini yaratib ulgurishi uchun
+HOTPLUG_SETTLE = 0.5
+
+# inotify (linux/inotify.h)
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')
+# sysfs bo'lmagan tizimlarda tekshiriladigan indekslar
+FALLBACK_INDICES = range(5)
+
+# V4L2 ioctl lari (linux/videodev2.h) - faqat so'rov, kadr oqimi boshlanmaydi
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_FRMSIZE_TYPE_DISCRETE = 1
+V4L2_FRMIVAL_TYPE_DISCRETE = 1
+
+CAPABILITY = struct.Struct('=16s32s32sIII3I')
+FMTDESC = struct.Struct('=III32sII3I')
+FRMSIZEENUM = struct.Struct('=III6I2I')
+FRMIVALENUM = struct.Struct('=IIIII6I2I')
+
+
+def _iowr(nr, size):
+    return (3 << 30) | (size << 16) | (ord('V') << 8) | nr
+
+
+VIDIOC_QUERYCAP = (2 << 30) | (CAPABILITY.size << 16) | (ord('V') << 8) | 0
+VIDIOC_ENUM_FMT = _iowr(2, FMTDESC.size)
+VIDIOC_ENUM_FRAMESIZES = _iowr(74, FRMSIZEENUM.size)
+VIDIOC_ENUM_FRAMEINTERVALS = _iowr(75, FRMIVALENUM.size)
+
+
+def fourcc_to_str(code):
+    return ''.join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+
+
+def read_text(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _enumerate(fd, request, layout, fields):
+    """index maydonini 0 dan oshirib, EINVAL qaytguncha ioctl chaqirish"""
+    results = []
+    index = 0
+    while True:
+        # Boshidagi maydonlar (index va so'rov parametrlari) u32, qolgani nol
+        buffer = bytearray(layout.size)
+        struct.pack_into(f'={len(fields) + 1}I', buffer, 0, index, *fields)
+        try:
+            fcntl.ioctl(fd, request, buffer, True)
+        except OSError:
+            return results
+        results.append(layout.unpack(buffer))
+        index += 1
+
+
+def query_modes(path):
+    """Qurilma formatlari, o'lchamlari va FPS lari; faqat o'qish uchun ochiladi, oqim boshlanmaydi"""
+    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        capability = bytearray(CAPABILITY.size)
+        fcntl.ioctl(fd, VIDIOC_QUERYCAP, capability, True)
+        driver, card, bus_info, _, capabilities, device_caps, *_ = CAPABILITY.unpack(capability)
+        caps = device_caps if capabilities & V4L2_CAP_DEVICE_CAPS else capabilities
+        info = {
+            'driver': driver.rstrip(b'\0').decode(errors='replace'),
+            'card': card.rstrip(b'\0').decode(errors='replace'),
+            'bus_info': bus_info.rstrip(b'\0').decode(errors='replace'),
+            'capture': bool(caps & V4L2_CAP_VIDEO_CAPTURE),
+            'modes': [],
+        }
+        if not info['capture']:
+            # UVC kameralarning ikkinchi tuguni (metadata) - kadr bermaydi
+            return info
+
+        for _, _, _, description, pixelformat, *_ in _enumerate(fd, VIDIOC_ENUM_FMT, FMTDESC, (V4L2_BUF_TYPE_VIDEO_CAPTURE,)):
+            fourcc = fourcc_to_str(pixelformat)
+            for size in _enumerate(fd, VIDIOC_ENUM_FRAMESIZES, FRMSIZEENUM, (pixelformat,)):
+                size_type = size[2]
+                if size_type == V4L2_FRMSIZE_TYPE_DISCRETE:
+                    width, height = size[3], size[4]
+                else:
+                    # Stepwise/continuous: eng katta o'lcham (max_width, max_height)
+                    width, height = size[4], size[7]
+                fps = []
+                for interval in _enumerate(fd, VIDIOC_ENUM_FRAMEINTERVALS, FRMIVALENUM, (pixelformat, width, height)):
+                    if interval[4] == V4L2_FRMIVAL_TYPE_DISCRETE and interval[5]:
+                        fps.append(round(interval[6] / interval[5], 2))
+                info['modes'].append({
+                    'format': fourcc,
+                    'description': description.rstrip(b'\0').decode(errors='replace'),
+                    'width': width,
+                    'height': height,
+                    'fps': sorted(set(fps), reverse=True),
+                })
+        return info
+    finally:
+        os.close(fd)
+
+
+def stable_ids():
+    """/dev/v4l/by-id symlinklari: qurilma yo'li -> qayta ulanganda o'zgarmaydigan nom"""
+    ids = {}
+    for link in glob.glob(os.path.join(BY_ID_ROOT, '*')):
+        ids.setdefault(os.path.realpath(link), os.path.basename(link))
+    return ids
+
+
+def scan_sysfs():
+    """Qurilmalarni ochmasdan sysfs dan ro'yxatlash: {videoN: (nom, udev identifikatori)}"""
+    devices = {}
+    for node in glob.glob(os.path.join(SYSFS_ROOT, 'video*')):
+        name = os.path.basename(node)
+        # dev (major:minor) qurilma qayta ulanganda o'zgaradi - keshni yangilash uchun belgi
+        devices[name] = (read_text(os.path.join(node, 'name')), read_text(os.path.join(node, 'dev')))
+    return devices
+
+
+class HotplugMonitor:
+    """video4linux qurilmalari ulanishi/uzilishini kutish: udev (netlink), bo'lmasa /dev inotify"""
+
+    def __init__(self):
+        self.kind = None
+        self.monitor = None
+        self.fd = None
+        if pyudev is not None:
+            try:
+                self.monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+                self.monitor.filter_by(subsystem='video4linux')
+                self.monitor.start()
+                self.kind = 'udev'
+                return
+            except Exception as e:
+                print(f"udev kuzatuvi ochilmadi: {e}")
+                self.monitor = None
+        self._open_inotify()
+
+    def _open_inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        if libc.inotify_add_watch(fd, DEV_ROOT.encode(), IN_CREATE | IN_DELETE) < 0:
+            os.close(fd)
+            return
+        self.fd = fd
+        self.kind = 'inotify'
+
+    def wait(self, timeout):
+        """timeout ichida kamera qo'shilsa yoki olib tashlansa True"""
+        if self.kind == 'udev':
+            return self.monitor.poll(timeout=timeout) is not None
+        if self.kind == 'inotify':
+            if not select.select([self.fd], [], [], timeout)[0]:
+                return False
+            changed = False
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return False
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(data):
+                _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                changed = changed or name.startswith(b'video')
+            return changed
+        return False
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class CameraRegistry:
+    """Kameralar ro'yxati keshi: ulanish hodisalarida sysfs qayta o'qiladi, rejimlar kerak bo'lganda so'raladi"""
+
+    def __init__(self, refresh_interval=2.0):
+        # Hodisalarni kuzatib bo'lmaganda (udev ham, inotify ham yo'q) sysfs shu oraliqda o'qiladi
+        self.refresh_interval = refresh_interval
+        self.devices = {}
+        self.snapshot = None
+        # Pipeline ochib turgan qurilmalar (indeks -> ochilganlar soni) - ularning rejimlari so'ralmaydi
+        self.in_use = {}
+        self.monitor = None
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.running = False
+        self.thread = None
+        self.refreshed_at = None
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="camera-registry", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def _loop(self):
+        if fcntl is not None and os.path.isdir(SYSFS_ROOT):
+            self.monitor = HotplugMonitor()
+        try:
+            while self.running:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Kameralarni aniqlashda xatolik: {e}")
+                self.ready.set()
+                self._wait_for_change()
+        finally:
+            if self.monitor is not None:
+                self.monitor.close()
+                self.monitor = None
+
+    def _wait_for_change(self):
+        if self.monitor is None or self.monitor.kind is None:
+            time.sleep(self.refresh_interval)
+            return
+        while self.running:
+            if self.monitor.wait(WAIT_SLICE):
+                time.sleep(HOTPLUG_SETTLE)
+                return
+
+    def refresh(self):
+        if fcntl is None or not os.path.isdir(SYSFS_ROOT):
+            self._refresh_fallback()
+            return
+
+        snapshot = scan_sysfs()
+        if snapshot == self.snapshot:
+            return
+        ids = stable_ids()
+        with self.lock:
+            previous = dict(self.devices)
+
+        devices = {}
+        for name, (label, dev) in snapshot.items():
+            index = int(name[len('video'):])
+            cached = previous.get(index)
+            if cached is not None and cached['dev'] == dev:
+                devices[index] = cached
+                continue
+            path = f"/dev/{name}"
+            # Faqat sysfs: qurilma ochilmaydi, rejimlar birinchi so'ralganda (ensure_modes) o'qiladi
+            devices[index] = {'index': index, 'path': path, 'name': label, 'dev': dev, 'by_id': ids.get(path),
+                              'capture': None, 'modes': None}
+
+        added = sorted(set(devices) - set(previous))
+        removed = sorted(set(previous) - set(devices))
+        with self.lock:
+            self.devices = devices
+            self.snapshot = snapshot
+            self.refreshed_at = time.time()
+        if added or removed:
+            print(f"Kameralar o'zgardi: qo'shildi {added}, olib tashlandi {removed}")
+
+    def _refresh_fallback(self, force=False):
+        # sysfs yo'q (Windows/macOS): qurilmalarni ochib ko'rishdan boshqa yo'l yo'q,
+        # shuning uchun faqat bir marta (yoki so'ralganda) tekshiriladi va ishlayotgan oqimga tegilmaydi
+        if self.snapshot is not None and not force:
+            return
+        devices = {}
+        for index in FALLBACK_INDICES:
+            cap = cv2.VideoCapture(index)
+            if cap.isOpened():
+                devices[index] = {
+                    'index': index,
+                    'path': None,
+                    'name': f"Kamera {index}",
+                    'capture': True,
+                    'modes': [],
+                }
+            cap.release()
+        with self.lock:
+            self.devices = devices
+            self.snapshot = 'fallback'
+            self.refreshed_at = time.time()
+
+    def wait_ready(self, timeout=5.0):
+        return self.ready.wait(timeout)
+
+    def acquire(self, index):
+        """Pipeline qurilmani ochdi - u ishlayotganda rejimlari so'ralmaydi"""
+        with self.lock:
+            self.in_use[index] = self.in_use.get(index, 0) + 1
+
+    def release(self, index):
+        with self.lock:
+            count = self.in_use.get(index, 0) - 1
+            if count > 0:
+                self.in_use[index] = count
+            else:
+                self.in_use.pop(index, None)
+
+    def ensure_modes(self, index):
+        """Rejimlar hali so'ralmagan va pipeline ishlatmayotgan qurilmani bir marta so'rash"""
+        with self.lock:
+            device = self.devices.get(index)
+            if device is None or device['modes'] is not None or index in self.in_use or device['path'] is None:
+                return device
+            path = device['path']
+        if fcntl is None:
+            return device
+        try:
+            info = query_modes(path)
+        except OSError as e:
+            info = {'capture': None, 'modes': [], 'error': str(e)}
+        with self.lock:
+            current = self.devices.get(index)
+            # So'rov paytida qurilma almashgan bo'lsa natija eski qurilmaniki
+            if current is device:
+                current = dict(device, **info)
+                self.devices[index] = current
+            return current
+
+    def list_devices(self, capture_only=True):
+        with self.lock:
+            indices = list(self.devices)
+        for index in indices:
+            self.ensure_modes(index)
+        with self.lock:
+            devices = list(self.devices.values())
+        if capture_only:
+            devices = [device for device in devices if device.get('capture') is not False]
+        return sorted(devices, key=lambda device: device['index'])
+
+    def get(self, index):
+        with self.lock:
+            return self.devices.get(index)
+
+    def pick_mode(self, index, width=1280, height=720, fps=30):
+        """So'ralgan o'lchamga eng yaqin rejim; teng bo'lsa MJPG (USB o'tkazuvchanligi uchun) afzal"""
+        device = self.ensure_modes(index)
+        if device is None or not device.get('modes'):
+            return None
+
+        def score(mode):
+            best_fps = min(mode['fps'], key=lambda value: abs(value - fps)) if mode['fps'] else None
+            return (
+                abs(mode['width'] * mode['height'] - width * height),
+                abs(best_fps - fps) if best_fps is not None else fps,
+                mode['format'] != 'MJPG',
+            ), best_fps
+
+        mode = min(device['modes'], key=lambda mode: score(mode)[0])
+        return {'format': mode['format'], 'width': mode['width'], 'height': mode['height'], 'fps': score(mode)[1]}
+
+
+camera_registry = CameraRegistry()
+
+
+def get_camera_registry():
+    """Jarayon uchun bitta registr; birinchi chaqiruvda fon threadi ishga tushadi"""
+    return camera_registry.start()
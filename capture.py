@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+from metrics import STAGE_SECONDS
+
+
+class FrameGrabber:
+    """Manbadan kadrlarni alohida threadda o'qib, kichik ring buferda saqlash"""
+
+    def __init__(self, cap, buffer_size=2, latest_only=True, drop_oldest=True,
+                 stop_on_eof=False, name="capture", metrics_label=None, on_release=None):
+        self.cap = cap
+        self.buffer_size = max(1, int(buffer_size))
+        self.latest_only = latest_only
+        # Fayllar uchun: bufer to'lsa kadr tashlanmaydi, o'quvchi kutiladi
+        self.drop_oldest = drop_oldest
+        self.stop_on_eof = stop_on_eof
+        self.name = name
+        # Berilsa o'qish vaqti /metrics ga 'capture' bosqichi sifatida yoziladi
+        self.metrics_label = metrics_label
+        # Manba yopilgandan keyin chaqiriladi (masalan, kamera registrida bandlikni bo'shatish)
+        self.on_release = on_release
+
+        self.buffer = deque(maxlen=self.buffer_size)
+        self.condition = threading.Condition()
+        self.running = False
+        self.finished = False
+        self.released = False
+        self.thread = None
+
+        # Statistika
+        self.frame_id = 0
+        self.dropped_frames = 0
+        self.last_frame_time = None
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(
+            target=self._capture_loop,
+            name=f"{self.name}-grabber",
+            daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def _capture_loop(self):
+        try:
+            self._read_frames()
+        finally:
+            # Manba faqat shu threadda yopiladi: bloklangan cap.read() (RTSP ~30 s) tugamasdan
+            # release() chaqirish native kodda use-after-free
+            self._release()
+
+    def _release(self):
+        with self.condition:
+            if self.released:
+                return
+            self.released = True
+        self.cap.release()
+        if self.on_release is not None:
+            self.on_release()
+
+    def _read_frames(self):
+        while self.running:
+            try:
+                started = time.perf_counter()
+                ret, frame = self.cap.read()
+                if ret and self.metrics_label is not None:
+                    STAGE_SECONDS.observe((self.metrics_label, 'capture'), time.perf_counter() - started)
+            except Exception as e:
+                print(f"Kadr o'qishda xatolik ({self.name}): {e}")
+                ret, frame = False, None
+
+            if not ret:
+                if self.stop_on_eof:
+                    # Fayl oxiriga yetildi
+                    with self.condition:
+                        self.finished = True
+                        self.condition.notify_all()
+                    break
+                time.sleep(0.1)
+                continue
+
+            with self.condition:
+                if not self.drop_oldest:
+                    self.condition.wait_for(
+                        lambda: len(self.buffer) < self.buffer.maxlen or not self.running
+                    )
+                    if not self.running:
+                        break
+                self.frame_id += 1
+                # Bufer to'lgan bo'lsa eng eski kadr tashlab yuboriladi
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.dropped_frames += 1
+                self.buffer.append((self.frame_id, frame))
+                self.last_frame_time = time.time()
+                self.condition.notify_all()
+
+    def read(self, timeout=1.0):
+        """Keyingi kadrni olish: (frame_id, frame) yoki vaqt tugasa None"""
+        with self.condition:
+            if not self.buffer:
+                self.condition.wait_for(
+                    lambda: self.buffer or not self.running or self.finished,
+                    timeout=timeout
+                )
+            if not self.buffer:
+                return None
+
+            if self.latest_only:
+                # Faqat eng so'nggi kadr, eskilari tashlanadi
+                self.dropped_frames += len(self.buffer) - 1
+                item = self.buffer.pop()
+                self.buffer.clear()
+            else:
+                item = self.buffer.popleft()
+            self.condition.notify_all()
+            return item
+
+    def is_exhausted(self):
+        """Manba tugagan va buferda kadr qolmagan"""
+        with self.condition:
+            return self.finished and not self.buffer
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+
+        # cap.read() tugashini kutish; vaqt tugasa manbani capture threadning o'zi yopadi
+        if self.thread is None:
+            # Thread ishga tushirilmagan
+            self._release()
+        elif self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+            if self.thread.is_alive():
+                print(f"Capture thread to'xtamadi ({self.name}), manba o'qish tugagach yopiladi")
+        self.thread = None
+
+        with self.condition:
+            self.buffer.clear()
+
+    def is_alive(self):
+        return self.running and self.thread is not None and self.thread.is_alive()
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                'frames': self.frame_id,
+                'dropped': self.dropped_frames,
+                'buffered': len(self.buffer),
+                'latest_only': self.latest_only,
+                'finished': self.finished,
+            }
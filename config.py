@@ -13,4 +13,20 @@ def get_chat_id():
 
     if chat_id is None :
         return "Not found CHAT ID"
-    return chat_id
\ No newline at end of file
+    return chat_id
+
+def get_detector_backend():
+    # 'torch' (ultralytics .pt) yoki 'onnx' (onnxruntime CPU)
+    return os.getenv('DETECTOR_BACKEND', 'torch')
+
+def get_int8_calibration():
+    # INT8 kvantlash uchun kalibratsiya rasmlari papkasi (bo'sh bo'lsa INT8 o'chirilgan)
+    return os.getenv('INT8_CALIBRATION') or None
+
+def has_telegram_config():
+    # TOKEN va CHAT_ID berilmagan bo'lsa ogohlantirishlar o'chirilgan
+    return bool(os.getenv('TOKEN')) and bool(os.getenv('CHAT_ID'))
+
+def get_cache_max_bytes():
+    # Natijalar keshi uchun disk chegarasi (GB)
+    return int(float(os.getenv('RESULT_CACHE_MAX_GB', '10')) * 1024 ** 3)
\ No newline at end of file
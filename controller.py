@@ -0,0 +1,103 @@
+import time
+
+# Sifat darajalari: (inference stride, imgsz). 0 - eng yuqori sifat
+QUALITY_LEVELS = [
+    (1, 640),
+    (1, 480),
+    (2, 480),
+    (2, 320),
+    (3, 320),
+    (4, 320),
+]
+
+
+class LatencyController:
+    """Kechikish byudjetini ushlab turish uchun stride va imgsz ni avtomatik boshqarish"""
+
+    def __init__(self, budget_ms=150, levels=None, headroom=0.6, smoothing=0.1, cooldown_frames=30):
+        self.budget = budget_ms / 1000.0
+        self.levels = levels or QUALITY_LEVELS
+        # Kechikish byudjetning shu ulushidan past bo'lsa sifat qayta oshiriladi
+        self.headroom = headroom
+        self.smoothing = smoothing
+        # Har bir o'zgarishdan keyin natijani kuzatish uchun kutiladigan kadrlar
+        self.cooldown_frames = cooldown_frames
+
+        self.level = 0
+        self.frame_index = 0
+        self.frames_since_change = 0
+        self.frame_start = None
+        self.latency = None
+        self.stage_latency = {}
+        self.detect_latency = None
+        self.changes = 0
+
+    @property
+    def stride(self):
+        return self.levels[self.level][0]
+
+    @property
+    def imgsz(self):
+        return self.levels[self.level][1]
+
+    def reset(self):
+        self.level = 0
+        self.frame_index = 0
+        self.frames_since_change = 0
+        self.latency = None
+        self.detect_latency = None
+        self.stage_latency = {}
+
+    def ema(self, old, value):
+        return value if old is None else old + self.smoothing * (value - old)
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+
+    def should_detect(self):
+        """Har stride-chi kadrda detection, oradagilarida faqat tracking"""
+        return self.frame_index % self.stride == 0
+
+    def record(self, stage, seconds):
+        self.stage_latency[stage] = self.ema(self.stage_latency.get(stage), seconds)
+
+    def end_frame(self, detected):
+        total = time.perf_counter() - self.frame_start
+        self.frame_index += 1
+        self.frames_since_change += 1
+
+        if detected:
+            self.detect_latency = self.ema(self.detect_latency, total)
+        # Stride bo'yicha o'rtacha kadr kechikishi
+        self.latency = self.ema(self.latency, total)
+        self.adjust()
+
+    def adjust(self):
+        # Byudjet barcha kadrlar bo'yicha o'rtacha kechikishga qo'llanadi:
+        # stride oshsa tracking-only kadrlar hisobiga o'rtacha kamayadi
+        latency = self.latency
+        if latency is None or self.frames_since_change < self.cooldown_frames:
+            return
+
+        if latency > self.budget and self.level < len(self.levels) - 1:
+            self.set_level(self.level + 1)
+        elif latency < self.budget * self.headroom and self.level > 0:
+            self.set_level(self.level - 1)
+
+    def set_level(self, level):
+        self.level = level
+        self.frames_since_change = 0
+        self.changes += 1
+        print(f"Sifat darajasi: {level} (stride={self.stride}, imgsz={self.imgsz})")
+
+    def get_status(self):
+        return {
+            'budget_ms': round(self.budget * 1000, 1),
+            'level': self.level,
+            'stride': self.stride,
+            'imgsz': self.imgsz,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'detect_latency_ms': round(self.detect_latency * 1000, 1) if self.detect_latency is not None else None,
+            'stages_ms': {stage: round(value * 1000, 2) for stage, value in self.stage_latency.items()},
+            'changes': self.changes,
+        }
@@ -0,0 +1,258 @@
+import ast
+import glob
+import os
+
+import cv2
+import numpy as np
+import supervision as sv
+
+# Ultralytics predict() bilan bir xil standart qiymatlar
+DEFAULT_CONF = 0.25
+DEFAULT_IOU = 0.7
+MAX_DET = 300
+
+
+def letterbox(frame, imgsz):
+    """Ultralytics letterbox bilan bir xil: nisbatni saqlab o'lchash va 114 bilan to'ldirish"""
+    h, w = frame.shape[:2]
+    gain = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    dw, dh = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    frame = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+    # BGR HWC -> RGB CHW, [0, 1]
+    blob = frame[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(blob, dtype=np.float32) / 255.0, gain, (left, top)
+
+
+class UltralyticsDetector:
+    """PyTorch (.pt) og'irliklari bilan ultralytics orqali detection"""
+
+    backend = 'torch'
+
+    def __init__(self, model_path):
+        from ultralytics import YOLO
+
+        self.model_path = model_path
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+
+    def predict(self, frames, imgsz=640):
+        results = self.model(frames, imgsz=imgsz, verbose=False)
+        return [sv.Detections.from_ultralytics(result) for result in results]
+
+
+class OnnxDetector:
+    """Eksport qilingan ONNX modelni onnxruntime CPU orqali ishlatish"""
+
+    backend = 'onnx'
+
+    def __init__(self, onnx_path, names=None, imgsz=640, conf=DEFAULT_CONF, iou=DEFAULT_IOU, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.model_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.names = names or read_onnx_names(self.session)
+
+    def postprocess(self, output, gain, pad, shape):
+        # (4 + nc, N) -> (N, 4 + nc)
+        predictions = output.T
+        scores_all = predictions[:, 4:]
+        class_ids = scores_all.argmax(axis=1)
+        scores = scores_all[np.arange(len(class_ids)), class_ids]
+
+        keep = scores > self.conf
+        if not np.any(keep):
+            return empty_detections()
+
+        boxes, scores, class_ids = predictions[keep, :4], scores[keep], class_ids[keep]
+        # xywh (markaz) -> chap-yuqori xywh (OpenCV NMS uchun)
+        nms_boxes = boxes.copy()
+        nms_boxes[:, 0] -= boxes[:, 2] / 2
+        nms_boxes[:, 1] -= boxes[:, 3] / 2
+        indices = cv2.dnn.NMSBoxesBatched(
+            nms_boxes.tolist(), scores.tolist(), class_ids.tolist(), self.conf, self.iou
+        )
+        indices = np.asarray(indices, dtype=int).reshape(-1)[:MAX_DET]
+        if len(indices) == 0:
+            return empty_detections()
+
+        boxes, scores, class_ids = boxes[indices], scores[indices], class_ids[indices]
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+        xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+        xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+        xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+
+        # Asl kadr koordinatalariga qaytarish
+        xyxy[:, [0, 2]] -= pad[0]
+        xyxy[:, [1, 3]] -= pad[1]
+        xyxy /= gain
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, shape[0])
+
+        class_ids = class_ids.astype(int)
+        return sv.Detections(
+            xyxy=xyxy.astype(np.float32),
+            confidence=scores.astype(np.float32),
+            class_id=class_ids,
+            data={'class_name': np.array([self.names[int(c)] for c in class_ids])}
+        )
+
+    def predict(self, frames, imgsz=None):
+        imgsz = imgsz or self.imgsz
+        blobs, metas = [], []
+        for frame in frames:
+            blob, gain, pad = letterbox(frame, imgsz)
+            blobs.append(blob)
+            metas.append((gain, pad, frame.shape[:2]))
+
+        outputs = self.session.run(None, {self.input_name: np.stack(blobs)})[0]
+        return [
+            self.postprocess(output, gain, pad, shape)
+            for output, (gain, pad, shape) in zip(outputs, metas)
+        ]
+
+
+def empty_detections():
+    detections = sv.Detections.empty()
+    detections.data = {'class_name': np.empty((0,), dtype=str)}
+    return detections
+
+
+def read_onnx_names(session):
+    """Ultralytics eksportda class nomlarini ONNX metadata ichiga yozadi"""
+    metadata = session.get_modelmeta().custom_metadata_map
+    if 'names' not in metadata:
+        raise ValueError("ONNX modelda class nomlari topilmadi")
+    return {int(k): v for k, v in ast.literal_eval(metadata['names']).items()}
+
+
+def is_fresh(artifact_path, source_path):
+    return os.path.exists(artifact_path) and os.path.getmtime(artifact_path) >= os.path.getmtime(source_path)
+
+
+def export_onnx(model_path, imgsz=640):
+    """.pt modelni bir marta ONNX ga eksport qilib, og'irliklar yonida saqlash"""
+    stem, _ = os.path.splitext(model_path)
+    onnx_path = f"{stem}_{imgsz}.onnx"
+    if is_fresh(onnx_path, model_path):
+        return onnx_path
+
+    from ultralytics import YOLO
+
+    print(f"ONNX eksport qilinmoqda: {model_path}")
+    exported = YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+    os.replace(exported, onnx_path)
+    print(f"ONNX saqlandi: {onnx_path}")
+    return onnx_path
+
+
+def list_images(source, limit=None):
+    if os.path.isdir(source):
+        patterns = [os.path.join(source, f"*.{ext}") for ext in ('jpg', 'jpeg', 'png', 'bmp')]
+        paths = sorted(p for pattern in patterns for p in glob.glob(pattern))
+    else:
+        paths = sorted(glob.glob(source))
+    return paths[:limit] if limit else paths
+
+
+class CalibrationReader:
+    """INT8 kvantlash uchun kalibratsiya rasmlarini modelga berish"""
+
+    def __init__(self, image_paths, input_name, imgsz):
+        self.image_paths = list(image_paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self.index = 0
+
+    def get_next(self):
+        while self.index < len(self.image_paths):
+            image = cv2.imread(self.image_paths[self.index])
+            self.index += 1
+            if image is None:
+                continue
+            blob, _, _ = letterbox(image, self.imgsz)
+            return {self.input_name: blob[np.newaxis]}
+        return None
+
+    def rewind(self):
+        self.index = 0
+
+
+def quantize_int8(onnx_path, calibration_source, imgsz=640, max_images=100):
+    """Kichik kalibratsiya to'plami bilan statik INT8 kvantlash"""
+    int8_path = onnx_path.replace('.onnx', '_int8.onnx')
+    if is_fresh(int8_path, onnx_path):
+        return int8_path
+
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    image_paths = list_images(calibration_source, limit=max_images)
+    if not image_paths:
+        raise ValueError(f"Kalibratsiya rasmlari topilmadi: {calibration_source}")
+
+    input_name = onnx.load(onnx_path, load_external_data=False).graph.input[0].name
+    print(f"INT8 kvantlash: {len(image_paths)} ta rasm bilan kalibratsiya")
+    quantize_static(
+        onnx_path,
+        int8_path,
+        CalibrationReader(image_paths, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+    # Class nomlari metadata sini saqlab qolish
+    source_model = onnx.load(onnx_path, load_external_data=False)
+    int8_model = onnx.load(int8_path)
+    onnx.helper.set_model_props(
+        int8_model, {prop.key: prop.value for prop in source_model.metadata_props}
+    )
+    onnx.save(int8_model, int8_path)
+    print(f"INT8 model saqlandi: {int8_path}")
+    return int8_path
+
+
+def partition_threads(num_models):
+    """Parallel ishlaydigan modellar uchun CPU threadlarini teng bo'lish"""
+    threads = max(1, (os.cpu_count() or 1) // max(1, num_models))
+    try:
+        import torch
+        # PyTorch intra-op threadlari jarayon bo'yicha umumiy
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    return threads
+
+
+def load_detector(model_path, backend='torch', imgsz=640, int8=False, calibration_source=None, num_threads=None):
+    """Backend tanlash: 'torch' (ultralytics) yoki 'onnx' (onnxruntime)"""
+    if backend == 'torch':
+        return UltralyticsDetector(model_path)
+
+    if backend != 'onnx':
+        raise ValueError(f"Noma'lum backend: {backend}")
+
+    onnx_path = model_path if model_path.endswith('.onnx') else export_onnx(model_path, imgsz)
+    if int8:
+        if calibration_source is None:
+            raise ValueError("INT8 uchun kalibratsiya rasmlari kerak")
+        onnx_path = quantize_int8(onnx_path, calibration_source, imgsz)
+    return OnnxDetector(onnx_path, imgsz=imgsz, num_threads=num_threads)
@@ -0,0 +1,84 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+# Chiqish darajalari: nom -> maksimal kenglik (None - asl o'lcham); balandlik nisbat bo'yicha.
+# Dashboard to'ri va mobil ko'rinish to'liq o'lchamdagi MJPEG ni tortmaydi
+TIERS = {
+    'full': None,
+    'w640': 640,
+    'thumb': 320,
+}
+# Tomoshabin orqada qolsa sifat shu zinapoya bo'yicha pasayadi
+QUALITY_STEPS = (85, 70, 55, 40)
+
+
+def mjpeg_part(jpeg, headers=b''):
+    return b'--frame\r\nContent-Type: image/jpeg\r\n' + headers + b'\r\n' + jpeg + b'\r\n'
+
+
+def resize_to_tier(frame, tier):
+    max_width = TIERS[tier]
+    height, width = frame.shape[:2]
+    if max_width is None or width <= max_width:
+        return frame
+    return cv2.resize(frame, (max_width, round(height * max_width / width)), interpolation=cv2.INTER_AREA)
+
+
+def encode_variants(frame, wanted):
+    """Bitta kadrdan kerakli (daraja, sifat) juftliklari (JPEG baytlari): har bir daraja bir marta kichraytiriladi"""
+    qualities = {}
+    for tier, quality in wanted:
+        qualities.setdefault(tier, set()).add(quality)
+
+    variants = {}
+    for tier, tier_qualities in qualities.items():
+        image = resize_to_tier(frame, tier)
+        for quality in sorted(tier_qualities, reverse=True):
+            ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if ok:
+                variants[(tier, quality)] = buffer.tobytes()
+    return variants
+
+
+class EncodePool:
+    """JPEG kodlash threadlar pulida: cv2.resize/imencode GIL ni bo'shatadi,
+    shuning uchun kadr kodlanayotganda producer keyingi kadr inferencesiga o'tadi"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or max(2, min(4, (os.cpu_count() or 2) // 2))
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="jpeg-encoder")
+        self.lock = threading.Lock()
+        # Statistika
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, fn, *args):
+        with self.lock:
+            self.submitted += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.completed += 1
+            if future.exception() is not None:
+                self.failed += 1
+                print(f"Kodlash xatolik: {future.exception()}")
+
+    def stop(self):
+        self.executor.shutdown(wait=True)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'pending': self.submitted - self.completed,
+            }
@@ -0,0 +1,362 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import cv2
+
+# Eng yaxshi kadrdan kesilgan rasm shu o'lchamdan kattalashmaydi
+THUMBNAIL_SIZE = 256
+THUMBNAIL_PADDING = 0.1
+
+
+def parse_time(value):
+    """Unix vaqt yoki ISO sana/vaqt ("2026-10-16", "2026-10-16T08:30") -> unix vaqt"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(value).timestamp()
+
+
+class Track:
+    """Ochiq trek: xotirada yig'iladi, yopilganda bazaga bitta qator bo'lib yoziladi"""
+
+    def __init__(self, camera, class_name, tracker_id, timestamp):
+        self.camera = camera
+        self.class_name = class_name
+        self.tracker_id = tracker_id
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.max_confidence = 0.0
+        self.frames = 0
+        self.crop = None
+
+    def to_dict(self):
+        return {
+            'id': None,
+            'camera': self.camera,
+            'class_name': self.class_name,
+            'tracker_id': self.tracker_id,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'max_confidence': round(self.max_confidence, 4),
+            'frames': self.frames,
+            'thumbnail': None,
+            'open': True,
+        }
+
+
+class EventStore:
+    """Treklar hayot sikli (paydo bo'lish/yo'qolish, class, max ishonch, eng yaxshi kadr) SQLite da"""
+
+    def __init__(self, db_path='events.db', thumbnail_folder='thumbnails', idle_timeout=5.0,
+                 flush_interval=1.0, queue_size=256):
+        self.db_path = db_path
+        self.thumbnail_folder = thumbnail_folder
+        # Trek shuncha vaqt ko'rinmasa yopiladi
+        self.idle_timeout = idle_timeout
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        # (kamera, class, tracker_id) -> Track; trek qilinmaydigan classlarda tracker_id = None
+        self.open_tracks = {}
+        self.tracks_lock = threading.Lock()
+        # Hot path uchun: kalit -> shu paytgacha eng yuqori ishonch (kesilgan rasm faqat oshganda olinadi)
+        self.best_confidence = {}
+        self.best_lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        # Statistika
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+
+        os.makedirs(thumbnail_folder, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS tracks (
+                    id INTEGER PRIMARY KEY,
+                    camera TEXT NOT NULL,
+                    class_name TEXT NOT NULL,
+                    tracker_id INTEGER,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    max_confidence REAL NOT NULL,
+                    frames INTEGER NOT NULL,
+                    thumbnail TEXT
+                )
+            """)
+            # Vaqt oralig'i so'rovlari last_seen >= start bo'yicha indeksdan boshlanadi
+            self.conn.execute("CREATE INDEX IF NOT EXISTS tracks_time ON tracks (last_seen)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS tracks_camera ON tracks (camera, last_seen)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS tracks_class ON tracks (class_name, last_seen)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS tracks_camera_class ON tracks (camera, class_name, last_seen)")
+            # Eng uzun trek davomiyligi - so'rovda last_seen ni ikki tomondan chegaralash uchun
+            self.max_duration = self.conn.execute(
+                "SELECT COALESCE(MAX(last_seen - first_seen), 0) FROM tracks"
+            ).fetchone()[0]
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name="event-store", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.running = False
+        if self.thread is not None:
+            # Worker navbatni bo'shatib, ochiq treklarni o'zi yozadi
+            self.thread.join(timeout=timeout)
+            if self.thread.is_alive():
+                print("Hodisalar worker to'xtamadi, ochiq treklar yozilmadi")
+            else:
+                self.thread = None
+            return
+        self._drain()
+        self._flush(close_all=True)
+
+    def _key(self, camera, class_id, tracker_id, registry):
+        """(kamera, class, tracker_id) yoki yozilmaydigan box uchun None"""
+        if registry.track[class_id]:
+            # Hali tasdiqlanmagan (-1) yoki trekka tushmagan box
+            if tracker_id is None or tracker_id < 0:
+                return None
+            return camera, registry.names[class_id], int(tracker_id)
+        # Trek qilinmaydigan class uzluksiz ko'rinish davri bitta hodisa
+        return camera, registry.names[class_id], None
+
+    def record(self, camera, detections, frame, registry, timestamp=None):
+        """Hot pathdan chaqiriladi: navbatga faqat boxlar va ishonch oshgan trekning kichik rasmi tushadi"""
+        if len(detections) == 0:
+            return False
+        camera = str(camera)
+        tracker_ids = detections.tracker_id
+        rows = []
+        previous = {}
+        with self.best_lock:
+            for i in range(len(detections)):
+                key = self._key(camera, int(detections.class_id[i]),
+                                tracker_ids[i] if tracker_ids is not None else None, registry)
+                if key is None:
+                    continue
+                confidence = float(detections.confidence[i])
+                crop = None
+                best = self.best_confidence.get(key, -1.0)
+                if confidence > best:
+                    previous.setdefault(key, best)
+                    self.best_confidence[key] = confidence
+                    crop = self._crop(frame, detections.xyxy[i])
+                rows.append((key, confidence, crop))
+        if not rows:
+            return False
+        try:
+            self.queue.put_nowait((timestamp or time.time(), rows))
+        except queue.Full:
+            # Yozilmagan rasmlar eng yaxshi deb hisoblanmasin
+            with self.best_lock:
+                for key, best in previous.items():
+                    if best < 0:
+                        self.best_confidence.pop(key, None)
+                    else:
+                        self.best_confidence[key] = best
+            self.dropped += 1
+            return False
+        self.recorded += 1
+        return True
+
+    def _crop(self, frame, xyxy):
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = xyxy
+        pad_x = (x2 - x1) * THUMBNAIL_PADDING
+        pad_y = (y2 - y1) * THUMBNAIL_PADDING
+        x1, y1 = max(int(x1 - pad_x), 0), max(int(y1 - pad_y), 0)
+        x2, y2 = min(int(x2 + pad_x), width), min(int(y2 + pad_y), height)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        crop = frame[y1:y2, x1:x2]
+        scale = THUMBNAIL_SIZE / max(crop.shape[:2])
+        if scale < 1:
+            return cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return crop.copy()
+
+    def _apply(self, timestamp, rows):
+        with self.tracks_lock:
+            for key, confidence, crop in rows:
+                track = self.open_tracks.get(key)
+                if track is None:
+                    track = Track(key[0], key[1], key[2], timestamp)
+                    self.open_tracks[key] = track
+                track.last_seen = timestamp
+                track.frames += 1
+                if confidence > track.max_confidence:
+                    track.max_confidence = confidence
+                    if crop is not None:
+                        track.crop = crop
+
+    def _save_thumbnail(self, track):
+        if track.crop is None:
+            return None
+        day = datetime.fromtimestamp(track.first_seen).strftime('%Y-%m-%d')
+        folder = os.path.join(self.thumbnail_folder, track.camera, day)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{uuid.uuid4().hex[:16]}.jpg")
+        ok, buffer = cv2.imencode('.jpg', track.crop, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not ok:
+            return None
+        with open(path, 'wb') as f:
+            f.write(buffer.tobytes())
+        return path
+
+    def _flush(self, close_all=False):
+        """Yopilgan treklarni bitta tranzaksiyada yozish"""
+        cutoff = time.time() - self.idle_timeout
+        with self.tracks_lock:
+            closed = [key for key, track in self.open_tracks.items() if close_all or track.last_seen < cutoff]
+            tracks = [self.open_tracks.pop(key) for key in closed]
+        with self.best_lock:
+            for key in closed:
+                self.best_confidence.pop(key, None)
+        if not tracks:
+            return 0
+
+        rows = [
+            (track.camera, track.class_name, track.tracker_id, track.first_seen, track.last_seen,
+             track.max_confidence, track.frames, self._save_thumbnail(track))
+            for track in tracks
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO tracks (camera, class_name, tracker_id, first_seen, last_seen, max_confidence, "
+                "frames, thumbnail) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        self.written += len(rows)
+        self.max_duration = max(self.max_duration, max(track.last_seen - track.first_seen for track in tracks))
+        return len(rows)
+
+    def _drain(self):
+        """Navbatda qolgan hamma yozuvni treklarga qo'shish"""
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self._apply(*item)
+            except Exception as e:
+                print(f"Hodisa yozish xatolik: {e}")
+
+    def _worker(self):
+        last_flush = time.monotonic()
+        while self.running:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is not None:
+                try:
+                    self._apply(*item)
+                except Exception as e:
+                    print(f"Hodisa yozish xatolik: {e}")
+            if time.monotonic() - last_flush >= self.flush_interval:
+                last_flush = time.monotonic()
+                try:
+                    self._flush()
+                except Exception as e:
+                    print(f"Hodisalarni saqlash xatolik: {e}")
+        # To'xtashdan oldingi oxirgi detectionlar va ochiq treklar ham yozilsin
+        self._drain()
+        try:
+            self._flush(close_all=True)
+        except Exception as e:
+            print(f"Hodisalarni saqlash xatolik: {e}")
+
+    def _filters(self, camera=None, class_name=None, start=None, end=None):
+        clauses = []
+        params = []
+        if camera is not None:
+            clauses.append("camera = ?")
+            params.append(str(camera))
+        if class_name is not None:
+            clauses.append("class_name = ?")
+            params.append(class_name)
+        # Oraliqda ko'ringan treklar: oraliq boshlanishidan keyin yo'qolgan, oxirigacha paydo bo'lgan
+        if start is not None:
+            clauses.append("last_seen >= ?")
+            params.append(start)
+        if end is not None:
+            # first_seen <= end bo'lsa last_seen <= end + max_duration - indeks oralig'i yopiq bo'ladi
+            clauses.append("first_seen <= ? AND last_seen <= ?")
+            params.extend((end, end + self.max_duration))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def _open_matches(self, camera=None, class_name=None, start=None, end=None):
+        with self.tracks_lock:
+            tracks = list(self.open_tracks.values())
+        return [
+            track.to_dict() for track in tracks
+            if (camera is None or track.camera == str(camera))
+            and (class_name is None or track.class_name == class_name)
+            and (start is None or track.last_seen >= start)
+            and (end is None or track.first_seen <= end)
+        ]
+
+    def query(self, camera=None, class_name=None, start=None, end=None, limit=100, include_open=True):
+        """Treklar (yangilari birinchi): kamera, class va vaqt oralig'i bo'yicha"""
+        where, params = self._filters(camera, class_name, start, end)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM tracks{where} ORDER BY last_seen DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        tracks = [dict(row, open=False) for row in rows]
+        if include_open:
+            tracks = self._open_matches(camera, class_name, start, end) + tracks
+            tracks.sort(key=lambda track: track['last_seen'], reverse=True)
+        return tracks[:limit]
+
+    def summary(self, camera=None, start=None, end=None):
+        """Class bo'yicha treklar soni, kadrlar va eng yuqori ishonch"""
+        where, params = self._filters(camera, None, start, end)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT class_name, COUNT(*) AS tracks, SUM(frames) AS frames, MAX(max_confidence) AS max_confidence "
+                f"FROM tracks{where} GROUP BY class_name",
+                params
+            ).fetchall()
+        result = {row['class_name']: dict(row) for row in rows}
+        for track in self._open_matches(camera, None, start, end):
+            entry = result.setdefault(track['class_name'], {
+                'class_name': track['class_name'], 'tracks': 0, 'frames': 0, 'max_confidence': 0.0
+            })
+            entry['tracks'] += 1
+            entry['frames'] += track['frames']
+            entry['max_confidence'] = max(entry['max_confidence'], track['max_confidence'])
+        return list(result.values())
+
+    def get(self, event_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM tracks WHERE id = ?", (event_id,)).fetchone()
+        return dict(row, open=False) if row is not None else None
+
+    def get_stats(self):
+        with self.tracks_lock:
+            open_count = len(self.open_tracks)
+        return {
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'written': self.written,
+            'open_tracks': open_count,
+            'queued': self.queue.qsize(),
+        }
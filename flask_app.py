@@ -1,47 +1,164 @@
-from flask import Flask, Response, render_template, jsonify, request
-from tracking import VideoProcessor
-import cv2
+import os
+from flask import Flask, Response, render_template, jsonify, request, send_file
+from flask_socketio import SocketIO
+from pipeline import PipelineManager
+from tracking import get_available_cameras
+from cameras import get_camera_registry
+from alerts import create_alert_dispatcher
+from events import EventStore, parse_time
+from metrics import REGISTRY
+from encoder import TIERS
+from live import LiveChannel
+
+EVENTS_DB = "events.db"
+THUMBNAIL_FOLDER = "thumbnails"
 
 app = Flask(__name__)
-video_processor = VideoProcessor()
+# threading rejimi: WebSocket simple-websocket orqali, pipeline threadlari o'zgarishsiz qoladi
+socketio = SocketIO(app, async_mode="threading")
+# Kameralar fonda aniqlanadi - birinchi /get_cameras so'rovi kutmaydi
+camera_registry = get_camera_registry()
+event_store = EventStore(EVENTS_DB, thumbnail_folder=THUMBNAIL_FOLDER).start()
+pipeline_manager = PipelineManager(
+    motion_options={"sensitivity": 0.003, "max_skip": 30},
+    latency_budget_ms=150,
+    # Ogohlantirishlar Telegram (sozlangan bo'lsa) va WebSocket mijozlariga
+    alert_dispatcher=create_alert_dispatcher(listeners=[lambda alerts: live_channel.publish_alerts(alerts)]),
+    event_store=event_store
+)
+# Kadrlar, metadata, holat va ogohlantirishlar bitta WebSocket orqali
+live_channel = LiveChannel(socketio, pipeline_manager)
+REGISTRY.register_collector(pipeline_manager.collect_metrics)
 
 @app.route("/")
 def index():
     return render_template("index.html")
 
-@app.route("/video_feed")
-def video_feed():
-    return Response(
-        video_processor.generate_frames(),
-        mimetype="multipart/x-mixed-replace; boundary=frame"
-    )
-
 @app.route("/get_cameras")
 def get_cameras():
-    cameras = video_processor.get_available_cameras()
-    return jsonify({"cameras": cameras})
+    cameras = get_available_cameras()
+    return jsonify({"cameras": cameras, "devices": camera_registry.list_devices()})
+
+@app.route("/streams", methods=["GET"])
+def list_streams():
+    return jsonify({"status": "success", "streams": pipeline_manager.list_streams()})
 
-@app.route("/set_camera", methods=["POST"])
-def set_camera():
-    data = request.get_json()
-    camera_index = data.get("camera_index", 0)
+@app.route("/inference_stats")
+def inference_stats():
+    return jsonify({"status": "success", "stats": pipeline_manager.get_inference_stats()})
+
+@app.route("/alert_stats")
+def alert_stats():
+    return jsonify({"status": "success", "stats": pipeline_manager.get_alert_stats()})
+
+@app.route("/live_stats")
+def live_stats():
+    return jsonify({"status": "success", "stats": live_channel.get_stats()})
+
+@app.route("/metrics")
+def metrics():
+    # Prometheus matn formati; gauge qiymatlari shu so'rov paytida yig'iladi
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/events")
+def list_events():
+    """Treklar: ?camera=2&class=qurol_aslahasi&start=2026-10-16&end=2026-10-17&limit=100"""
+    try:
+        start = parse_time(request.args.get("start"))
+        end = parse_time(request.args.get("end"))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Noto'g'ri vaqt formati"}), 400
+    events = event_store.query(
+        camera=request.args.get("camera"),
+        class_name=request.args.get("class"),
+        start=start,
+        end=end,
+        limit=request.args.get("limit", 100, type=int)
+    )
+    return jsonify({"status": "success", "events": events})
+
+@app.route("/events/summary")
+def events_summary():
+    try:
+        start = parse_time(request.args.get("start"))
+        end = parse_time(request.args.get("end"))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Noto'g'ri vaqt formati"}), 400
+    summary = event_store.summary(camera=request.args.get("camera"), start=start, end=end)
+    return jsonify({"status": "success", "summary": summary, "stats": pipeline_manager.get_event_stats()})
+
+@app.route("/events/<int:event_id>/thumbnail")
+def event_thumbnail(event_id):
+    event = event_store.get(event_id)
+    if event is None or not event["thumbnail"] or not os.path.exists(event["thumbnail"]):
+        return jsonify({"status": "error", "message": "Rasm topilmadi"}), 404
+    return send_file(os.path.abspath(event["thumbnail"]), mimetype="image/jpeg")
+
+@app.route("/streams/<stream_id>", methods=["POST"])
+def start_stream(stream_id):
+    data = request.get_json(silent=True) or {}
+    source = data.get("source")
     
-    success = video_processor.set_camera(camera_index)
+    if source is None or source == "":
+        return jsonify({"status": "error", "message": "Manba ko'rsatilmagan"}), 400
     
-    if success:
-        return jsonify({"status": "success", "message": f"Kamera {camera_index} ochildi"})
+    processor = pipeline_manager.add_stream(stream_id, source)
+    
+    if processor is not None:
+        return jsonify({
+            "status": "success",
+            "message": f"Oqim {stream_id} ochildi",
+            "stream": processor.get_status()
+        })
     else:
-        return jsonify({"status": "error", "message": f"Kamera {camera_index} ochilmadi"}), 400
+        return jsonify({"status": "error", "message": f"Manba {source} ochilmadi"}), 400
+
+@app.route("/streams/<stream_id>", methods=["GET"])
+def stream_status(stream_id):
+    processor = pipeline_manager.get_stream(stream_id)
+    if processor is None:
+        return jsonify({"status": "error", "message": "Oqim topilmadi"}), 404
+    return jsonify({"status": "success", "stream": processor.get_status()})
+
+@app.route("/streams/<stream_id>", methods=["DELETE"])
+def stop_stream(stream_id):
+    if not pipeline_manager.remove_stream(stream_id):
+        return jsonify({"status": "error", "message": "Oqim topilmadi"}), 404
+    return jsonify({"status": "success", "message": f"Oqim {stream_id} to'xtatildi"})
+
+@app.route("/streams/<stream_id>/video_feed")
+def video_feed(stream_id):
+    """?overlay=0 - chizilmagan kadrlar, boxlar har bir qismning X-Detections sarlavhasida;
+    ?tier=w640 (kenglik 640) yoki thumb (kenglik 320) - dashboard to'ri va mobil ko'rinish uchun kichik o'lcham"""
+    processor = pipeline_manager.get_stream(stream_id)
+    if processor is None:
+        return jsonify({"status": "error", "message": "Oqim topilmadi"}), 404
+    tier = request.args.get("tier", "full")
+    if tier not in TIERS:
+        return jsonify({"status": "error", "message": f"Noma'lum tier: {tier} ({', '.join(TIERS)})"}), 400
+    return Response(
+        processor.generate_frames(overlay=request.args.get("overlay", "1") != "0", tier=tier),
+        mimetype="multipart/x-mixed-replace; boundary=frame"
+    )
 
-@app.route("/stop_camera")
-def stop_camera():
-    video_processor.stop_camera()
-    return jsonify({"status": "success", "message": "Kamera to'xtatildi"})
+@app.route("/streams/<stream_id>/detections")
+def stream_detections(stream_id):
+    """overlay=0 tomoshabini uchun oxirgi kadr boxlari (so'rov bilan olish varianti)"""
+    processor = pipeline_manager.get_stream(stream_id)
+    if processor is None:
+        return jsonify({"status": "error", "message": "Oqim topilmadi"}), 404
+    return jsonify({"status": "success", "detections": processor.latest_metadata})
 
 if __name__ == "__main__":
-    app.run(
-        host="0.0.0.0",
-        port=5000,
-        debug=True,
-        use_reloader=False
-    )
\ No newline at end of file
+    try:
+        socketio.run(
+            app,
+            host="0.0.0.0",
+            port=5000,
+            debug=True,
+            use_reloader=False,
+            allow_unsafe_werkzeug=True
+        )
+    finally:
+        # Ochiq treklar ham bazaga yoziladi
+        event_store.stop()
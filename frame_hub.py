@@ -0,0 +1,272 @@
+import asyncio
+import queue
+import threading
+import time
+
+from encoder import QUALITY_STEPS
+
+# Tomoshabin o'tkazuvchanligi shu oraliqda o'lchanadi
+ADAPT_INTERVAL = 1.0
+# Shuncha oraliq ketma-ket ulgurib tursa sifat bir pog'ona oshiriladi
+UPGRADE_WINDOWS = 5
+# Oraliqda chiqarilgan kadrlarning shu ulushi yetkazilsa tomoshabin ulguryapti
+KEEP_UP_RATIO = 0.9
+
+
+def pick_variant(variants, tier, quality):
+    """Aniq (daraja, sifat) bo'lmasa shu darajadagi eng yaqin sifat"""
+    data = variants.get((tier, quality))
+    if data is not None:
+        return data
+    candidates = [key for key in variants if key[0] == tier]
+    if not candidates:
+        return None
+    return variants[min(candidates, key=lambda key: abs(key[1] - quality))]
+
+
+class Subscriber:
+    """Bitta tomoshabin uchun cheklangan navbat - orqada qolsa eski kadrlar tashlanadi"""
+
+    def __init__(self, hub, queue_size=2, tier='full', quality_steps=QUALITY_STEPS):
+        self.hub = hub
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.dropped_frames = 0
+        self.closed = False
+        # Daraja tomoshabin tomonidan tanlanadi, sifat esa o'lchangan o'tkazuvchanlik bo'yicha moslashadi
+        self.tier = tier
+        self.quality_steps = quality_steps
+        self.quality_index = 0
+        # O'tkazuvchanlik o'lchovi (joriy oraliq)
+        self.delivered = 0
+        self.delivered_bytes = 0
+        self.window_start = time.monotonic()
+        self.window_published = 0
+        self.window_delivered = 0
+        self.window_bytes = 0
+        self.clean_windows = 0
+        self.fps = 0.0
+        self.bytes_per_sec = 0.0
+
+    @property
+    def quality(self):
+        return self.quality_steps[self.quality_index]
+
+    def put(self, data):
+        while True:
+            try:
+                self.queue.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped_frames += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=1.0):
+        """Keyingi (JPEG, metadata) yoki vaqt tugasa None"""
+        try:
+            item = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is not None:
+            self.delivered += 1
+            self.delivered_bytes += len(item[0])
+            self.window_delivered += 1
+            self.window_bytes += len(item[0])
+        return item
+
+    def adapt(self, now):
+        """Producer threadidan chaqiriladi: oraliqda yetkazilgan kadrlar chiqarilganlardan kam bo'lsa
+        sifat pasayadi, bir necha oraliq ulgurib tursa qayta oshadi"""
+        self.window_published += 1
+        elapsed = now - self.window_start
+        if elapsed < ADAPT_INTERVAL:
+            return
+        published, delivered = self.window_published, self.window_delivered
+        self.fps = delivered / elapsed
+        self.bytes_per_sec = self.window_bytes / elapsed
+        self.window_start = now
+        self.window_published = self.window_delivered = self.window_bytes = 0
+
+        if delivered < published * KEEP_UP_RATIO:
+            self.clean_windows = 0
+            if self.quality_index < len(self.quality_steps) - 1:
+                self.quality_index += 1
+        else:
+            self.clean_windows += 1
+            if self.clean_windows >= UPGRADE_WINDOWS and self.quality_index > 0:
+                self.quality_index -= 1
+                self.clean_windows = 0
+
+    def close(self):
+        self.closed = True
+        # Kutayotgan o'quvchini uyg'otish
+        self.put(None)
+
+    def __iter__(self):
+        while not self.closed:
+            item = self.get(timeout=1.0)
+            if item is None:
+                continue
+            yield item
+
+    def get_stats(self):
+        return {
+            'tier': self.tier,
+            'quality': self.quality,
+            'fps': round(self.fps, 1),
+            'kbps': round(self.bytes_per_sec * 8 / 1000, 1),
+            'delivered': self.delivered,
+            'dropped': self.dropped_frames,
+        }
+
+
+class AsyncSubscriber(Subscriber):
+    """Event loopdagi tomoshabin (ASGI): tomoshabinga thread ajratilmaydi, kadrlar loopga
+    call_soon_threadsafe orqali uzatiladi va faqat loop threadida navbatga qo'yiladi"""
+
+    def __init__(self, hub, loop, queue_size=2, tier='full'):
+        super().__init__(hub, queue_size, tier=tier)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max(1, int(queue_size)))
+
+    def put(self, data):
+        # Faqat loop threadida chaqiriladi
+        while True:
+            try:
+                self.queue.put_nowait(data)
+                return
+            except asyncio.QueueFull:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped_frames += 1
+                except asyncio.QueueEmpty:
+                    pass
+
+    async def get(self, timeout=1.0):
+        try:
+            item = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if item is not None:
+            self.delivered += 1
+            self.delivered_bytes += len(item[0])
+            self.window_delivered += 1
+            self.window_bytes += len(item[0])
+        return item
+
+    def close(self):
+        self.closed = True
+        try:
+            self.loop.call_soon_threadsafe(self.put, None)
+        except RuntimeError:
+            # Loop allaqachon yopilgan
+            pass
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        while not self.closed:
+            item = await self.get(timeout=1.0)
+            if item is None:
+                continue
+            yield item
+
+
+def deliver(items):
+    """Loop threadida: bitta publish dan shu loopdagi barcha async obunachilarga"""
+    for subscriber, item in items:
+        if not subscriber.closed:
+            subscriber.put(item)
+
+
+class FrameHub:
+    """Bir marta kodlangan kadrni barcha obunachilarga tarqatish"""
+
+    def __init__(self, queue_size=2):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        # ((daraja, sifat) -> JPEG, metadata JSON)
+        self.latest = None
+        self.published = 0
+
+    def subscribe(self, queue_size=None, tier='full'):
+        return self._add(Subscriber(self, queue_size or self.queue_size, tier=tier))
+
+    def subscribe_async(self, loop, queue_size=None, tier='full'):
+        """Loop ichidan chaqiriladi (ASGI oqim endpointlari)"""
+        return self._add(AsyncSubscriber(self, loop, queue_size or self.queue_size, tier=tier))
+
+    def _add(self, subscriber):
+        with self.lock:
+            self.subscribers.add(subscriber)
+            latest = self.latest
+        # Yangi tomoshabin darhol oxirgi kadrni ko'radi
+        if latest is not None:
+            variants, metadata = latest
+            data = pick_variant(variants, subscriber.tier, subscriber.quality)
+            if data is not None:
+                subscriber.put((data, metadata))
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+        subscriber.closed = True
+
+    def wanted_variants(self):
+        """Hozirgi obunachilarga kerak bo'lgan (daraja, sifat) juftliklari - faqat shular kodlanadi"""
+        with self.lock:
+            return {(subscriber.tier, subscriber.quality) for subscriber in self.subscribers}
+
+    def publish(self, variants, metadata=None):
+        """variants: encoder.encode_variants natijasi; metadata - kadr detectionlari (JSON baytlari)"""
+        if not variants:
+            return
+        now = time.monotonic()
+        with self.lock:
+            self.latest = (variants, metadata)
+            self.published += 1
+            subscribers = list(self.subscribers)
+        # Async obunachilar loop bo'yicha guruhlanadi: yuzlab tomoshabinga bitta loop chaqiruvi
+        by_loop = {}
+        for subscriber in subscribers:
+            data = pick_variant(variants, subscriber.tier, subscriber.quality)
+            if data is None:
+                continue
+            if isinstance(subscriber, AsyncSubscriber):
+                by_loop.setdefault(subscriber.loop, []).append((subscriber, (data, metadata)))
+            else:
+                subscriber.put((data, metadata))
+            subscriber.adapt(now)
+        for loop, items in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver, items)
+            except RuntimeError:
+                pass
+
+    def close(self):
+        """Barcha obunachilarni yopish (masalan, kamera to'xtatilganda)"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.subscribers.clear()
+            self.latest = None
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def subscriber_count(self):
+        with self.lock:
+            return len(self.subscribers)
+
+    def get_stats(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        return {
+            'published': self.published,
+            'subscribers': len(subscribers),
+            'dropped': sum(s.dropped_frames for s in subscribers),
+            'viewers': [s.get_stats() for s in subscribers],
+        }
@@ -0,0 +1,150 @@
+import numpy as np
+import supervision as sv
+
+# Faqat birinchi modeldan suppressionsiz olinadigan classlar
+PASSTHROUGH_CLASSES = {'Person': (0,)}
+# Barcha modellardan yig'ilib, class ichida birlashtiriladigan classlar (tartib muhim)
+FUSED_CLASSES = ['Helmet', 'No-Helmet', 'Vest', 'No-Vest', 'Person-Fall', 'Fire', 'Smoke']
+
+
+def box_iou_matrix(boxes_a, boxes_b):
+    """Juftlik IoU matritsasi (N, M) - compute_iou bilan bir xil formula"""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+
+    zero = np.zeros((), dtype=boxes_a.dtype)
+    inter = np.maximum(zero, x2 - x1) * np.maximum(zero, y2 - y1)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+
+    iou = np.zeros_like(inter)
+    np.divide(inter, union, out=iou, where=union > 0)
+    return iou
+
+
+class FusionEngine:
+    """Bir nechta model detectionlarini yagona label fazosida vektorlashtirib birlashtirish"""
+
+    def __init__(self, registry, model_keys, fused_classes=FUSED_CLASSES, passthrough=PASSTHROUGH_CLASSES,
+                 iou_threshold=0.5, policy='nms'):
+        if policy not in ('nms', 'wbf'):
+            raise ValueError(f"Noma'lum fusion policy: {policy}")
+        self.policy = policy
+        self.iou_threshold = iou_threshold
+        # Yagona label fazosi ClassRegistry da: model tartibi model_keys bo'yicha
+        self.registry = registry
+        self.model_keys = list(model_keys)
+        self.num_models = len(self.model_keys)
+
+        size = len(registry)
+        # Chiqishdagi tartib: -1 - class tashlanadi
+        self.rank = np.full(size, -1, dtype=np.int64)
+        # Qaysi model qaysi classni bera oladi
+        self.allowed = np.zeros((size, self.num_models), dtype=bool)
+        # Class ichida suppression/fusion qilinadimi
+        self.fused = np.zeros(size, dtype=bool)
+
+        rank = 0
+        for name, sources in passthrough.items():
+            class_id = registry.get_id(name)
+            if class_id >= 0:
+                self.rank[class_id] = rank
+                self.allowed[class_id, list(sources)] = True
+            rank += 1
+        for name in fused_classes:
+            class_id = registry.get_id(name)
+            if class_id >= 0:
+                self.rank[class_id] = rank
+                self.allowed[class_id, :] = True
+                self.fused[class_id] = True
+            rank += 1
+
+    def to_unified(self, model_index, class_ids):
+        return self.registry.to_global(self.model_keys[model_index], class_ids)
+
+    def suppress(self, xyxy, confidence, class_ids):
+        """Class ichida: o'zidan ishonchliroq va IoU > threshold bo'lgan quti bo'lsa tashlanadi"""
+        iou = box_iou_matrix(xyxy, xyxy)
+        same_class = class_ids[:, None] == class_ids[None, :]
+        stronger = confidence[None, :] > confidence[:, None]
+        return ~np.any(same_class & stronger & (iou > self.iou_threshold), axis=1)
+
+    def weighted_box_fusion(self, xyxy, confidence, class_ids):
+        """Mos qutilarni ishonch bo'yicha o'rtacha qilib birlashtirish (WBF)"""
+        order = np.argsort(-confidence, kind='stable')
+        iou = box_iou_matrix(xyxy, xyxy)
+        cluster_of = np.full(len(xyxy), -1, dtype=np.int64)
+        leaders = []
+
+        for i in order:
+            if leaders:
+                candidates = np.asarray(leaders)
+                matches = candidates[(class_ids[candidates] == class_ids[i]) & (iou[i, candidates] > self.iou_threshold)]
+                if len(matches):
+                    cluster_of[i] = cluster_of[matches[0]]
+                    continue
+            cluster_of[i] = len(leaders)
+            leaders.append(i)
+
+        leaders = np.asarray(leaders, dtype=np.int64)
+        weights = np.zeros((len(leaders), len(xyxy)), dtype=np.float64)
+        weights[cluster_of, np.arange(len(xyxy))] = confidence
+        totals = weights.sum(axis=1)
+        counts = np.count_nonzero(weights, axis=1)
+
+        fused_xyxy = (weights @ xyxy.astype(np.float64)) / totals[:, None]
+        fused_conf = totals / counts * np.minimum(counts, self.num_models) / self.num_models
+        return leaders, fused_xyxy.astype(xyxy.dtype), fused_conf.astype(confidence.dtype)
+
+    def fuse(self, detections_list):
+        """Modellar tartibida berilgan sv.Detections ro'yxatini birlashtirish"""
+        parts = [(m, d) for m, d in enumerate(detections_list) if len(d) > 0]
+        if not parts:
+            return sv.Detections.empty()
+
+        xyxy = np.concatenate([d.xyxy for _, d in parts])
+        confidence = np.concatenate([d.confidence for _, d in parts])
+        class_ids = np.concatenate([self.to_unified(m, d.class_id) for m, d in parts])
+        model_index = np.concatenate([np.full(len(d), m, dtype=np.int64) for m, d in parts])
+        position = np.concatenate([np.arange(len(d)) for _, d in parts])
+
+        # Registrda yo'q (-1) classlar indekslashdan oldin tashlanadi
+        valid = class_ids >= 0
+        valid[valid] = (self.rank[class_ids[valid]] >= 0) & self.allowed[class_ids[valid], model_index[valid]]
+        xyxy, confidence, class_ids = xyxy[valid], confidence[valid], class_ids[valid]
+        model_index, position = model_index[valid], position[valid]
+
+        fused = self.fused[class_ids]
+        if np.any(fused):
+            idx = np.flatnonzero(fused)
+            if self.policy == 'nms':
+                keep = np.ones(len(xyxy), dtype=bool)
+                keep[idx] = self.suppress(xyxy[idx], confidence[idx], class_ids[idx])
+                xyxy, confidence, class_ids = xyxy[keep], confidence[keep], class_ids[keep]
+                model_index, position = model_index[keep], position[keep]
+            else:
+                leaders, fused_xyxy, fused_conf = self.weighted_box_fusion(xyxy[idx], confidence[idx], class_ids[idx])
+                xyxy = xyxy.copy()
+                confidence = confidence.copy()
+                xyxy[idx[leaders]] = fused_xyxy
+                confidence[idx[leaders]] = fused_conf
+                keep = ~fused
+                keep[idx[leaders]] = True
+                xyxy, confidence, class_ids = xyxy[keep], confidence[keep], class_ids[keep]
+                model_index, position = model_index[keep], position[keep]
+
+        if len(xyxy) == 0:
+            return sv.Detections.empty()
+
+        # Tartib: class guruhi, keyin model, keyin model ichidagi o'rni
+        order = np.lexsort((position, model_index, self.rank[class_ids]))
+        class_ids = class_ids[order]
+        return sv.Detections(
+            xyxy=xyxy[order],
+            confidence=confidence[order],
+            class_id=class_ids,
+            data={'class_name': self.registry.names_array[class_ids].astype(str)}
+        )
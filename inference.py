@@ -0,0 +1,263 @@
+import threading
+import time
+import queue
+from collections import Counter, defaultdict, deque
+
+import numpy as np
+
+# Manba shuncha kadr oralig'i ichida kadr yubormasa (harakat filtri, tomoshabin yo'q) batch uni kutmaydi
+IDLE_INTERVALS = 1.5
+# Oralig'i hali o'lchanmagan manba uchun
+DEFAULT_INTERVAL = 1.0
+
+
+class InferenceRequest:
+    def __init__(self, stream_id, frame, imgsz):
+        self.stream_id = stream_id
+        self.frame = frame
+        self.imgsz = imgsz
+        self.submitted_at = time.perf_counter()
+        self.finished_at = None
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"Inference kutish vaqti tugadi: {self.stream_id}")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class BatchScheduler:
+    """Barcha manbalarning so'nggi kadrlarini yig'ib, bitta batch qilib modelga berish"""
+
+    def __init__(self, model, imgsz=640, max_batch_size=8, max_wait_ms=15, history_size=200):
+        self.model = model
+        self.imgsz = imgsz
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.requests = queue.Queue()
+        self.active_sources = set()
+        # Manba -> oxirgi kadr yuborilgan vaqt va kadrlar oralig'i (EMA)
+        self.last_submit = {}
+        self.submit_interval = {}
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+        # Statistika
+        self.batch_sizes = Counter()
+        self.inference_times = deque(maxlen=history_size)
+        self.source_latency = defaultdict(lambda: deque(maxlen=history_size))
+        self.source_wait = defaultdict(lambda: deque(maxlen=history_size))
+        self.source_frames = Counter()
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return self
+            self.running = True
+            self.thread = threading.Thread(target=self._loop, name="batch-scheduler", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.requests.put(None)
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def register(self, stream_id):
+        with self.lock:
+            self.active_sources.add(stream_id)
+
+    def unregister(self, stream_id):
+        with self.lock:
+            self.active_sources.discard(stream_id)
+            self.last_submit.pop(stream_id, None)
+            self.submit_interval.pop(stream_id, None)
+
+    def submit(self, stream_id, frame, imgsz=None):
+        request = InferenceRequest(stream_id, frame, imgsz or self.imgsz)
+        with self.lock:
+            last = self.last_submit.get(stream_id)
+            if last is not None:
+                interval = request.submitted_at - last
+                previous = self.submit_interval.get(stream_id)
+                self.submit_interval[stream_id] = interval if previous is None else previous + 0.2 * (interval - previous)
+            self.last_submit[stream_id] = request.submitted_at
+        self.requests.put(request)
+        return request
+
+    def infer(self, stream_id, frame, imgsz=None, timeout=10.0):
+        """Kadrni navbatga qo'yib, natijani kutish (sv.Detections)"""
+        if not self.running:
+            self.start()
+        return self.submit(stream_id, frame, imgsz).wait(timeout)
+
+    def _collect_batch(self, first):
+        batch = [first]
+        with self.lock:
+            # Har bir faol manbadan bittadan kadr kutiladi - ro'yxatdan o'tgan, lekin hozir kadr
+            # yubormayotgan manbalar sanalmaydi, aks holda har bir batch max_wait ni to'liq kutadi
+            expected = min(self.max_batch_size, max(1, self.expected_sources(first)))
+        deadline = first.submitted_at + self.max_wait
+
+        while len(batch) < expected:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self.running = False
+                break
+            batch.append(request)
+        return batch
+
+    def expected_sources(self, first):
+        """Navbatdagi kadri kutilayotgan manbalar soni (lock ostida chaqiriladi)"""
+        count = 0
+        for stream_id in self.active_sources | {first.stream_id}:
+            last = self.last_submit.get(stream_id)
+            if last is None:
+                continue
+            interval = self.submit_interval.get(stream_id, DEFAULT_INTERVAL)
+            if first.submitted_at - last <= interval * IDLE_INTERVALS + self.max_wait:
+                count += 1
+        return count
+
+    def _loop(self):
+        while self.running:
+            first = self.requests.get()
+            if first is None:
+                continue
+
+            batch = self._collect_batch(first)
+
+            # Manbalar turli imgsz so'rashi mumkin - har bir o'lcham alohida batch
+            groups = defaultdict(list)
+            for i, request in enumerate(batch):
+                groups[request.imgsz].append(i)
+
+            start = time.perf_counter()
+            results = [None] * len(batch)
+            error = None
+            try:
+                for imgsz, indices in groups.items():
+                    group_results = self.model.predict([batch[i].frame for i in indices], imgsz=imgsz)
+                    for i, result in zip(indices, group_results):
+                        results[i] = result
+            except Exception as e:
+                error = e
+            finished = time.perf_counter()
+
+            with self.lock:
+                self.batch_sizes[len(batch)] += 1
+                self.inference_times.append(finished - start)
+                for request in batch:
+                    self.source_frames[request.stream_id] += 1
+                    self.source_wait[request.stream_id].append(start - request.submitted_at)
+                    self.source_latency[request.stream_id].append(finished - request.submitted_at)
+
+            # Natijalarni har bir manbaga qaytarish
+            for i, request in enumerate(batch):
+                request.finished_at = finished
+                if error is not None:
+                    request.error = error
+                else:
+                    request.result = results[i]
+                request.done.set()
+
+        # To'xtatilganda kutayotganlarni bo'shatish
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request.error = RuntimeError("Scheduler to'xtatildi")
+                request.done.set()
+
+    def get_stats(self):
+        now = time.perf_counter()
+        with self.lock:
+            total_batches = sum(self.batch_sizes.values())
+            total_frames = sum(size * count for size, count in self.batch_sizes.items())
+            sources = {}
+            for stream_id, latencies in self.source_latency.items():
+                values = np.array(latencies) * 1000
+                waits = np.array(self.source_wait[stream_id]) * 1000
+                sources[str(stream_id)] = {
+                    'frames': self.source_frames[stream_id],
+                    'latency_ms_mean': round(float(values.mean()), 2) if len(values) else 0.0,
+                    'latency_ms_p95': round(float(np.percentile(values, 95)), 2) if len(values) else 0.0,
+                    'queue_wait_ms_mean': round(float(waits.mean()), 2) if len(waits) else 0.0,
+                }
+            inference_ms = np.array(self.inference_times) * 1000
+            return {
+                'batches': total_batches,
+                'mean_batch_size': round(total_frames / total_batches, 2) if total_batches else 0.0,
+                'batch_sizes': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                'inference_ms_mean': round(float(inference_ms.mean()), 2) if len(inference_ms) else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'active_sources': len(self.active_sources),
+                'submitting_sources': sum(
+                    1 for stream_id in self.active_sources
+                    if stream_id in self.last_submit and
+                    now - self.last_submit[stream_id] <= self.submit_interval.get(stream_id, DEFAULT_INTERVAL) * IDLE_INTERVALS
+                ),
+                'sources': sources,
+            }
+
+
+class MultiModelExecutor:
+    """Bitta kadrni bir nechta modelda parallel ishlatish (har bir model o'z scheduler threadida)"""
+
+    def __init__(self, schedulers, names=None, history_size=200):
+        self.schedulers = list(schedulers)
+        self.names = list(names) if names else [f"model{i + 1}" for i in range(len(self.schedulers))]
+        self.lock = threading.Lock()
+        self.model_times = {name: deque(maxlen=history_size) for name in self.names}
+        self.frame_times = deque(maxlen=history_size)
+
+    def run(self, stream_id, frame, imgsz=None, timeout=10.0):
+        """Barcha modellarga bir vaqtda yuborib, natijalarni modellar tartibida qaytarish"""
+        start = time.perf_counter()
+        requests = [scheduler.submit(stream_id, frame, imgsz) for scheduler in self.schedulers]
+        results = [request.wait(timeout) for request in requests]
+        finished = time.perf_counter()
+
+        with self.lock:
+            self.frame_times.append(finished - start)
+            for name, request in zip(self.names, requests):
+                self.model_times[name].append(request.finished_at - request.submitted_at)
+        return results
+
+    def get_stats(self):
+        with self.lock:
+            models = {}
+            for name, times in self.model_times.items():
+                values = np.array(times) * 1000
+                models[name] = {
+                    'mean_ms': round(float(values.mean()), 2) if len(values) else 0.0,
+                    'p95_ms': round(float(np.percentile(values, 95)), 2) if len(values) else 0.0,
+                }
+            frame_ms = np.array(self.frame_times) * 1000
+
+        frame_mean = float(frame_ms.mean()) if len(frame_ms) else 0.0
+        sequential = sum(model['mean_ms'] for model in models.values())
+        slowest = max(models, key=lambda name: models[name]['mean_ms']) if models else None
+        return {
+            'frame_ms_mean': round(frame_mean, 2),
+            # Ketma-ket ishlatilganda kutiladigan vaqt bilan solishtirish
+            'sequential_ms_estimate': round(sequential, 2),
+            'speedup': round(sequential / frame_mean, 2) if frame_mean else 0.0,
+            'slowest_model': slowest,
+            'models': models,
+        }
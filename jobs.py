@@ -0,0 +1,276 @@
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+# (ustun, ta'rif) - avvalgi versiyada yaratilgan bazalar uchun
+MIGRATIONS = [
+    ('output_summary', 'TEXT'),
+    ('cache_key', 'TEXT'),
+    ('cached', 'INTEGER NOT NULL DEFAULT 0'),
+]
+
+class JobStore:
+    """Video joblari SQLite da: server qayta ishga tushsa ham navbat va holat saqlanadi"""
+
+    def __init__(self, db_path='jobs.db'):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    video_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    total_frames INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    output_video TEXT,
+                    output_detections TEXT,
+                    output_summary TEXT,
+                    cache_key TEXT,
+                    cached INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            # Eski bazalarga keyin qo'shilgan ustunlar
+            existing = {row['name'] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+            for column, definition in MIGRATIONS:
+                if column not in existing:
+                    self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def create(self, video_path, status='queued', **fields):
+        now = time.time()
+        fields.update(id=uuid.uuid4().hex[:12], video_path=video_path, status=status, created_at=now, updated_at=now)
+        columns = ', '.join(fields)
+        placeholders = ', '.join('?' for _ in fields)
+        with self.lock, self.conn:
+            self.conn.execute(f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", tuple(fields.values()))
+        return self.get(fields['id'])
+
+    def update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self.lock, self.conn:
+            self.conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def list(self, status=None, limit=100):
+        query = "SELECT * FROM jobs"
+        params = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self.lock:
+            rows = self.conn.execute(query, (*params, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim_next(self):
+        """Eng eski navbatdagi jobni atomar ravishda 'running' ga o'tkazib qaytarish"""
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            updated = self.conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (time.time(), row['id'])
+            )
+            if updated.rowcount == 0:
+                return None
+        return self.get(row['id'])
+
+    def find_active(self, cache_key):
+        """Shu natija uchun navbatda turgan yoki ishlayotgan job"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM jobs WHERE cache_key = ? AND status IN ('queued', 'running') ORDER BY created_at LIMIT 1",
+                (cache_key,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def cancel_queued(self, job_id):
+        with self.lock, self.conn:
+            updated = self.conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+        return updated.rowcount > 0
+
+    def requeue_interrupted(self):
+        """Server to'satdan to'xtaganda 'running' qolgan joblar checkpointdan davom etadi"""
+        with self.lock, self.conn:
+            updated = self.conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                (time.time(),)
+            )
+        return updated.rowcount
+
+
+class JobQueue:
+    """JobStore navbatini OfflineEngine orqali ketma-ket bajaruvchi fon worker"""
+
+    def __init__(self, engine, store, cache=None, poll_interval=1.0, progress_interval=2.0):
+        self.engine = engine
+        self.store = store
+        # Berilsa bir xil video + model + parametrlar qayta ishlanmaydi
+        self.cache = cache
+        self.poll_interval = poll_interval
+        # Progress bazaga shu oraliqdan tez-tez yozilmaydi
+        self.progress_interval = progress_interval
+        self.running = False
+        self.thread = None
+        self.current = None
+        self.persisted_status = None
+        self.persisted_at = 0.0
+
+    def start(self):
+        if self.running:
+            return self
+        resumed = self.store.requeue_interrupted()
+        if resumed:
+            print(f"{resumed} ta to'xtab qolgan job checkpointdan davom ettiriladi")
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name="job-queue", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        current = self.current
+        if current is not None:
+            # Job 'running' holatida qoladi - keyingi ishga tushishda davom etadi
+            self.engine.cancel(current.id)
+        if self.thread is not None:
+            self.thread.join(timeout=5.0)
+            self.thread = None
+
+    def cache_key(self, video_path, content_hash=None):
+        content_hash = content_hash or self.cache.file_hash(video_path)
+        return self.cache.make_key(content_hash, self.engine.model_path, self.engine.result_params())
+
+    def submit(self, video_path, content_hash=None):
+        if self.cache is None:
+            return self.store.create(video_path)
+
+        key = self.cache_key(video_path, content_hash)
+        entry = self.cache.get(key)
+        if entry is None:
+            # Xuddi shu video allaqachon qayta ishlanayotgan bo'lsa, o'sha job qaytariladi
+            return self.store.find_active(key) or self.store.create(video_path, cache_key=key)
+
+        # Keshdan darhol tayyor natija
+        files = entry['files']
+        return self.store.create(
+            video_path,
+            status='done',
+            stage='done',
+            progress=1.0,
+            total_frames=(entry['summary'] or {}).get('total_frames', 0),
+            output_video=files['video'],
+            output_detections=files['detections'],
+            output_summary=files['summary'],
+            cache_key=key,
+            cached=1
+        )
+
+    def is_cached(self, video_path):
+        """Faqat xeshi avval hisoblangan fayllar uchun - ro'yxatda katta fayllar qayta o'qilmaydi"""
+        if self.cache is None:
+            return False
+        content_hash = self.cache.known_hash(video_path)
+        return content_hash is not None and self.cache.contains(self.cache_key(video_path, content_hash))
+
+    def get(self, job_id):
+        row = self.store.get(job_id)
+        if row is None:
+            return None
+        current = self.current
+        if current is not None and current.id == job_id:
+            row['live'] = current.get_status()
+        return row
+
+    def list(self, status=None, limit=100):
+        return self.store.list(status=status, limit=limit)
+
+    def cancel(self, job_id):
+        if self.store.cancel_queued(job_id):
+            return True
+        current = self.current
+        if current is not None and current.id == job_id:
+            return self.engine.cancel(job_id)
+        return False
+
+    def _persist(self, job, force=False):
+        # Bosqich o'zgarishi darhol, progress esa siyrak yoziladi
+        now = time.time()
+        if not force and job.status == self.persisted_status and now - self.persisted_at < self.progress_interval:
+            return
+        self.persisted_status = job.status
+        self.persisted_at = now
+        self.store.update(job.id, stage=job.status, progress=round(job.progress, 4), total_frames=job.total_frames)
+
+    def _worker(self):
+        while self.running:
+            row = self.store.claim_next()
+            if row is None:
+                time.sleep(self.poll_interval)
+                continue
+            self._run(row)
+
+    def _run(self, row):
+        job = self.engine.create_job(row['video_path'], job_id=row['id'])
+        job.listener = self._persist
+        self.current = job
+        try:
+            self.engine.run(job)
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            self.current = None
+            self.engine.remove_job(job.id)
+
+        if job.status == 'cancelled' and not self.running:
+            # Server to'xtatilmoqda - bekor emas, keyingi safar davom etadi
+            return
+        fields = {'status': job.status, 'error': job.error}
+        try:
+            self._persist(job, force=True)
+            if job.status == 'done':
+                fields.update(output_video=job.output_video, output_detections=job.output_detections,
+                              output_summary=job.output_summary)
+                self._cache_outputs(job, row)
+            elif job.status == 'cancelled':
+                shutil.rmtree(job.work_dir, ignore_errors=True)
+        finally:
+            # Yakuniy holat har doim yoziladi - aks holda job 'running' da qolib har safar qayta ishlanadi
+            self.store.update(job.id, **fields)
+        print(f"Job {job.id}: {job.status}")
+
+    def _cache_outputs(self, job, row):
+        """Keshga yozish xatoligi tayyor natijani buzmaydi"""
+        if self.cache is None or not row['cache_key']:
+            return
+        try:
+            with open(job.output_summary) as f:
+                summary = json.load(f)
+            self.cache.put(row['cache_key'], job.outputs(), summary=summary, source=row['video_path'])
+        except Exception as e:
+            print(f"Job {job.id}: natijani keshga yozish xatolik: {e}")
@@ -0,0 +1,346 @@
+import asyncio
+import threading
+import time
+
+from flask import request
+
+from encoder import TIERS
+
+# Tasdiqlanmagan kadrlar soni shundan oshsa yangi kadr yuborilmaydi (o'tkazib yuboriladi)
+DEFAULT_WINDOW = 2
+# Shuncha vaqtda tasdiq kelmagan kadr yo'qolgan deb hisoblanadi
+ACK_TIMEOUT = 5.0
+STATUS_INTERVAL = 1.0
+
+
+def parse_watch(pipeline_manager, data, default_window):
+    """watch so'rovi: (processor, hub, tier, window) yoki xatolik javobi"""
+    data = data or {}
+    processor = pipeline_manager.get_stream(data.get('stream'))
+    if processor is None or processor.current_source is None:
+        return None, {'status': 'error', 'message': 'Oqim topilmadi'}
+    tier = data.get('tier', 'full')
+    if tier not in TIERS:
+        return None, {'status': 'error', 'message': f"Noma'lum tier: {tier}"}
+    window = max(1, min(int(data.get('window', default_window)), 8))
+    hub = processor.hub if data.get('overlay', True) else processor.raw_hub
+    return (processor, hub, tier, window), None
+
+
+def frame_header(client, seq, metadata):
+    return {
+        'stream': client.stream_id,
+        'seq': seq,
+        'meta': metadata.decode() if metadata else None,
+    }
+
+
+def alert_info(alert):
+    return {
+        'stream': alert.stream_id,
+        'class_name': alert.class_name,
+        'tracker_id': alert.tracker_id,
+        'caption': alert.caption,
+        'time': alert.created_at,
+    }
+
+
+class LiveClient:
+    """Bitta Socket.IO ulanishi: oqim obunasi va tasdiqlangan (ack) kadrlar oynasi"""
+
+    def __init__(self, sid, stream_id, processor, hub, subscriber, window=DEFAULT_WINDOW):
+        self.sid = sid
+        self.stream_id = stream_id
+        self.processor = processor
+        self.hub = hub
+        self.subscriber = subscriber
+        self.window = window
+        self.active = True
+        # seq -> yuborilgan vaqt
+        self.in_flight = {}
+        self.condition = threading.Condition()
+        self.seq = 0
+        # Statistika
+        self.sent = 0
+        self.acked = 0
+        self.timeouts = 0
+        self.rtt = None
+
+    def wait_credit(self, timeout):
+        """Oynada joy bo'lguncha kutish; kutish paytida kelgan kadrlar obunachi navbatida ustma-ust yoziladi"""
+        with self.condition:
+            now = time.monotonic()
+            for seq, sent_at in list(self.in_flight.items()):
+                if now - sent_at > ACK_TIMEOUT:
+                    del self.in_flight[seq]
+                    self.timeouts += 1
+            if len(self.in_flight) < self.window:
+                return True
+            self.condition.wait(timeout)
+            return self.active and len(self.in_flight) < self.window
+
+    def begin_send(self):
+        with self.condition:
+            self.seq += 1
+            self.in_flight[self.seq] = time.monotonic()
+            self.sent += 1
+            return self.seq
+
+    def ack(self, seq):
+        with self.condition:
+            sent_at = self.in_flight.pop(seq, None)
+            if sent_at is not None:
+                self.acked += 1
+                rtt = time.monotonic() - sent_at
+                self.rtt = rtt if self.rtt is None else self.rtt + 0.1 * (rtt - self.rtt)
+            self.condition.notify()
+
+    def close(self):
+        self.active = False
+        with self.condition:
+            self.condition.notify_all()
+        self.hub.unsubscribe(self.subscriber)
+
+    def get_stats(self):
+        return {
+            'stream': self.stream_id,
+            'tier': self.subscriber.tier,
+            'quality': self.subscriber.quality,
+            'window': self.window,
+            'in_flight': len(self.in_flight),
+            'sent': self.sent,
+            'acked': self.acked,
+            # Sekin mijoz uchun yuborilmay o'tkazib yuborilgan kadrlar
+            'skipped': self.subscriber.dropped_frames,
+            'timeouts': self.timeouts,
+            'rtt_ms': round(self.rtt * 1000, 1) if self.rtt is not None else None,
+        }
+
+
+class LiveChannel:
+    """Socket.IO kanali: binary JPEG kadrlar + detection/sonlar metadata, ack bilan oqim nazorati,
+    jonli ogohlantirishlar va oqim holati - UI alohida endpointlarni so'rab turmaydi.
+
+    Mijoz -> server: watch {stream, tier, overlay, window}, unwatch
+    Server -> mijoz: frame (header, jpeg, ack), status, alert (info, jpeg), stream_end"""
+
+    def __init__(self, socketio, pipeline_manager, window=DEFAULT_WINDOW, status_interval=STATUS_INTERVAL):
+        self.socketio = socketio
+        self.pipeline_manager = pipeline_manager
+        self.window = window
+        self.status_interval = status_interval
+        # sid -> LiveClient
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.alerts_sent = 0
+
+        socketio.on_event('watch', self.on_watch)
+        socketio.on_event('unwatch', self.on_unwatch)
+        socketio.on_event('disconnect', self.on_disconnect)
+
+    def on_watch(self, data):
+        watch, error = parse_watch(self.pipeline_manager, data, self.window)
+        if error is not None:
+            return error
+        processor, hub, tier, window = watch
+
+        sid = request.sid
+        self.stop_client(sid)
+        processor.start_producer()
+        # Navbatda faqat eng so'nggi kadr - oyna to'lganda eskisi tashlanadi
+        subscriber = hub.subscribe(queue_size=1, tier=tier)
+        client = LiveClient(sid, processor.stream_id, processor, hub, subscriber, window=window)
+        with self.lock:
+            self.clients[sid] = client
+        self.socketio.start_background_task(self._send_loop, client)
+        return {'status': 'success', 'stream': processor.get_status()}
+
+    def on_unwatch(self, data=None):
+        self.stop_client(request.sid)
+        return {'status': 'success'}
+
+    def on_disconnect(self, *args):
+        self.stop_client(request.sid)
+
+    def stop_client(self, sid):
+        with self.lock:
+            client = self.clients.pop(sid, None)
+        if client is not None:
+            client.close()
+
+    def _send_loop(self, client):
+        last_status = 0.0
+        try:
+            while client.active and not client.subscriber.closed:
+                now = time.monotonic()
+                if now - last_status >= self.status_interval:
+                    last_status = now
+                    self.socketio.emit('status', client.processor.get_status(), to=client.sid)
+
+                if not client.wait_credit(timeout=0.5):
+                    continue
+                item = client.subscriber.get(timeout=0.5)
+                if item is None:
+                    continue
+                jpeg, metadata = item
+                seq = client.begin_send()
+                header = frame_header(client, seq, metadata)
+                self.socketio.emit('frame', (header, jpeg), to=client.sid,
+                                   callback=lambda *args, seq=seq: client.ack(seq))
+        except Exception as e:
+            print(f"WebSocket yuborish xatolik ({client.sid}): {e}")
+        finally:
+            if client.subscriber.closed and client.active:
+                # Oqim to'xtatildi - mijoz MJPEG dagi kabi uzilishni ko'radi
+                self.socketio.emit('stream_end', {'stream': client.stream_id}, to=client.sid)
+            with self.lock:
+                if self.clients.get(client.sid) is client:
+                    del self.clients[client.sid]
+            client.close()
+
+    def publish_alerts(self, alerts):
+        """AlertDispatcher tinglovchisi: barcha ulangan mijozlarga rasm bilan"""
+        for alert in alerts:
+            self.socketio.emit('alert', (alert_info(alert), alert.image or b''))
+            self.alerts_sent += 1
+
+    def get_stats(self):
+        with self.lock:
+            clients = list(self.clients.values())
+        return {
+            'clients': [client.get_stats() for client in clients],
+            'alerts_sent': self.alerts_sent,
+        }
+
+
+class AsyncLiveClient(LiveClient):
+    """Event loopdagi mijoz (ASGI): oyna kutish thread bloklamaydi"""
+
+    def __init__(self, sid, stream_id, processor, hub, subscriber, window=DEFAULT_WINDOW):
+        super().__init__(sid, stream_id, processor, hub, subscriber, window=window)
+        self.credit = asyncio.Event()
+        self.task = None
+
+    async def wait_credit(self, timeout):
+        with self.condition:
+            now = time.monotonic()
+            for seq, sent_at in list(self.in_flight.items()):
+                if now - sent_at > ACK_TIMEOUT:
+                    del self.in_flight[seq]
+                    self.timeouts += 1
+            if len(self.in_flight) < self.window:
+                return True
+            self.credit.clear()
+        try:
+            await asyncio.wait_for(self.credit.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.active and len(self.in_flight) < self.window
+
+    def ack(self, seq):
+        super().ack(seq)
+        self.credit.set()
+
+    def close(self):
+        super().close()
+        self.credit.set()
+
+
+class AsyncLiveChannel:
+    """LiveChannel ning python-socketio AsyncServer (ASGI) varianti: mijozlar threadsiz, bitta event loopda.
+    Hodisalar va xabarlar formati LiveChannel bilan bir xil - index.html o'zgarmaydi"""
+
+    def __init__(self, sio, pipeline_manager, window=DEFAULT_WINDOW, status_interval=STATUS_INTERVAL):
+        self.sio = sio
+        self.pipeline_manager = pipeline_manager
+        self.window = window
+        self.status_interval = status_interval
+        # sid -> AsyncLiveClient (faqat loop threadida o'zgaradi)
+        self.clients = {}
+        # Ogohlantirishlar dispatcher threadidan shu loopga uzatiladi
+        self.loop = None
+        self.alerts_sent = 0
+
+        sio.on('connect', self.on_connect)
+        sio.on('watch', self.on_watch)
+        sio.on('unwatch', self.on_unwatch)
+        sio.on('disconnect', self.on_disconnect)
+
+    async def on_connect(self, sid, environ, auth=None):
+        self.loop = asyncio.get_running_loop()
+
+    async def on_watch(self, sid, data):
+        watch, error = parse_watch(self.pipeline_manager, data, self.window)
+        if error is not None:
+            return error
+        processor, hub, tier, window = watch
+
+        self.stop_client(sid)
+        processor.start_producer()
+        subscriber = hub.subscribe_async(asyncio.get_running_loop(), queue_size=1, tier=tier)
+        client = AsyncLiveClient(sid, processor.stream_id, processor, hub, subscriber, window=window)
+        self.clients[sid] = client
+        client.task = asyncio.ensure_future(self._send_loop(client))
+        return {'status': 'success', 'stream': processor.get_status()}
+
+    async def on_unwatch(self, sid, data=None):
+        self.stop_client(sid)
+        return {'status': 'success'}
+
+    async def on_disconnect(self, sid, *args):
+        self.stop_client(sid)
+
+    def stop_client(self, sid):
+        client = self.clients.pop(sid, None)
+        if client is not None:
+            client.close()
+
+    async def _send_loop(self, client):
+        last_status = 0.0
+        try:
+            while client.active and not client.subscriber.closed:
+                now = time.monotonic()
+                if now - last_status >= self.status_interval:
+                    last_status = now
+                    await self.sio.emit('status', client.processor.get_status(), to=client.sid)
+
+                if not await client.wait_credit(timeout=0.5):
+                    continue
+                item = await client.subscriber.get(timeout=0.5)
+                if item is None:
+                    continue
+                jpeg, metadata = item
+                seq = client.begin_send()
+                await self.sio.emit('frame', (frame_header(client, seq, metadata), jpeg), to=client.sid,
+                                    callback=lambda *args, seq=seq: client.ack(seq))
+        except Exception as e:
+            print(f"WebSocket yuborish xatolik ({client.sid}): {e}")
+        finally:
+            if client.subscriber.closed and client.active:
+                await self.sio.emit('stream_end', {'stream': client.stream_id}, to=client.sid)
+            if self.clients.get(client.sid) is client:
+                del self.clients[client.sid]
+            client.close()
+
+    def publish_alerts(self, alerts):
+        """AlertDispatcher tinglovchisi (dispatcher threadidan): yuborish loopda"""
+        loop = self.loop
+        if loop is None:
+            # Hali hech kim ulanmagan
+            return
+        for alert in alerts:
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    self.sio.emit('alert', (alert_info(alert), alert.image or b'')), loop
+                )
+            except RuntimeError:
+                # Loop yopilgan
+                return
+            self.alerts_sent += 1
+
+    def get_stats(self):
+        clients = list(self.clients.values())
+        return {
+            'clients': [client.get_stats() for client in clients],
+            'alerts_sent': self.alerts_sent,
+        }
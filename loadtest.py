@@ -0,0 +1,373 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import re
+import struct
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+# Ko'p tomoshabin va API so'rovlari bilan server yuklamasi (faqat stdlib asyncio - har bir tomoshabin
+# uchun thread ochilmaydi, shuning uchun mijozning o'zi ham yuzlab ulanishni ko'taradi):
+#   python asgi.py dashboard --port 5000 &
+#   python loadtest.py --url http://127.0.0.1:5000 --stream demo --source video.mp4 --viewers 300 \
+#       --socket-viewers 50 --pid $!
+# Natijada MJPEG va Socket.IO (WebSocket) tomoshabinlar FPS i, API kechikishi va (--pid berilsa)
+# server threadlari soni.
+
+BOUNDARY = b'--frame'
+# Socket.IO binary hodisa: 5<qo'shimchalar>-[ack id]["nom", ...]
+BINARY_EVENT = re.compile(r'^5(\d+)-(\d*)(\[.*)$', re.S)
+
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 2) if values else None
+
+
+def server_threads(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+async def open_request(host, port, method, path, body=None):
+    reader, writer = await asyncio.open_connection(host, port)
+    headers = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close"]
+    if body is not None:
+        headers += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + (body or b''))
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        writer.close()
+        raise ConnectionError("Server javob bermadi")
+    status = int(status_line.split()[1])
+    # Sarlavhalar o'tkazib yuboriladi
+    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+        pass
+    return status, reader, writer
+
+
+async def request(host, port, method, path, body=None):
+    status, reader, writer = await open_request(host, port, method, path, body)
+    data = await reader.read()
+    writer.close()
+    return status, data
+
+
+class Viewer:
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.connected_at = None
+        self.first_frame_at = None
+        self.error = None
+
+
+async def watch(host, port, path, viewer, stop_at):
+    """MJPEG ni o'qib, chegaralarni (--frame) sanash; chunked kodlash sanashga xalaqit bermaydi"""
+    try:
+        started = time.perf_counter()
+        status, reader, writer = await open_request(host, port, 'GET', path)
+        if status != 200:
+            viewer.error = f"HTTP {status}"
+            writer.close()
+            return
+        viewer.connected_at = time.perf_counter()
+        tail = b''
+        while time.perf_counter() < stop_at:
+            try:
+                chunk = await asyncio.wait_for(reader.read(65536), timeout=max(stop_at - time.perf_counter(), 0.01))
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                viewer.error = "Oqim uzildi"
+                break
+            viewer.bytes += len(chunk)
+            data = tail + chunk
+            count = data.count(BOUNDARY)
+            if count and viewer.first_frame_at is None:
+                viewer.first_frame_at = time.perf_counter() - started
+            viewer.frames += count
+            # Bo'laklar chegarasida qolgan boundary ikki marta sanalmasligi uchun
+            tail = data[-(len(BOUNDARY) - 1):]
+        writer.close()
+    except (OSError, ValueError, IndexError) as e:
+        viewer.error = str(e) or type(e).__name__
+
+
+class WebSocket:
+    """Minimal WebSocket mijoz (RFC 6455): Socket.IO tomoshabinlari uchun yetarli"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host, port, path):
+        reader, writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((
+            f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        ).encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        if b' 101 ' not in status_line:
+            writer.close()
+            raise ConnectionError(f"WebSocket rad etildi: {status_line.decode(errors='replace').strip()}")
+        return cls(reader, writer)
+
+    async def send(self, data, opcode=0x1):
+        if isinstance(data, str):
+            data = data.encode()
+        mask = os.urandom(4)
+        length = len(data)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+        self.writer.write(header + mask + masked)
+        await self.writer.drain()
+
+    async def recv(self):
+        """Keyingi xabar: str (text) yoki bytes (binary); ping/pong ichida hal qilinadi"""
+        message, message_opcode = b'', None
+        while True:
+            first, second = await self.reader.readexactly(2)
+            opcode, length = first & 0x0F, second & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', await self.reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', await self.reader.readexactly(8))[0]
+            mask = await self.reader.readexactly(4) if second & 0x80 else None
+            payload = await self.reader.readexactly(length)
+            if mask:
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+            if opcode == 0x8:
+                raise ConnectionError("WebSocket yopildi")
+            if opcode == 0x9:
+                await self.send(payload, opcode=0xA)
+                continue
+            if opcode == 0xA:
+                continue
+            if opcode in (0x1, 0x2):
+                message_opcode = opcode
+            message += payload
+            if first & 0x80:
+                return message.decode() if message_opcode == 0x1 else message
+
+    def close(self):
+        self.writer.close()
+
+
+async def watch_socket(host, port, stream, tier, overlay, window, viewer, stop_at):
+    """Socket.IO tomoshabin (index.html dagi kabi): watch, har bir kadrga ack"""
+    try:
+        started = time.perf_counter()
+        ws = await WebSocket.connect(host, port, "/socket.io/?EIO=4&transport=websocket")
+        try:
+            if not (await ws.recv()).startswith('0'):
+                raise ConnectionError("Engine.IO ochilmadi")
+            await ws.send('40')
+            watch = {'stream': stream, 'tier': tier, 'overlay': overlay, 'window': window}
+            await ws.send('421' + json.dumps(['watch', watch]))
+            while time.perf_counter() < stop_at:
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=max(stop_at - time.perf_counter(), 0.01))
+                except asyncio.TimeoutError:
+                    break
+                if not isinstance(message, str):
+                    continue
+                if message == '2':
+                    # Engine.IO ping
+                    await ws.send('3')
+                elif message.startswith('431'):
+                    response = json.loads(message[3:])[0]
+                    if response.get('status') != 'success':
+                        viewer.error = response.get('message', 'watch rad etildi')
+                        break
+                    viewer.connected_at = time.perf_counter()
+                elif message.startswith('4'):
+                    match = BINARY_EVENT.match(message[1:])
+                    if match is None:
+                        # status va boshqa matnli hodisalar
+                        continue
+                    attachments, ack_id, payload = int(match.group(1)), match.group(2), match.group(3)
+                    for _ in range(attachments):
+                        viewer.bytes += len(await ws.recv())
+                    if json.loads(payload)[0] == 'frame':
+                        viewer.frames += 1
+                        if viewer.first_frame_at is None:
+                            viewer.first_frame_at = time.perf_counter() - started
+                    if ack_id:
+                        await ws.send(f'43{ack_id}[]')
+        finally:
+            ws.close()
+    except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+        viewer.error = str(e) or type(e).__name__
+
+
+def viewer_report(viewers, stop_at):
+    connected = [viewer for viewer in viewers if viewer.connected_at is not None]
+    fps = [
+        viewer.frames / (stop_at - viewer.connected_at)
+        for viewer in connected if stop_at > viewer.connected_at
+    ]
+    first_frame = [viewer.first_frame_at for viewer in connected if viewer.first_frame_at is not None]
+    errors = {}
+    for viewer in viewers:
+        if viewer.error:
+            errors[viewer.error] = errors.get(viewer.error, 0) + 1
+    return {
+        'viewers': len(viewers),
+        'connected': len(connected),
+        'errors': errors,
+        'fps': {
+            'p50': round(float(np.median(fps)), 2) if fps else 0.0,
+            'min': round(min(fps), 2) if fps else 0.0,
+            'mean': round(float(np.mean(fps)), 2) if fps else 0.0,
+        },
+        'first_frame_ms': {'p50': percentile_ms(first_frame, 50), 'p95': percentile_ms(first_frame, 95)},
+        'received_mb': round(sum(viewer.bytes for viewer in viewers) / 1024 ** 2, 1),
+    }
+
+
+async def api_load(host, port, path, rate, stop_at, latencies, errors):
+    """Doimiy tezlikda API so'rovlari; har biri alohida task - sekin javob keyingilarini to'xtatmaydi"""
+    interval = 1.0 / rate
+    tasks = []
+
+    async def one():
+        started = time.perf_counter()
+        try:
+            status, _ = await request(host, port, 'GET', path)
+            if status >= 400:
+                errors.append(status)
+            else:
+                latencies.append(time.perf_counter() - started)
+        except OSError as e:
+            errors.append(str(e))
+
+    next_at = time.perf_counter()
+    while next_at < stop_at:
+        tasks.append(asyncio.ensure_future(one()))
+        next_at += interval
+        await asyncio.sleep(max(next_at - time.perf_counter(), 0))
+    await asyncio.gather(*tasks)
+
+
+async def sample_threads(pid, stop_at, samples):
+    while time.perf_counter() < stop_at:
+        threads = server_threads(pid)
+        if threads is not None:
+            samples.append(threads)
+        await asyncio.sleep(0.5)
+
+
+async def run(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+
+    if args.source is not None:
+        body = json.dumps({'source': args.source}).encode()
+        status, data = await request(host, port, 'POST', f"/streams/{args.stream}", body)
+        if status != 200:
+            raise SystemExit(f"Oqim ochilmadi: HTTP {status} {data[:200]!r}")
+
+    query = f"tier={args.tier}" + ("" if args.overlay else "&overlay=0")
+    feed_path = args.feed_path.format(stream=args.stream) + "?" + query
+    threads_before = server_threads(args.pid) if args.pid else None
+
+    started = time.perf_counter()
+    stop_at = started + args.ramp + args.duration
+    viewers = [Viewer() for _ in range(args.viewers)]
+    socket_viewers = [Viewer() for _ in range(args.socket_viewers)]
+    latencies, errors, thread_samples = [], [], []
+    tasks = []
+    clients = [(viewer, False) for viewer in viewers] + [(viewer, True) for viewer in socket_viewers]
+    # Ulanishlar ramp davomida bir tekis ochiladi
+    for i, (viewer, socket) in enumerate(clients):
+        if socket:
+            tasks.append(asyncio.ensure_future(watch_socket(
+                host, port, args.stream, args.tier, args.overlay, args.socket_window, viewer, stop_at
+            )))
+        else:
+            tasks.append(asyncio.ensure_future(watch(host, port, feed_path, viewer, stop_at)))
+        if args.ramp and i < len(clients) - 1:
+            await asyncio.sleep(args.ramp / len(clients))
+    if args.api_rate > 0:
+        tasks.append(asyncio.ensure_future(api_load(host, port, args.api_path, args.api_rate, stop_at, latencies, errors)))
+    if args.pid:
+        tasks.append(asyncio.ensure_future(sample_threads(args.pid, stop_at, thread_samples)))
+    await asyncio.gather(*tasks)
+
+    return {
+        'url': args.url,
+        'feed': feed_path,
+        'duration_seconds': args.duration,
+        'mjpeg': viewer_report(viewers, stop_at),
+        'socketio': viewer_report(socket_viewers, stop_at) if socket_viewers else None,
+        'api': {
+            'path': args.api_path,
+            'requests': len(latencies) + len(errors),
+            'errors': len(errors),
+            'p50_ms': percentile_ms(latencies, 50),
+            'p95_ms': percentile_ms(latencies, 95),
+            'p99_ms': percentile_ms(latencies, 99),
+        },
+        'server_threads': {
+            'before': threads_before,
+            'max': max(thread_samples) if thread_samples else None,
+        } if args.pid else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MJPEG tomoshabinlar va API so'rovlari bilan yuklama testi")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--stream", default="loadtest")
+    parser.add_argument("--source", help="Berilsa oqim POST /streams/<stream> bilan ochiladi (fayl, URL yoki kamera)")
+    parser.add_argument("--feed-path", default="/streams/{stream}/video_feed",
+                        help="app.py uchun: /video_feed")
+    parser.add_argument("--viewers", type=int, default=200, help="MJPEG tomoshabinlar")
+    parser.add_argument("--socket-viewers", type=int, default=0, help="Socket.IO (WebSocket) tomoshabinlar")
+    parser.add_argument("--socket-window", type=int, default=2, help="Tasdiqlanmagan kadrlar oynasi")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--ramp", type=float, default=5.0, help="Ulanishlarni ochish davomiyligi (soniya)")
+    parser.add_argument("--tier", default="thumb")
+    parser.add_argument("--no-overlay", dest="overlay", action="store_false")
+    parser.add_argument("--api-path", default="/streams")
+    parser.add_argument("--api-rate", type=float, default=20.0, help="API so'rovlari / soniya")
+    parser.add_argument("--pid", type=int, help="Server jarayoni: threadlar soni kuzatiladi (Linux)")
+    parser.add_argument("--min-fps", type=float, default=None, help="Tomoshabin FPS p50 shundan past bo'lsa exit 1")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    for kind in ('mjpeg', 'socketio'):
+        section = report[kind]
+        if section is None or not section['viewers']:
+            continue
+        if section['connected'] < section['viewers']:
+            sys.exit(1)
+        if args.min_fps is not None and section['fps']['p50'] < args.min_fps:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
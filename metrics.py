@@ -0,0 +1,140 @@
+import threading
+from bisect import bisect_left
+
+# Sekundlarda: 1ms dan 2.5s gacha
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + '}'
+
+
+class HistogramChild:
+    def __init__(self, bucket_count):
+        # Oxirgi katak +Inf; yig'indi faqat scrape paytida hisoblanadi
+        self.counts = [0] * (bucket_count + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Label qiymatlari bo'yicha histogram; observe qulfsiz (har bir label to'plamiga bitta thread yozadi)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def child(self, labels):
+        child = self.children.get(labels)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(labels, HistogramChild(len(self.buckets)))
+        return child
+
+    def observe(self, labels, value):
+        child = self.child(labels)
+        child.counts[bisect_left(self.buckets, value)] += 1
+        child.sum += value
+        child.count += 1
+
+    def collect(self):
+        lines = []
+        with self.lock:
+            children = list(self.children.items())
+        for values, child in children:
+            labels = dict(zip(self.labelnames, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), list(child.counts)):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {child.sum}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {child.count}")
+        return lines
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def collect(self):
+        with self.lock:
+            values = list(self.values.items())
+        return [f"{self.name}{format_labels(dict(zip(self.labelnames, key)))} {value}" for key, value in values]
+
+
+class MetricsRegistry:
+    """Prometheus matn formati; holat (navbatlar, tomoshabinlar) faqat scrape paytida yig'iladi"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def histogram(self, name, help_text, labelnames, buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """collector() -> [(nom, tur, izoh, [(labels dict, qiymat), ...]), ...]"""
+        with self.lock:
+            self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+
+        with self.lock:
+            collectors = list(self.collectors)
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Metrika yig'ishda xatolik: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'safevision_stage_seconds',
+    'Kadr bosqichlari kechikishi (capture, inference, nms, tracking, annotate, encode)',
+    ('camera', 'stage')
+)
+FRAMES_TOTAL = REGISTRY.counter('safevision_frames_total', 'Qayta ishlangan kadrlar', ('camera',))
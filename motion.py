@@ -0,0 +1,84 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Sahna o'zgarmasa YOLO ni o'tkazib yuborish uchun arzon harakat filtri"""
+
+    def __init__(self, sensitivity=0.003, pixel_threshold=25, max_skip=30, width=160, method='diff'):
+        # sensitivity - o'zgargan piksellar ulushi, shundan oshsa detection qilinadi
+        self.sensitivity = sensitivity
+        self.pixel_threshold = pixel_threshold
+        # Ketma-ket o'tkazib yuborilishi mumkin bo'lgan maksimal kadrlar soni
+        self.max_skip = max_skip
+        self.width = width
+        self.method = method
+
+        self.reference = None
+        self.subtractor = None
+        if method == 'mog2':
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(history=300, detectShadows=False)
+
+        # Hisoblagichlar
+        self.frames = 0
+        self.inferences = 0
+        self.skipped = 0
+        self.consecutive_skips = 0
+        self.last_motion = 0.0
+        self.last_motion_time = None
+
+    def reset(self):
+        self.reference = None
+        self.consecutive_skips = 0
+        if self.method == 'mog2':
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(history=300, detectShadows=False)
+
+    def prepare(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, int(h * self.width / w))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def measure(self, gray):
+        """O'zgargan piksellar ulushi (0..1)"""
+        if self.method == 'mog2':
+            mask = self.subtractor.apply(gray)
+            return np.count_nonzero(mask) / mask.size
+
+        if self.reference is None or self.reference.shape != gray.shape:
+            return 1.0
+        diff = cv2.absdiff(gray, self.reference)
+        return np.count_nonzero(diff > self.pixel_threshold) / diff.size
+
+    def should_detect(self, frame):
+        self.frames += 1
+        gray = self.prepare(frame)
+        motion = self.measure(gray)
+        self.last_motion = motion
+
+        if motion >= self.sensitivity or self.consecutive_skips >= self.max_skip:
+            # Taqqoslash oxirgi detection qilingan kadr bilan - sekin o'zgarishlar ham yig'iladi
+            self.reference = gray
+            self.consecutive_skips = 0
+            self.inferences += 1
+            if motion >= self.sensitivity:
+                self.last_motion_time = time.time()
+            return True
+
+        self.consecutive_skips += 1
+        self.skipped += 1
+        return False
+
+    def get_stats(self):
+        return {
+            'frames': self.frames,
+            'inferences': self.inferences,
+            'skipped': self.skipped,
+            'skip_ratio': round(self.skipped / self.frames, 3) if self.frames else 0.0,
+            'last_motion': round(self.last_motion, 4),
+            'sensitivity': self.sensitivity,
+            'max_skip': self.max_skip,
+        }
@@ -0,0 +1,674 @@
+import json
+import math
+import multiprocessing as mp
+import os
+import pickle
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import supervision as sv
+
+from config import get_detector_backend, get_int8_calibration
+from detectors import export_onnx, load_detector, partition_threads, quantize_int8
+from fusion import box_iou_matrix
+from render import Renderer
+from tracking import (
+    CONFIDENCE_THRESHOLD, MODEL_KEY, MODEL_PATH, NMS_IOU_THRESHOLD, associate_tracks, build_registry
+)
+
+# Bitta bo'lak uzunligi (soniya) - yadrolar sonidan ko'p bo'laklar bo'lsa yuklama tekis taqsimlanadi
+CHUNK_SECONDS = 20
+# Bo'laklar chegarasida treklarni ulash uchun oldingi bo'lak bilan ustma-ust kadrlar
+OVERLAP_FRAMES = 15
+BATCH_SIZE = 8
+# Umumiy progressda detection bosqichining ulushi (qolgani - render)
+DETECT_WEIGHT = 0.85
+# Seek noaniq bo'lsa shuncha kadr oldinroqdan (keyframe dan) oldinga decode qilinadi
+SEEK_PREROLL_FRAMES = 250
+
+# Worker jarayon holati: model har bir jarayonda bir marta yuklanadi
+_model = None
+_registry = None
+_progress = None
+
+
+def _init_worker(model_path, backend, workers, progress_queue):
+    global _model, _registry, _progress
+    # OpenCV threadlari jarayonlar bilan raqobat qilmasin
+    cv2.setNumThreads(1)
+    threads = partition_threads(workers)
+    _model = load_detector(model_path, backend=backend, num_threads=threads)
+    _registry = build_registry(_model)
+    _progress = progress_queue
+
+
+def _report(job_id, phase, frames):
+    if _progress is not None and frames:
+        _progress.put((job_id, phase, frames))
+
+
+def frame_position(cap):
+    return int(round(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+
+
+def skip_frames(cap, count):
+    """Kadrlarni rasmga o'girmasdan o'tkazib yuborish; fayl oldinroq tugasa False"""
+    for _ in range(count):
+        if not cap.grab():
+            return False
+    return True
+
+
+def open_at(video_path, start):
+    """Keyingi read() aynan start kadrni qaytaradigan capture.
+
+    FFmpeg da CAP_PROP_POS_FRAMES seeki ko'p H.264 fayllarda keyframe ga tushadi - bo'laklar chegarasi
+    siljisa overlap ulash va render kadr raqamlari buziladi. Seekdan keyin pozitsiya tekshiriladi,
+    mos kelmasa oldinroqdagi keyframe dan (oxirgi chora - fayl boshidan) oldinga decode qilinadi.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if start <= 0:
+        return cap
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    if frame_position(cap) == start:
+        return cap
+
+    preroll = max(0, start - SEEK_PREROLL_FRAMES)
+    if preroll > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, preroll)
+        position = frame_position(cap)
+        if 0 <= position <= start and skip_frames(cap, start - position) and frame_position(cap) == start:
+            return cap
+
+    print(f"Seek aniq emas ({video_path}, kadr {start}) - fayl boshidan decode qilinadi")
+    cap.release()
+    cap = cv2.VideoCapture(video_path)
+    skip_frames(cap, start)
+    return cap
+
+
+def plan_chunks(total_frames, fps, workers, chunk_seconds=CHUNK_SECONDS, overlap=OVERLAP_FRAMES):
+    """Videoni (start, end) kadr oraliqlariga bo'lish; oxirgi bo'lak fayl oxirigacha (end=None)"""
+    if total_frames <= 0:
+        return [(0, None)]
+    chunk_frames = min(int(fps * chunk_seconds), math.ceil(total_frames / workers))
+    chunk_frames = max(chunk_frames, overlap * 4, 1)
+    starts = list(range(0, total_frames, chunk_frames))
+    return [(start, end) for start, end in zip(starts, starts[1:] + [None])]
+
+
+def empty_arrays():
+    return {
+        'frame': np.empty((0,), dtype=np.int64),
+        'xyxy': np.empty((0, 4), dtype=np.float32),
+        'confidence': np.empty((0,), dtype=np.float32),
+        'class_id': np.empty((0,), dtype=np.int64),
+        'tracker_id': np.empty((0,), dtype=np.int64),
+    }
+
+
+def save_atomic(path, write):
+    """Yarim yozilgan fayl qolmasligi uchun avval vaqtinchalik faylga, keyin nomini almashtirish"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def detect_chunk(job_id, video_path, start, end, overlap, imgsz, batch_size, output_path, checkpoint_every=0):
+    """Bo'lakni (oldidagi overlap bilan) o'qib, batch inference va tracking qilish"""
+    read_start = max(0, start - overlap)
+    checkpoint_path = output_path + '.ckpt'
+
+    # Checkpoint bo'lsa tracker holati va shu paytgacha natijalar bilan davom etiladi
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'rb') as f:
+            state = pickle.load(f)
+        frame_index, tracker, parts = state['frame_index'], state['tracker'], state['parts']
+        _report(job_id, 'detect', frame_index - read_start)
+    else:
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        cap.release()
+        frame_index, tracker, parts = read_start, sv.ByteTrack(frame_rate=fps), []
+
+    cap = open_at(video_path, frame_index)
+    last_checkpoint = frame_index
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        results = _model.predict(batch, imgsz=imgsz)
+        for offset, detections in enumerate(results):
+            if len(detections) > 0:
+                detections = detections[detections.confidence > CONFIDENCE_THRESHOLD]
+            if len(detections) > 0:
+                detections = detections.with_nms(NMS_IOU_THRESHOLD)
+            detections = _registry.map_detections(MODEL_KEY, detections)
+            tracker_ids = associate_tracks(tracker, detections, _registry)
+            if len(detections) > 0:
+                parts.append((frame_index - len(batch) + offset, detections, tracker_ids))
+        _report(job_id, 'detect', len(batch))
+        batch.clear()
+
+    while end is None or frame_index < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        batch.append(frame)
+        frame_index += 1
+        if len(batch) >= batch_size:
+            flush()
+            if checkpoint_every and frame_index - last_checkpoint >= checkpoint_every:
+                state = {'frame_index': frame_index, 'tracker': tracker, 'parts': parts}
+                save_atomic(checkpoint_path, lambda f: pickle.dump(state, f))
+                last_checkpoint = frame_index
+    flush()
+    cap.release()
+
+    arrays = empty_arrays()
+    if parts:
+        arrays = {
+            'frame': np.concatenate([np.full(len(d), i, dtype=np.int64) for i, d, _ in parts]),
+            'xyxy': np.concatenate([d.xyxy for _, d, _ in parts]).astype(np.float32),
+            'confidence': np.concatenate([d.confidence for _, d, _ in parts]).astype(np.float32),
+            'class_id': np.concatenate([d.class_id for _, d, _ in parts]).astype(np.int64),
+            'tracker_id': np.concatenate([t for _, _, t in parts]),
+        }
+    arrays['end'] = np.array(frame_index)
+    arrays['names'] = np.array(_registry.names, dtype=str)
+    # Natija pickle orqali emas, fayl orqali qaytariladi; tayyor fayl - bo'lak tugagan
+    save_atomic(output_path, lambda f: np.savez(f, **arrays))
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return output_path
+
+
+def load_chunk(path, start):
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    return {
+        'start': start,
+        'end': int(arrays.pop('end')),
+        'names': [str(name) for name in arrays.pop('names')],
+        'arrays': arrays,
+    }
+
+
+def render_chunk(job_id, video_path, start, end, arrays, segment_path):
+    """Yakuniy track IDlari bilan bo'lakni annotatsiya qilib alohida segmentga yozish"""
+    cap = open_at(video_path, start)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    # Segment to'liq yozilgandan keyingina o'z nomini oladi
+    tmp_path = segment_path.replace('.mp4', '.tmp.mp4')
+    writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    # Jonli oqim (VideoProcessor.get_renderer) bilan bir xil ko'rinish
+    renderer = Renderer(_registry, label_position='top_left', text_scale=0.5, text_padding=5)
+
+    frames = arrays['frame']
+    written = 0
+    for frame_index in range(start, end):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        lo, hi = np.searchsorted(frames, [frame_index, frame_index + 1])
+        if hi > lo:
+            # -1 - ID yo'q (renderer faqat ID si borlarga yozadi)
+            detections = sv.Detections(
+                xyxy=arrays['xyxy'][lo:hi],
+                confidence=arrays['confidence'][lo:hi],
+                class_id=arrays['class_id'][lo:hi],
+                tracker_id=arrays['tracker_id'][lo:hi].astype(np.int64)
+            )
+            frame = renderer.render(frame, detections)
+        writer.write(frame)
+        written += 1
+        if written % BATCH_SIZE == 0:
+            _report(job_id, 'render', BATCH_SIZE)
+    _report(job_id, 'render', written % BATCH_SIZE)
+    cap.release()
+    writer.release()
+    os.replace(tmp_path, segment_path)
+    return segment_path
+
+
+def match_overlap(previous, current, overlap_end, iou_threshold=0.5):
+    """Ustma-ust kadrlarda IoU bo'yicha ovoz berish: joriy lokal ID -> oldingi yakuniy ID"""
+    votes = Counter()
+    frames = np.unique(current['frame'][current['frame'] < overlap_end])
+    for frame_index in frames:
+        prev = np.flatnonzero((previous['frame'] == frame_index) & (previous['tracker_id'] >= 0))
+        cur = np.flatnonzero((current['frame'] == frame_index) & (current['tracker_id'] >= 0))
+        if len(prev) == 0 or len(cur) == 0:
+            continue
+        iou = box_iou_matrix(current['xyxy'][cur], previous['xyxy'][prev])
+        same_class = current['class_id'][cur][:, None] == previous['class_id'][prev][None, :]
+        for i, j in zip(*np.nonzero(same_class & (iou > iou_threshold))):
+            votes[(int(current['tracker_id'][cur[i]]), int(previous['tracker_id'][prev[j]]))] += 1
+
+    # Ko'p ovoz olgan juftliklardan boshlab bittaga-bitta moslashtirish
+    mapping, used = {}, set()
+    for (local_id, final_id), _ in votes.most_common():
+        if local_id in mapping or final_id in used:
+            continue
+        mapping[local_id] = final_id
+        used.add(final_id)
+    return mapping
+
+
+def stitch_tracks(chunks, iou_threshold=0.5):
+    """Bo'laklar treklarini chegaralarda ulab, yagona ID fazosiga o'tkazish"""
+    next_id = 1
+    previous = None
+    parts = []
+    for chunk in chunks:
+        arrays = chunk['arrays']
+        local_ids = arrays['tracker_id']
+        mapping = match_overlap(previous, arrays, chunk['start'], iou_threshold) if previous is not None else {}
+
+        # Yangi treklar birinchi ko'ringan tartibda raqamlanadi
+        valid = local_ids >= 0
+        unique_ids, first_seen = np.unique(local_ids[valid], return_index=True)
+        for local_id in unique_ids[np.argsort(first_seen)]:
+            if int(local_id) not in mapping:
+                mapping[int(local_id)] = next_id
+                next_id += 1
+
+        final_ids = np.full(len(local_ids), -1, dtype=np.int64)
+        final_ids[valid] = [mapping[int(local_id)] for local_id in local_ids[valid]]
+        arrays = dict(arrays, tracker_id=final_ids)
+        previous = arrays
+
+        # Overlap kadrlari oldingi bo'lakka tegishli - tracker u yerda allaqachon "isigan"
+        owned = arrays['frame'] >= chunk['start']
+        parts.append({key: value[owned] for key, value in arrays.items()})
+
+    if not parts:
+        return empty_arrays()
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def write_detections(path, arrays, registry_names, total_frames, fps):
+    """Har bir kadr uchun bitta JSON qator (detection bo'lmasa ham)"""
+    frames = arrays['frame']
+    with open(path, 'w') as f:
+        for frame_index in range(total_frames):
+            lo, hi = np.searchsorted(frames, [frame_index, frame_index + 1])
+            detections = [
+                {
+                    'class': registry_names[int(arrays['class_id'][i])],
+                    'confidence': round(float(arrays['confidence'][i]), 3),
+                    'box': [round(float(v), 1) for v in arrays['xyxy'][i]],
+                    'tracker_id': int(arrays['tracker_id'][i]) if arrays['tracker_id'][i] >= 0 else None,
+                }
+                for i in range(lo, hi)
+            ]
+            f.write(json.dumps({'frame': frame_index, 'time': round(frame_index / fps, 3),
+                                'detections': detections}) + '\n')
+
+
+def write_summary(path, arrays, registry_names, total_frames, fps):
+    """Class bo'yicha qisqa xulosa: detectionlar, alohida treklar va ko'ringan kadrlar soni"""
+    classes = {}
+    for class_id in np.unique(arrays['class_id']):
+        mask = arrays['class_id'] == class_id
+        tracker_ids = arrays['tracker_id'][mask]
+        classes[registry_names[int(class_id)]] = {
+            'detections': int(mask.sum()),
+            'tracks': int(len(np.unique(tracker_ids[tracker_ids >= 0]))),
+            'frames': int(len(np.unique(arrays['frame'][mask]))),
+        }
+    summary = {
+        'total_frames': total_frames,
+        'fps': fps,
+        'duration': round(total_frames / fps, 2) if fps else 0.0,
+        'classes': classes,
+    }
+    with open(path, 'w') as f:
+        json.dump(summary, f)
+    return summary
+
+
+def concat_segments(segments, output_path):
+    """Segmentlarni bitta videoga birlashtirish: ffmpeg bo'lsa qayta kodlashsiz"""
+    if shutil.which('ffmpeg'):
+        list_path = output_path + '.txt'
+        with open(list_path, 'w') as f:
+            for segment in segments:
+                f.write(f"file '{os.path.abspath(segment)}'\n")
+        result = subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+             '-c', 'copy', output_path],
+            capture_output=True
+        )
+        os.remove(list_path)
+        if result.returncode == 0:
+            return output_path
+        print(f"ffmpeg xatolik, OpenCV bilan birlashtirilmoqda: {result.stderr.decode(errors='ignore')}")
+
+    writer = None
+    for segment in segments:
+        cap = cv2.VideoCapture(segment)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if writer is None:
+                fps = cap.get(cv2.CAP_PROP_FPS) or 30
+                h, w = frame.shape[:2]
+                writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+            writer.write(frame)
+        cap.release()
+    if writer is not None:
+        writer.release()
+    return output_path
+
+
+class OfflineJob:
+    def __init__(self, video_path, output_folder, job_id=None):
+        # job_id berilsa ish papkasi o'sha - qayta ishga tushganda checkpointlar topiladi
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.video_path = video_path
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        self.work_dir = os.path.join(output_folder, f"{stem}_{self.id}")
+        self.output_video = os.path.join(self.work_dir, f"{stem}_annotated.mp4")
+        self.output_detections = os.path.join(self.work_dir, f"{stem}_detections.jsonl")
+        self.output_summary = os.path.join(self.work_dir, f"{stem}_summary.json")
+
+        self.status = 'queued'
+        self.error = None
+        self.cancelled = False
+        self.futures = []
+        self.total_frames = 0
+        self.fps = 0.0
+        self.chunks = 0
+        self.detect_total = 0
+        self.done = Counter()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Holat yoki progress o'zgarganda chaqiriladi (masalan, JobQueue bazaga yozadi)
+        self.listener = None
+
+    def set_status(self, status):
+        self.status = status
+        self.notify()
+
+    def add_done(self, phase, frames):
+        self.done[phase] += frames
+        self.notify()
+
+    def notify(self):
+        if self.listener is not None:
+            self.listener(self)
+
+    def outputs(self):
+        return {
+            'video': self.output_video,
+            'detections': self.output_detections,
+            'summary': self.output_summary,
+        }
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 1.0
+        if not self.total_frames:
+            return 0.0
+        detect = min(1.0, self.done['detect'] / max(1, self.detect_total))
+        render = min(1.0, self.done['render'] / self.total_frames)
+        return DETECT_WEIGHT * detect + (1 - DETECT_WEIGHT) * render
+
+    def get_status(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        progress = self.progress
+        processed = self.done['detect']
+        return {
+            'id': self.id,
+            'video': os.path.basename(self.video_path),
+            'status': self.status,
+            'progress': round(progress, 4),
+            'total_frames': self.total_frames,
+            'chunks': self.chunks,
+            'frames_detected': processed,
+            'frames_rendered': self.done['render'],
+            'elapsed': round(elapsed, 1),
+            'detect_fps': round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+            'eta': round(elapsed / progress - elapsed, 1) if 0 < progress < 1 else None,
+            'outputs': self.outputs() if self.status == 'done' else None,
+            'error': self.error,
+        }
+
+
+class OfflineEngine:
+    """Yuklangan videolarni bo'laklab, jarayonlar pulida batch inference bilan qayta ishlash"""
+
+    def __init__(self, model_path=MODEL_PATH, backend=None, workers=None, imgsz=640, batch_size=BATCH_SIZE,
+                 chunk_seconds=CHUNK_SECONDS, overlap=OVERLAP_FRAMES, checkpoint_every=300, output_folder='outputs'):
+        self.model_path = model_path
+        self.backend = backend or get_detector_backend()
+        # Har bir worker cpu_count / workers ta thread oladi
+        self.workers = workers or max(1, (os.cpu_count() or 1) // 2)
+        self.imgsz = imgsz
+        self.batch_size = batch_size
+        self.chunk_seconds = chunk_seconds
+        self.overlap = overlap
+        # Bo'lak ichida har shuncha kadrda tracker holati diskka yoziladi (0 - o'chirilgan)
+        self.checkpoint_every = checkpoint_every
+        self.output_folder = output_folder
+
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.pool = None
+        self.progress_queue = None
+        self.progress_thread = None
+
+    def result_params(self):
+        """Natijaga ta'sir qiluvchi sozlamalar - natijalar keshi kaliti uchun"""
+        return {
+            'backend': self.backend,
+            'int8': get_int8_calibration() is not None,
+            'imgsz': self.imgsz,
+            'confidence': CONFIDENCE_THRESHOLD,
+            'nms_iou': NMS_IOU_THRESHOLD,
+            'overlap': self.overlap,
+        }
+
+    def resolve_model_path(self):
+        # ONNX eksport/kvantlash workerlar ichida poyga qilmasligi uchun oldindan bir marta
+        if self.backend != 'onnx' or self.model_path.endswith('.onnx'):
+            return self.model_path
+        onnx_path = export_onnx(self.model_path, self.imgsz)
+        calibration = get_int8_calibration()
+        if calibration is not None:
+            onnx_path = quantize_int8(onnx_path, calibration, self.imgsz)
+        return onnx_path
+
+    def start(self):
+        with self.lock:
+            if self.pool is not None:
+                return self
+            # fork emas: ota jarayonda torch va Flask threadlari bor
+            context = mp.get_context('spawn')
+            self.progress_queue = context.Queue()
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.resolve_model_path(), self.backend, self.workers, self.progress_queue)
+            )
+            self.progress_thread = threading.Thread(target=self._progress_loop, name="offline-progress", daemon=True)
+            self.progress_thread.start()
+        return self
+
+    def shutdown(self):
+        with self.lock:
+            pool, self.pool = self.pool, None
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            self.cancel(job.id)
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if self.progress_queue is not None:
+            self.progress_queue.put(None)
+
+    def _progress_loop(self):
+        while True:
+            try:
+                item = self.progress_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if item is None:
+                break
+            job_id, phase, frames = item
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.add_done(phase, frames)
+
+    def create_job(self, video_path, job_id=None):
+        job = OfflineJob(video_path, self.output_folder, job_id=job_id)
+        with self.lock:
+            self.jobs[job.id] = job
+        return job
+
+    def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def remove_job(self, job_id):
+        with self.lock:
+            return self.jobs.pop(job_id, None)
+
+    def list_jobs(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [job.get_status() for job in sorted(jobs, key=lambda job: job.created_at)]
+
+    def cancel(self, job_id):
+        """Navbatdagi bo'laklar bekor qilinadi, ishlayotganlari tugagach natijasi tashlanadi"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancelled = True
+        for future in job.futures:
+            future.cancel()
+        return True
+
+    def _wait(self, job, futures):
+        job.futures = futures
+        results = []
+        for future in futures:
+            results.append(future.result())
+            if job.cancelled:
+                raise CancelledError()
+        return results
+
+    def load_plan(self, job):
+        """Bo'laklash rejasi ish papkasida saqlanadi - davom ettirishda workerlar soni o'zgarsa ham bir xil"""
+        plan_path = os.path.join(job.work_dir, 'plan.json')
+        if os.path.exists(plan_path):
+            with open(plan_path) as f:
+                plan = json.load(f)
+        else:
+            cap = cv2.VideoCapture(job.video_path)
+            if not cap.isOpened():
+                raise RuntimeError(f"Video ochilmadi: {job.video_path}")
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            plan = {
+                'fps': fps,
+                'total_frames': total_frames,
+                'overlap': self.overlap,
+                'chunks': plan_chunks(total_frames, fps, self.workers, self.chunk_seconds, self.overlap),
+            }
+            save_atomic(plan_path, lambda f: f.write(json.dumps(plan).encode()))
+        return plan
+
+    def run(self, job):
+        """Jobni shu threadda bajarish; avvalgi urinishdan qolgan bo'laklar qayta ishlanmaydi"""
+        self.start()
+        job.started_at = time.time()
+        try:
+            os.makedirs(job.work_dir, exist_ok=True)
+            plan = self.load_plan(job)
+            chunk_plan = plan['chunks']
+            overlap = plan['overlap']
+            job.fps = plan['fps']
+            job.total_frames = plan['total_frames']
+            job.chunks = len(chunk_plan)
+            job.detect_total = job.total_frames + overlap * (len(chunk_plan) - 1)
+
+            # 1-bosqich: bo'laklar parallel - decode, batch inference, lokal tracking
+            job.set_status('detecting')
+            futures = []
+            for i, (start, end) in enumerate(chunk_plan):
+                chunk_path = os.path.join(job.work_dir, f"chunk_{i:04d}.npz")
+                if os.path.exists(chunk_path):
+                    job.add_done('detect', (end or job.total_frames) - max(0, start - overlap))
+                    future = Future()
+                    future.set_result(chunk_path)
+                else:
+                    future = self.pool.submit(detect_chunk, job.id, job.video_path, start, end, overlap, self.imgsz,
+                                              self.batch_size, chunk_path, self.checkpoint_every)
+                futures.append(future)
+            chunk_paths = self._wait(job, futures)
+
+            # 2-bosqich: chegaralarda treklarni ulash
+            job.set_status('stitching')
+            chunks = [load_chunk(path, start) for path, (start, _) in zip(chunk_paths, chunk_plan)]
+            arrays = stitch_tracks(chunks)
+            # FRAME_COUNT ba'zi konteynerlarda taxminiy - haqiqiy son o'qilgan kadrlardan
+            job.total_frames = chunks[-1]['end'] if chunks else 0
+            write_detections(job.output_detections, arrays, chunks[0]['names'], job.total_frames, job.fps)
+            write_summary(job.output_summary, arrays, chunks[0]['names'], job.total_frames, job.fps)
+
+            # 3-bosqich: annotatsiyalangan segmentlar parallel, keyin birlashtirish
+            job.set_status('rendering')
+            frames = arrays['frame']
+            futures = []
+            for i, chunk in enumerate(chunks):
+                segment_path = os.path.join(job.work_dir, f"segment_{i:04d}.mp4")
+                if os.path.exists(segment_path):
+                    job.add_done('render', chunk['end'] - chunk['start'])
+                    future = Future()
+                    future.set_result(segment_path)
+                else:
+                    lo, hi = np.searchsorted(frames, [chunk['start'], chunk['end']])
+                    part = {key: value[lo:hi] for key, value in arrays.items()}
+                    future = self.pool.submit(render_chunk, job.id, job.video_path, chunk['start'],
+                                              chunk['end'], part, segment_path)
+                futures.append(future)
+            segments = self._wait(job, futures)
+            concat_segments(segments, job.output_video)
+
+            # Oraliq fayllar faqat job muvaffaqiyatli tugaganda o'chiriladi
+            for path in segments + chunk_paths + [os.path.join(job.work_dir, 'plan.json')]:
+                os.remove(path)
+
+            job.set_status('done')
+            print(f"Offline job tugadi: {job.id} ({job.total_frames} kadr)")
+        except CancelledError:
+            job.set_status('cancelled')
+            print(f"Offline job bekor qilindi: {job.id}")
+        except Exception as e:
+            job.error = str(e)
+            job.set_status('failed')
+            print(f"Offline job xatolik: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+            job.futures = []
+        return job
@@ -0,0 +1,180 @@
+import threading
+import time
+from tracking import VideoProcessor, parse_source, build_registry, MODEL_PATH
+from detectors import load_detector
+from motion import MotionGate
+from controller import LatencyController
+from config import get_detector_backend, get_int8_calibration
+from inference import BatchScheduler
+from encoder import EncodePool
+
+
+class PipelineManager:
+    """Bir jarayonda bir nechta manbani (kamera, fayl, RTSP) parallel boshqarish"""
+
+    def __init__(self, model_path=MODEL_PATH, backend=None, max_batch_size=8, max_wait_ms=15, motion_options=None,
+                 latency_budget_ms=None, alert_dispatcher=None, event_store=None, encode_workers=None):
+        self.model_path = model_path
+        self.backend = backend or get_detector_backend()
+        self.model = None
+        self.model_load_seconds = None
+        self.registry = None
+        # Bitta model barcha manbalar orasida scheduler orqali bo'lishiladi
+        self.scheduler = None
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        # None bo'lsa harakat filtri o'chirilgan, aks holda MotionGate parametrlari
+        self.motion_options = motion_options
+        # Berilsa har bir oqim shu kechikish byudjetini ushlab turadi
+        self.latency_budget_ms = latency_budget_ms
+        # Barcha oqimlar uchun bitta ogohlantirish navbati (ixtiyoriy)
+        self.alert_dispatcher = alert_dispatcher
+        # Barcha oqimlar treklari bitta hodisalar bazasiga (ixtiyoriy)
+        self.event_store = event_store
+        # JPEG kodlash barcha oqimlar uchun bitta threadlar pulida
+        self.encode_workers = encode_workers
+        self.encoder = None
+        self.streams = {}
+        self.lock = threading.Lock()
+
+    def load_model(self):
+        with self.lock:
+            if self.model is None:
+                print("Model yuklanmoqda...")
+                calibration = get_int8_calibration()
+                started = time.perf_counter()
+                self.model = load_detector(
+                    self.model_path,
+                    backend=self.backend,
+                    int8=calibration is not None,
+                    calibration_source=calibration
+                )
+                self.model_load_seconds = time.perf_counter() - started
+                print(f"Model yuklandi ({self.backend})! {len(self.model.names)} ta class")
+                self.registry = build_registry(self.model)
+            if self.scheduler is None:
+                self.scheduler = BatchScheduler(
+                    self.model,
+                    imgsz=640,
+                    max_batch_size=self.max_batch_size,
+                    max_wait_ms=self.max_wait_ms
+                ).start()
+            if self.encoder is None:
+                self.encoder = EncodePool(self.encode_workers)
+            return self.model
+
+    def add_stream(self, stream_id, source, cap=None):
+        """Yangi manba qo'shish yoki mavjud oqim manbasini almashtirish"""
+        model = self.load_model()
+        with self.lock:
+            processor = self.streams.get(stream_id)
+            if processor is None:
+                processor = VideoProcessor(
+                    stream_id=stream_id,
+                    model=model,
+                    registry=self.registry,
+                    scheduler=self.scheduler,
+                    motion_gate=MotionGate(**self.motion_options) if self.motion_options is not None else None,
+                    controller=LatencyController(self.latency_budget_ms) if self.latency_budget_ms else None,
+                    alert_dispatcher=self.alert_dispatcher,
+                    event_store=self.event_store,
+                    encoder=self.encoder
+                )
+                self.streams[stream_id] = processor
+
+        if not processor.set_source(parse_source(source), cap=cap):
+            with self.lock:
+                if self.streams.get(stream_id) is processor and processor.current_source is None:
+                    del self.streams[stream_id]
+            return None
+        return processor
+
+    def get_stream(self, stream_id):
+        with self.lock:
+            return self.streams.get(stream_id)
+
+    def remove_stream(self, stream_id):
+        with self.lock:
+            processor = self.streams.pop(stream_id, None)
+        if processor is None:
+            return False
+        processor.stop_source()
+        return True
+
+    def list_streams(self):
+        with self.lock:
+            processors = list(self.streams.values())
+        return [processor.get_status() for processor in processors]
+
+    def get_inference_stats(self):
+        if self.scheduler is None:
+            return None
+        return self.scheduler.get_stats()
+
+    def get_alert_stats(self):
+        if self.alert_dispatcher is None:
+            return None
+        return self.alert_dispatcher.get_stats()
+
+    def get_event_stats(self):
+        if self.event_store is None:
+            return None
+        return self.event_store.get_stats()
+
+    def collect_metrics(self):
+        """/metrics uchun joriy holat: faqat scrape paytida chaqiriladi"""
+        with self.lock:
+            processors = list(self.streams.values())
+
+        viewers, fps, capture_dropped, capture_buffered, viewer_dropped = [], [], [], [], []
+        for processor in processors:
+            labels = {'camera': processor.metrics_label or str(processor.stream_id)}
+            viewers.append((labels, processor.viewer_count()))
+            fps.append((labels, round(processor.fps_current, 2)))
+            viewer_dropped.append((labels, processor.hub.get_stats()['dropped'] + processor.raw_hub.get_stats()['dropped']))
+            # Monoton: almashtirilgan grabberlar tashlagan kadrlar ham qo'shiladi
+            capture_dropped.append((labels, processor.capture_dropped_frames()))
+            grabber = processor.grabber
+            if grabber is not None:
+                capture_buffered.append((labels, grabber.get_stats()['buffered']))
+
+        metrics = [
+            ('safevision_streams', 'gauge', 'Faol oqimlar', [({}, len(processors))]),
+            ('safevision_viewers', 'gauge', 'Faol tomoshabinlar', viewers),
+            ('safevision_fps', 'gauge', 'O\'rtacha FPS (oqim boshidan)', fps),
+            ('safevision_capture_dropped_frames_total', 'counter', 'Capture buferida tashlangan kadrlar', capture_dropped),
+            ('safevision_capture_buffered_frames', 'gauge', 'Capture buferidagi kadrlar', capture_buffered),
+            ('safevision_viewer_dropped_frames', 'gauge', 'Sekin tomoshabinlarga yetkazilmagan kadrlar', viewer_dropped),
+        ]
+        if self.model_load_seconds is not None:
+            metrics.append(('safevision_model_load_seconds', 'gauge', 'Model yuklash vaqti',
+                            [({'backend': self.backend}, round(self.model_load_seconds, 4))]))
+        if self.scheduler is not None:
+            metrics.append(('safevision_inference_queue_depth', 'gauge', 'Inference navbatidagi kadrlar',
+                            [({}, self.scheduler.requests.qsize())]))
+        if self.alert_dispatcher is not None:
+            stats = self.alert_dispatcher.get_stats()
+            metrics.append(('safevision_alert_queue_depth', 'gauge', 'Ogohlantirishlar navbati', [({}, stats['queued'])]))
+            metrics.append(('safevision_alerts_dropped_total', 'counter', 'Navbat to\'lganda tashlangan ogohlantirishlar',
+                            [({}, stats['dropped'])]))
+        if self.encoder is not None:
+            metrics.append(('safevision_encode_pending', 'gauge', 'Kodlash pulidagi kadrlar',
+                            [({}, self.encoder.get_stats()['pending'])]))
+        if self.event_store is not None:
+            stats = self.event_store.get_stats()
+            metrics.append(('safevision_event_queue_depth', 'gauge', 'Hodisalar navbati', [({}, stats['queued'])]))
+            metrics.append(('safevision_events_dropped_total', 'counter', 'Navbat to\'lganda tashlangan hodisalar',
+                            [({}, stats['dropped'])]))
+        return metrics
+
+    def stop_all(self):
+        with self.lock:
+            stream_ids = list(self.streams)
+        for stream_id in stream_ids:
+            self.remove_stream(stream_id)
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self.scheduler = None
+        if self.encoder is not None:
+            self.encoder.stop()
+            self.encoder = None
@@ -1,24 +1,267 @@
-from ultralytics import YOLO
+import argparse
+import glob
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 
-model = YOLO("train7/weights/best.pt")
-
-def image_prediction(image_path):
-    image = cv2.imread(image_path)
-    results = model.predict(image, conf=0.5, save=True)
-    for result in results:
-        boxes = result.boxes.xyxy
-        confidences = result.boxes.conf
-        class_ids = result.boxes.cls
-        for box, conf, class_id in zip(boxes, confidences, class_ids):
-            x1, y1, x2, y2 = map(int, box)
-            label = f"{model.model.names[int(class_id)]}: {conf:.2f}"
-            cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 3)
-            cv2.putText(image, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-    cv2.imshow("Predicted Image", image)
-    cv2.imwrite("results/predicted_image01.jpg", image)
-    cv2.waitKey(0)
-    cv2.destroyAllWindows()
-
-image_prediction("test/ppe_test/images/image_181_jpg.rf.5c76357ca11f55470a77dadd458d2545.jpg")
-# image_prediction('image copy.png')
+from detectors import load_detector, list_images
+from config import get_detector_backend
+
+# Ko'p sonli rasmlarni ekransiz baholash:
+#   python predictin.py dataset/images "test/**/*.jpg" --output detections.jsonl --save-dir results
+# Rasmlar threadlar pulida oldindan o'qiladi (cv2.imread GIL ni bo'shatadi), model esa batch bilan ishlaydi.
+
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'bmp')
+PROGRESS_INTERVAL = 50
+# Diskka yozish ortda qolsa navbatda shuncha batchdan ko'p belgilangan rasm turmaydi
+SAVE_BACKLOG_BATCHES = 2
+
+
+def collect_images(sources, recursive=False, limit=None):
+    paths = []
+    for source in sources:
+        if os.path.isdir(source) and recursive:
+            patterns = [os.path.join(source, '**', f"*.{ext}") for ext in IMAGE_EXTENSIONS]
+            paths.extend(sorted(p for pattern in patterns for p in glob.glob(pattern, recursive=True)))
+        elif os.path.isdir(source):
+            paths.extend(list_images(source))
+        else:
+            paths.extend(sorted(glob.glob(source, recursive=True)))
+    return paths[:limit] if limit else paths
+
+
+def read_image(path):
+    return path, cv2.imread(path)
+
+
+def prefetch_batches(pool, paths, batch_size, depth):
+    """Tartibni saqlagan holda depth ta rasm oldindan o'qiladi; o'qilmaganlari (None) ham qaytariladi"""
+    pending = deque()
+    batch = []
+    paths = iter(paths)
+    for path in paths:
+        pending.append(pool.submit(read_image, path))
+        if len(pending) >= depth:
+            break
+    while pending:
+        batch.append(pending.popleft().result())
+        next_path = next(paths, None)
+        if next_path is not None:
+            pending.append(pool.submit(read_image, next_path))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def annotate_image(image, detections, names, output_path):
+    for box, conf, class_id in zip(detections.xyxy, detections.confidence, detections.class_id):
+        x1, y1, x2, y2 = map(int, box)
+        label = f"{names[int(class_id)]}: {conf:.2f}"
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 3)
+        cv2.putText(image, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    cv2.imwrite(output_path, image)
+
+
+def detection_records(path, image, detections, names):
+    return [
+        {
+            'image': path,
+            'class_id': int(class_id),
+            'class_name': names[int(class_id)],
+            'confidence': round(float(conf), 4),
+            'x1': round(float(box[0]), 1),
+            'y1': round(float(box[1]), 1),
+            'x2': round(float(box[2]), 1),
+            'y2': round(float(box[3]), 1),
+        }
+        for box, conf, class_id in zip(detections.xyxy, detections.confidence, detections.class_id)
+    ]
+
+
+class JsonlWriter:
+    """Har bir rasm uchun bitta qator (detectionsiz rasmlar ham yoziladi)"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def write(self, path, image, records):
+        height, width = image.shape[:2]
+        row = {
+            'image': path,
+            'width': width,
+            'height': height,
+            'detections': [{k: v for k, v in record.items() if k != 'image'} for record in records],
+        }
+        self.file.write(json.dumps(row) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Har bir detection bitta qator; batchlar row group sifatida yoziladi"""
+
+    COLUMNS = ['image', 'class_id', 'class_name', 'confidence', 'x1', 'y1', 'x2', 'y2']
+
+    def __init__(self, path, row_group_size=50000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet uchun pyarrow kerak: pip install pyarrow")
+        self.pa = pa
+        self.schema = pa.schema([
+            ('image', pa.string()),
+            ('class_id', pa.int32()),
+            ('class_name', pa.string()),
+            ('confidence', pa.float32()),
+            ('x1', pa.float32()),
+            ('y1', pa.float32()),
+            ('x2', pa.float32()),
+            ('y2', pa.float32()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.row_group_size = row_group_size
+        self.rows = []
+
+    def write(self, path, image, records):
+        self.rows.extend(records)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        columns = {name: [row[name] for row in self.rows] for name in self.COLUMNS}
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def open_writer(path):
+    if path is None:
+        return None
+    if path.endswith('.parquet'):
+        return ParquetWriter(path)
+    return JsonlWriter(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rasmlar bo'yicha batch inference")
+    parser.add_argument("sources", nargs='+', help="Rasmlar papkasi yoki glob (bir nechta bo'lishi mumkin)")
+    parser.add_argument("--model", default="train7/weights/best.pt")
+    parser.add_argument("--backend", default=None, help="torch yoki onnx (default: DETECTOR_BACKEND)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1), help="Rasm o'qish threadlari")
+    parser.add_argument("--prefetch", type=int, default=4, help="Oldindan o'qiladigan batchlar soni")
+    parser.add_argument("--recursive", action="store_true", help="Papkalarni ichma-ich qidirish")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", help="Detectionlar: .jsonl yoki .parquet")
+    parser.add_argument("--save-dir", help="Belgilangan rasmlarni shu papkaga yozish")
+    args = parser.parse_args()
+
+    paths = collect_images(args.sources, recursive=args.recursive, limit=args.limit)
+    if not paths:
+        print("Rasmlar topilmadi!")
+        return
+
+    model = load_detector(args.model, backend=args.backend or get_detector_backend(), imgsz=args.imgsz)
+    names = model.names
+    writer = open_writer(args.output)
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+        # Turli papkalardagi bir xil nomli rasmlar ustma-ust yozilmasligi uchun nisbiy yo'l saqlanadi
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+
+    batch_index = 0
+    processed = 0
+    failed = 0
+    total_detections = 0
+    inference_time = 0.0
+    wait_time = 0.0
+    saves = deque()
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="image-reader") as pool:
+        batches = prefetch_batches(pool, paths, args.batch_size, depth=args.batch_size * args.prefetch)
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                batch = next(batches, None)
+                wait_time += time.perf_counter() - wait_start
+                if batch is None:
+                    break
+
+                valid = [(path, image) for path, image in batch if image is not None]
+                for path, image in batch:
+                    if image is None:
+                        failed += 1
+                        print(f"O'qib bo'lmadi: {path}")
+                if not valid:
+                    continue
+
+                stage_start = time.perf_counter()
+                results = model.predict([image for _, image in valid], imgsz=args.imgsz)
+                inference_time += time.perf_counter() - stage_start
+
+                for (path, image), detections in zip(valid, results):
+                    detections = detections[detections.confidence > args.conf]
+                    total_detections += len(detections)
+                    if writer is not None:
+                        writer.write(path, image, detection_records(path, image, detections, names))
+                    if args.save_dir:
+                        output_path = os.path.join(args.save_dir, os.path.relpath(os.path.abspath(path), root))
+                        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                        saves.append(pool.submit(annotate_image, image, detections, names, output_path))
+
+                processed += len(valid)
+                batch_index += 1
+                # Yozilgan rasmlar xotirada to'planib qolmasin, xatolari esa yashirinmasin:
+                # tugaganlari bir o'tishda ajratiladi, navbat to'lsa eng eskilari kutiladi
+                pending = deque()
+                for future in saves:
+                    if future.done():
+                        future.result()
+                    else:
+                        pending.append(future)
+                saves = pending
+                while len(saves) > args.batch_size * SAVE_BACKLOG_BATCHES:
+                    saves.popleft().result()
+                if batch_index % PROGRESS_INTERVAL == 0:
+                    elapsed = time.perf_counter() - start
+                    print(f"{processed}/{len(paths)} rasm, {processed / elapsed:.1f} rasm/s")
+        finally:
+            for future in saves:
+                future.result()
+            if writer is not None:
+                writer.close()
+
+    elapsed = time.perf_counter() - start
+    report = {
+        'images': processed,
+        'failed': failed,
+        'detections': total_detections,
+        'seconds': round(elapsed, 2),
+        'images_per_sec': round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        'inference_images_per_sec': round(processed / inference_time, 2) if inference_time > 0 else 0.0,
+        # Katta bo'lsa o'qish (decode) inference ortida qolmoqda - --workers ni oshirish kerak
+        'decode_wait_seconds': round(wait_time, 2),
+        'batch_size': args.batch_size,
+        'workers': args.workers,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+from collections import namedtuple
+
+import numpy as np
+from supervision.draw.color import Color
+
+# display - ekranda ko'rsatiladigan nom, track - trek qilinadi (burchak chiziqlari bilan
+# chiziladi), alert - ko'rilganda ogohlantirish yuboriladi
+ClassSpec = namedtuple('ClassSpec', ['display', 'color', 'track', 'alert'])
+
+CLASS_SPECS = {
+    # models/zakladchik_model.pt (tracking.py)
+    'oddiy_harakat': ClassSpec('Oddiy Harakat', Color.from_hex('#00FF00'), True, False),
+    'shubhali_harakat': ClassSpec('Shubhali Harakat', Color.from_hex('#FFA500'), True, True),
+    'jabrlangan_shaxs': ClassSpec('Jabrlangan Shaxs', Color.from_hex('#FF0000'), True, False),
+    'qurol_aslahasi': ClassSpec('Qurol-Aslaha', Color.from_hex('#8A2BE2'), False, True),
+
+    # Qurilish modellari (camera-tracking.py)
+    'Helmet': ClassSpec('Helmet', Color.GREEN, False, False),
+    'No-Helmet': ClassSpec('No-Helmet', Color.RED, False, False),
+    'Vest': ClassSpec('Vest', Color.GREEN, False, False),
+    'No-Vest': ClassSpec('No-Vest', Color.RED, False, False),
+    'Person': ClassSpec('Person', Color.BLUE, True, False),
+    'Person-Fall': ClassSpec('Person-Fall', Color.YELLOW, False, False),
+    'Fire': ClassSpec('Fire', Color.RED, False, True),
+    'Smoke': ClassSpec('Smoke', Color.BLACK, False, True),
+    'fire': ClassSpec('fire', Color.RED, False, True),
+    'smoke': ClassSpec('smoke', Color.BLACK, False, True),
+}
+
+
+class ClassRegistry:
+    """(model, lokal class id) -> global id; nom, rang va flaglar NumPy massivlarda"""
+
+    def __init__(self, specs=CLASS_SPECS):
+        self.specs = specs
+        self.names = []
+        self.name_to_id = {}
+        self.luts = {}
+        self._rebuild()
+
+    def register_model(self, model_key, names):
+        """Model classlarini ro'yxatga olish va lokal -> global jadvalini qaytarish"""
+        lut = np.full(max(names) + 1 if names else 0, -1, dtype=np.int64)
+        for local_id, name in names.items():
+            if name not in self.name_to_id:
+                self.name_to_id[name] = len(self.names)
+                self.names.append(name)
+            lut[int(local_id)] = self.name_to_id[name]
+        self.luts[model_key] = lut
+        self._rebuild()
+        return lut
+
+    def _rebuild(self):
+        specs = [self.specs.get(name) or ClassSpec(name, Color.WHITE, False, False) for name in self.names]
+        self.names_array = np.array(self.names, dtype=object)
+        self.display_names = np.array([spec.display for spec in specs], dtype=object)
+        self.colors = [spec.color for spec in specs]
+        self.colors_bgr = np.array([spec.color.as_bgr() for spec in specs], dtype=np.uint8).reshape(-1, 3)
+        self.track = np.array([spec.track for spec in specs], dtype=bool)
+        self.alert = np.array([spec.alert for spec in specs], dtype=bool)
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_id(self, name):
+        return self.name_to_id.get(name, -1)
+
+    def to_global(self, model_key, class_ids):
+        """Lokal class idlarni global idlarga vektorli o'tkazish (noma'lum -> -1)"""
+        lut = self.luts[model_key]
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        global_ids = np.full(len(class_ids), -1, dtype=np.int64)
+        in_range = (class_ids >= 0) & (class_ids < len(lut))
+        global_ids[in_range] = lut[class_ids[in_range]]
+        return global_ids
+
+    def map_detections(self, model_key, detections):
+        """Detections class idlarini global idlarga o'tkazish; registrda yo'q (-1) qatorlar tashlanadi.
+
+        -1 NumPy da oxirgi class sifatida indekslanadi - qolsa box boshqa classning nomi, rangi va
+        ogohlantirish flagini olardi.
+        """
+        class_ids = self.to_global(model_key, detections.class_id)
+        known = class_ids >= 0
+        if not known.all():
+            detections = detections[known]
+            class_ids = class_ids[known]
+        detections.class_id = class_ids
+        return detections
+
+    def count(self, class_ids):
+        """Har bir global class bo'yicha sonlar"""
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        return np.bincount(class_ids[class_ids >= 0], minlength=len(self.names))
+
+    def model_class_ids(self, model_key):
+        lut = self.luts[model_key]
+        return np.unique(lut[lut >= 0])
@@ -0,0 +1,203 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+TEXT_COLOR = (255, 255, 255)
+
+
+def corner_polylines(boxes):
+    """Har bir box uchun to'rtta burchak: (N*4, 3, 2) - uchi, burchak, ikkinchi uchi"""
+    x1, y1, x2, y2 = boxes.T
+    lx = (x2 - x1) // 4
+    ly = (y2 - y1) // 4
+    corners = np.stack([
+        np.stack([x1 + lx, y1, x1, y1, x1, y1 + ly], axis=1),
+        np.stack([x2 - lx, y1, x2, y1, x2, y1 + ly], axis=1),
+        np.stack([x1 + lx, y2, x1, y2, x1, y2 - ly], axis=1),
+        np.stack([x2 - lx, y2, x2, y2, x2, y2 - ly], axis=1),
+    ], axis=1)
+    return corners.reshape(-1, 3, 2).astype(np.int32)
+
+
+def rect_polylines(boxes):
+    x1, y1, x2, y2 = boxes.T
+    return np.stack([x1, y1, x2, y1, x2, y2, x1, y2], axis=1).reshape(-1, 4, 2).astype(np.int32)
+
+
+def detection_metadata(detections, registry, frame_shape, frame_index=None):
+    """Kadrni o'zi chizadigan tomoshabin uchun boxlar (ustunlar ko'rinishida)"""
+    height, width = frame_shape[:2]
+    metadata = {'frame': frame_index, 'width': int(width), 'height': int(height)}
+    if detections is None or len(detections) == 0:
+        metadata.update({'xyxy': [], 'class': [], 'label': [], 'color': [], 'confidence': [], 'tracker_id': []})
+        return metadata
+    class_ids = detections.class_id.astype(np.int64)
+    tracker_ids = detections.tracker_id if detections.tracker_id is not None else np.full(len(detections), -1)
+    metadata.update({
+        'xyxy': np.rint(detections.xyxy).astype(np.int64).tolist(),
+        'class': registry.names_array[class_ids].tolist(),
+        'label': registry.display_names[class_ids].tolist(),
+        # Brauzerda chizish uchun RGB
+        'color': registry.colors_bgr[class_ids][:, ::-1].tolist(),
+        'confidence': np.round(detections.confidence.astype(np.float64), 3).tolist(),
+        'tracker_id': np.asarray(tracker_ids, dtype=np.int64).tolist(),
+    })
+    return metadata
+
+
+class Renderer:
+    """Annotatsiya qayta ishlatiladigan buferga chiziladi; yozuvlar bir marta rasterlanib keshlanadi"""
+
+    def __init__(self, registry, show_confidence=True, show_track_id=True, label_position='top_left',
+                 boxes_for_tracked=True, text_scale=0.5, text_padding=5, thickness=2,
+                 confidence_step=5, max_sprites=1024, buffer_count=2):
+        self.registry = registry
+        self.show_confidence = show_confidence
+        self.show_track_id = show_track_id
+        # 'top_left' (tracking.py) yoki 'top_center' (camera-tracking.py)
+        self.label_position = label_position
+        # False bo'lsa trek qilinadigan classlar faqat burchak chiziqlari bilan chiziladi
+        self.boxes_for_tracked = boxes_for_tracked
+        self.text_scale = text_scale
+        self.text_padding = text_padding
+        self.thickness = thickness
+        # Ishonch foizi shu qadamga yaxlitlanadi - kesh kalitlari soni cheklanadi
+        self.confidence_step = confidence_step
+        self.max_sprites = max_sprites
+        # (class_id, tracker_id, ishonch qadami) yoki matn -> (piksellar, niqob)
+        self.sprites = OrderedDict()
+        # Kodlash tugaguncha oldingi kadr buferi o'zgarmasligi uchun bir nechta bufer navbat bilan
+        self.buffers = [None] * max(1, buffer_count)
+        self.buffer_index = 0
+        # Statistika
+        self.hits = 0
+        self.misses = 0
+
+    def output_buffer(self, frame):
+        """Kadr nusxasi uchun oldindan ajratilgan bufer (o'lcham o'zgarsagina qayta ajratiladi)"""
+        self.buffer_index = (self.buffer_index + 1) % len(self.buffers)
+        buffer = self.buffers[self.buffer_index]
+        if buffer is None or buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+            buffer = np.empty_like(frame)
+            self.buffers[self.buffer_index] = buffer
+        np.copyto(buffer, frame)
+        return buffer
+
+    def _cached(self, key, build):
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = build()
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_sprites:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    def label_text(self, class_id, tracker_id, bucket):
+        text = self.registry.display_names[class_id]
+        if bucket >= 0:
+            text += f" {bucket * self.confidence_step}%"
+        if tracker_id >= 0:
+            text += f" ID:{tracker_id}"
+        return text
+
+    def label_sprite(self, class_id, tracker_id, bucket):
+        """Rangli fonli yozuv - fon to'liq bo'lgani uchun niqobsiz ko'chiriladi"""
+        def build():
+            text = self.label_text(class_id, tracker_id, bucket)
+            (width, height), baseline = cv2.getTextSize(text, FONT, self.text_scale, 1)
+            pad = self.text_padding
+            pixels = np.empty((height + baseline + 2 * pad, width + 2 * pad, 3), dtype=np.uint8)
+            pixels[:] = self.registry.colors_bgr[class_id]
+            cv2.putText(pixels, text, (pad, pad + height), FONT, self.text_scale, TEXT_COLOR, 1, cv2.LINE_AA)
+            return pixels, None
+        return self._cached(('label', class_id, tracker_id, bucket), build)
+
+    def text_sprite(self, text, color, scale, thickness=2):
+        """Fonsiz matn (statistika qatorlari) - faqat harf piksellari ko'chiriladi"""
+        def build():
+            (width, height), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+            canvas = np.zeros((height + baseline + 2 * thickness, width + 2 * thickness, 3), dtype=np.uint8)
+            cv2.putText(canvas, text, (thickness, thickness + height), FONT, scale, color, thickness)
+            mask = cv2.putText(
+                np.zeros(canvas.shape[:2], dtype=np.uint8), text, (thickness, thickness + height),
+                FONT, scale, 255, thickness
+            ).astype(bool)
+            # Uchinchi qiymat - chap pastki nuqtadan sprite tepasigacha masofa
+            return canvas, mask, height + thickness
+        return self._cached(('text', text, color, scale, thickness), build)
+
+    def blit(self, out, sprite, x, y):
+        """Spriteni (x, y) chap yuqori burchakka ko'chirish; kadr chetidan chiqqan qismi kesiladi"""
+        pixels, mask = sprite
+        height, width = out.shape[:2]
+        h, w = pixels.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, width), min(y + h, height)
+        if x1 <= x0 or y1 <= y0:
+            return
+        src = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        if mask is None:
+            out[y0:y1, x0:x1] = pixels[src]
+        else:
+            np.copyto(out[y0:y1, x0:x1], pixels[src], where=mask[src][..., None])
+
+    def draw_text(self, out, text, org, color, scale, thickness=2):
+        """cv2.putText o'rnini bosadi: org - matnning chap pastki nuqtasi"""
+        pixels, mask, ascent = self.text_sprite(text, tuple(int(c) for c in color), scale, thickness)
+        self.blit(out, (pixels, mask), org[0] - thickness, org[1] - ascent)
+
+    def render(self, frame, detections, out=None):
+        """Barcha boxlar bitta o'tishda: har bir class rangi uchun bitta polylines chaqiruvi"""
+        if out is None:
+            out = self.output_buffer(frame)
+        if detections is None or len(detections) == 0:
+            return out
+
+        registry = self.registry
+        boxes = np.rint(detections.xyxy).astype(np.int32)
+        class_ids = detections.class_id.astype(np.int64)
+        tracked = registry.track[class_ids]
+        if detections.tracker_id is not None:
+            tracker_ids = np.asarray(detections.tracker_id, dtype=np.int64)
+        else:
+            tracker_ids = np.full(len(detections), -1, dtype=np.int64)
+
+        for class_id in np.unique(class_ids):
+            color = tuple(int(c) for c in registry.colors_bgr[class_id])
+            of_class = class_ids == class_id
+            corners = of_class & tracked
+            rects = of_class if self.boxes_for_tracked else of_class & ~tracked
+            if np.any(corners):
+                cv2.polylines(out, list(corner_polylines(boxes[corners])), False, color, self.thickness)
+            if np.any(rects):
+                cv2.polylines(out, list(rect_polylines(boxes[rects])), True, color, self.thickness)
+
+        # Yozuvlar boxlar ustidan, kesh kalitlari bitta vektorli hisoblashda
+        if self.show_confidence:
+            buckets = np.rint(detections.confidence * 100 / self.confidence_step).astype(np.int64)
+        else:
+            buckets = np.full(len(detections), -1, dtype=np.int64)
+        if not self.show_track_id:
+            tracker_ids = np.full(len(detections), -1, dtype=np.int64)
+        width = out.shape[1]
+        for (x1, y1, x2, _), class_id, tracker_id, bucket in zip(
+                boxes.tolist(), class_ids.tolist(), tracker_ids.tolist(), buckets.tolist()):
+            sprite = self.label_sprite(class_id, tracker_id, bucket)
+            h, w = sprite[0].shape[:2]
+            x = (x1 + x2 - w) // 2 if self.label_position == 'top_center' else x1
+            # Kadr chetidagi boxlarda yozuv kadr ichiga suriladi
+            self.blit(out, sprite, max(min(x, width - w), 0), max(y1 - h, 0))
+        return out
+
+    def get_stats(self):
+        return {
+            'sprites': len(self.sprites),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
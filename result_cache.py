@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+# Natija formati o'zgarsa oshiriladi - eski kesh yozuvlari avtomatik mos kelmay qoladi
+RESULT_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path, block_size=HASH_BLOCK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Fayl mazmuni + model og'irliklari + parametrlar bo'yicha natijalar keshi (diskda, LRU)"""
+
+    def __init__(self, root='cache', max_bytes=10 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    source TEXT,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+            # Katta fayllar qayta-qayta xeshlanmasligi uchun (yo'l, hajm, mtime) -> sha256
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    sha256 TEXT NOT NULL
+                )
+            """)
+
+    def known_hash(self, path):
+        """Avval hisoblangan xesh (fayl o'zgarmagan bo'lsa), aks holda None"""
+        stat = os.stat(path)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? AND mtime = ?",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime)
+            ).fetchone()
+        return row['sha256'] if row is not None else None
+
+    def remember_hash(self, path, sha256):
+        stat = os.stat(path)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime, sha256) VALUES (?, ?, ?, ?)",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime, sha256)
+            )
+
+    def file_hash(self, path):
+        sha256 = self.known_hash(path)
+        if sha256 is None:
+            sha256 = hash_file(path)
+            self.remember_hash(path, sha256)
+        return sha256
+
+    def make_key(self, content_hash, weights_path, params):
+        """Kesh kaliti: video mazmuni, og'irliklar mazmuni va natijaga ta'sir qiluvchi parametrlar"""
+        key_data = {
+            'version': RESULT_VERSION,
+            'content': content_hash,
+            'weights': self.file_hash(weights_path) if os.path.exists(weights_path) else weights_path,
+            'params': params,
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        """Kesh yozuvi (fayl yo'llari va summary) yoki None; foydalanish vaqti yangilanadi"""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        entry_dir = self.entry_dir(key)
+        manifest_path = os.path.join(entry_dir, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            # Disk qo'lda tozalangan - indeksdan ham o'chiriladi
+            self.remove(key)
+            return None
+
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest['files'] = {kind: os.path.join(entry_dir, name) for kind, name in manifest['files'].items()}
+        return manifest
+
+    def contains(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def put(self, key, files, summary=None, source=None):
+        """Natija fayllarini keshga joylash: imkon bo'lsa hardlink, aks holda nusxa"""
+        entry_dir = self.entry_dir(key)
+        tmp_dir = entry_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        names = {}
+        size = 0
+        for kind, path in files.items():
+            name = f"{kind}{os.path.splitext(path)[1]}"
+            target = os.path.join(tmp_dir, name)
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copy2(path, target)
+            names[kind] = name
+            size += os.path.getsize(target)
+
+        manifest = {'key': key, 'source': source, 'files': names, 'summary': summary, 'created_at': time.time()}
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, size, source, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, size, source, now, now)
+            )
+        self.evict(keep=key)
+        return self.get(key)
+
+    def remove(self, key):
+        shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def total_size(self):
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self, keep=None):
+        """Hajm chegaradan oshsa eng uzoq ishlatilmagan yozuvlarni o'chirish"""
+        total = self.total_size()
+        if total <= self.max_bytes:
+            return 0
+        with self.lock:
+            rows = self.conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall()
+        removed = 0
+        for row in rows:
+            if total <= self.max_bytes:
+                break
+            if row['key'] == keep:
+                continue
+            self.remove(row['key'])
+            total -= row['size']
+            removed += 1
+        if removed:
+            print(f"Keshdan {removed} ta eski natija o'chirildi")
+        return removed
+
+    def get_stats(self):
+        with self.lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        total = self.total_size()
+        return {
+            'entries': count,
+            'size_mb': round(total / (1024 * 1024), 2),
+            'max_mb': round(self.max_bytes / (1024 * 1024), 2),
+        }
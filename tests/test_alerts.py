@@ -0,0 +1,103 @@
+import threading
+
+import numpy as np
+
+import alerts
+from alerts import AlertDispatcher, TTLCache, create_alert_dispatcher
+
+FRAME = np.zeros((8, 8, 3), dtype=np.uint8)
+
+
+class FakeSink:
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.closed = False
+        self.sent = threading.Event()
+
+    def send(self, alerts):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('tarmoq')
+        self.batches.append([(alert.class_name, alert.tracker_id) for alert in alerts])
+        self.sent.set()
+
+    def close(self):
+        self.closed = True
+
+
+def test_cooldown_suppresses_same_class_per_camera():
+    dispatcher = AlertDispatcher(FakeSink(), cooldown=30.0, dedup_ttl=600.0)
+    assert dispatcher.notify(1, 'Fire', None, FRAME)
+    assert not dispatcher.notify(1, 'Fire', None, FRAME)
+    assert dispatcher.notify(2, 'Fire', None, FRAME)
+    assert dispatcher.notify(1, 'Smoke', None, FRAME)
+    assert dispatcher.suppressed == 1
+    assert dispatcher.enqueued == 3
+
+
+def test_same_track_alerts_once_even_after_cooldown():
+    dispatcher = AlertDispatcher(FakeSink(), cooldown=0.0)
+    assert dispatcher.notify(1, 'shubhali_harakat', 7, FRAME)
+    assert not dispatcher.notify(1, 'shubhali_harakat', 7, FRAME)
+    assert dispatcher.notify(1, 'shubhali_harakat', 8, FRAME)
+    assert dispatcher.get_stats()['tracked_ids'] == 2
+
+
+def test_full_queue_drops_without_blocking():
+    dispatcher = AlertDispatcher(FakeSink(), queue_size=1, cooldown=0.0)
+    assert dispatcher.notify(1, 'Fire', None, FRAME)
+    assert not dispatcher.notify(1, 'Smoke', None, FRAME)
+    assert dispatcher.dropped == 1
+    # Tashlangan ogohlantirish cooldown ni boshlamaydi
+    assert 'Smoke' not in {key[1] for key in dispatcher.last_sent}
+
+
+def test_worker_batches_retries_and_notifies_listeners():
+    sink = FakeSink(failures=1)
+    heard = []
+    dispatcher = AlertDispatcher(sink, cooldown=0.0, batch_window=0.3, backoff=0.01,
+                                 listeners=[lambda batch: heard.extend(alert.image[:2] for alert in batch)])
+    dispatcher.notify(1, 'Fire', None, FRAME)
+    dispatcher.notify(1, 'Smoke', None, FRAME)
+    dispatcher.start()
+    assert sink.sent.wait(timeout=5.0)
+    dispatcher.stop()
+    assert sink.batches == [[('Fire', None), ('Smoke', None)]]
+    assert heard == [b'\xff\xd8', b'\xff\xd8']
+    assert dispatcher.sent == 2
+    assert dispatcher.failed == 0
+    assert sink.closed
+
+
+def test_send_gives_up_after_max_retries():
+    sink = FakeSink(failures=10)
+    dispatcher = AlertDispatcher(sink, max_retries=2, backoff=0.0)
+    assert not dispatcher._send_with_retry(['alert'])
+    assert sink.failures == 7
+    assert dispatcher.failed == 1
+
+
+def test_ttl_cache_expires_and_bounds_size(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(alerts.time, 'monotonic', lambda: clock[0])
+    cache = TTLCache(ttl=10.0, max_size=2)
+    cache.add('a')
+    cache.add('b')
+    cache.add('c')
+    assert 'a' not in cache
+    assert len(cache) == 2
+    clock[0] += 11.0
+    assert 'b' not in cache
+    assert len(cache) == 0
+
+
+def test_factory_needs_sink_or_listener(monkeypatch):
+    monkeypatch.setattr(alerts, 'has_telegram_config', lambda: False)
+    assert create_alert_dispatcher() is None
+    dispatcher = create_alert_dispatcher(listeners=[print])
+    try:
+        assert dispatcher.sink is None
+        assert dispatcher.running
+    finally:
+        dispatcher.stop()
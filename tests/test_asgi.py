@@ -0,0 +1,156 @@
+import asyncio
+
+from flask import Flask, Response, jsonify, request
+
+from asgi import StreamingASGI
+from frame_hub import FrameHub
+
+
+def make_flask_app():
+    app = Flask(__name__)
+
+    @app.route('/echo', methods=['POST', 'PUT'])
+    def echo():
+        data = request.get_data()
+        return jsonify({
+            'size': len(data),
+            'head': data[:16].decode(),
+            'content_type': request.content_type,
+            'custom': request.headers.get('X-Custom'),
+            'query': request.args.get('q'),
+        })
+
+    @app.route('/big')
+    def big():
+        def generate():
+            for i in range(64):
+                yield bytes([i]) * 65536
+        return Response(generate(), mimetype='application/octet-stream', headers={'X-Parts': '64'})
+
+    return app
+
+
+class FakeProcessor:
+    current_source = 'demo'
+
+    def __init__(self):
+        self.hub = FrameHub()
+        self.raw_hub = FrameHub()
+
+    def start_producer(self):
+        pass
+
+
+def call(app, scope, chunks=(), disconnect_after=None):
+    """ASGI so'rov: tana bo'laklari receive orqali, javob xabarlari ro'yxat bo'lib qaytadi"""
+    scope = {'type': 'http', 'http_version': '1.1', 'scheme': 'http', 'query_string': b'', 'headers': [],
+             'server': ('testserver', 80), 'client': ('127.0.0.1', 5000), 'root_path': '', **scope}
+    messages = []
+
+    async def run():
+        pending = list(chunks)
+        disconnect = asyncio.Event()
+
+        async def receive():
+            if pending:
+                body = pending.pop(0)
+                return {'type': 'http.request', 'body': body, 'more_body': bool(pending)}
+            if not chunks and not messages:
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if disconnect_after is not None and len(messages) >= disconnect_after:
+                disconnect.set()
+
+        await asyncio.wait_for(app(scope, receive, send), timeout=10)
+
+    asyncio.run(run())
+    return messages
+
+
+def response(messages):
+    start = messages[0]
+    assert start['type'] == 'http.response.start'
+    body = b''.join(m.get('body', b'') for m in messages[1:])
+    return start['status'], dict(start['headers']), body
+
+
+def make_app(processor=None):
+    def resolve_stream(path):
+        if path != '/video_feed':
+            return None
+        return processor or False
+    return StreamingASGI(make_flask_app(), resolve_stream)
+
+
+def test_body_with_content_length_and_headers():
+    body = b'{"hello": "world"}'
+    messages = call(make_app(), {
+        'method': 'POST', 'path': '/echo', 'query_string': b'q=1',
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                    (b'x-custom', b'abc')],
+    }, chunks=[body])
+    status, headers, payload = response(messages)
+    assert status == 200
+    assert headers[b'content-type'] == b'application/json'
+    assert b'"size":18' in payload.replace(b' ', b'')
+    assert b'"custom":"abc"' in payload.replace(b' ', b'')
+    assert b'"query":"1"' in payload.replace(b' ', b'')
+
+
+def test_chunked_body_without_content_length():
+    # /uploads PUT: Content-Length yo'q, tana bir nechta receive xabarida
+    parts = [b'a' * 100000, b'b' * 100000, b'c' * 1234]
+    messages = call(make_app(), {
+        'method': 'PUT', 'path': '/echo',
+        'headers': [(b'content-type', b'application/octet-stream'), (b'transfer-encoding', b'chunked')],
+    }, chunks=parts)
+    status, _, payload = response(messages)
+    assert status == 200
+    assert b'"size":201234' in payload.replace(b' ', b'')
+
+
+def test_streaming_response_is_sent_in_parts():
+    messages = call(make_app(), {'method': 'GET', 'path': '/big'})
+    status, headers, payload = response(messages)
+    assert status == 200
+    assert headers[b'x-parts'] == b'64'
+    assert len(payload) == 64 * 65536
+    assert payload[:1] == b'\x00' and payload[-1:] == b'\x3f'
+    # Javob xotirada bitta bo'lakka yig'ilmaydi
+    assert len(messages) > 2
+
+
+def test_missing_stream_is_404():
+    messages = call(make_app(), {'method': 'GET', 'path': '/video_feed'})
+    status, _, payload = response(messages)
+    assert status == 404
+    assert b'Oqim topilmadi' in payload
+
+
+def test_socketio_rejected_without_server():
+    messages = call(make_app(), {'method': 'GET', 'path': '/socket.io/', 'query_string': b'EIO=4&transport=polling'})
+    status, _, _ = response(messages)
+    assert status == 404
+
+
+def test_mjpeg_stream_delivers_published_frames():
+    processor = FakeProcessor()
+    processor.hub.publish({('full', 85): b'JPEG-1'})
+    # start, birinchi kadr (oxirgi kadr obunada darhol beriladi) va keyin uzilish
+    messages = call(make_app(processor), {'method': 'GET', 'path': '/video_feed'}, disconnect_after=2)
+    status, headers, payload = response(messages)
+    assert status == 200
+    assert headers[b'content-type'].startswith(b'multipart/x-mixed-replace')
+    assert payload.startswith(b'--frame\r\nContent-Type: image/jpeg\r\n\r\nJPEG-1\r\n')
+    assert processor.hub.subscriber_count() == 0
+
+
+def test_mjpeg_stream_rejects_unknown_tier():
+    processor = FakeProcessor()
+    messages = call(make_app(processor), {'method': 'GET', 'path': '/video_feed', 'query_string': b'tier=huge'})
+    status, _, _ = response(messages)
+    assert status == 400
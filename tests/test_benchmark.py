@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import benchmark
+from benchmark import StageRecorder, SyntheticCapture, compare
+
+
+def stage(p50, p95, p99):
+    return {'count': 10, 'mean_ms': p50, 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+
+
+def test_synthetic_capture_is_reproducible():
+    first = SyntheticCapture(frames=5, width=160, height=120, seed=3)
+    second = SyntheticCapture(frames=5, width=160, height=120, seed=3)
+    frames = [first.read()[1] for _ in range(5)]
+    assert all(np.array_equal(a, second.read()[1]) for a in frames)
+    assert not np.array_equal(frames[0], frames[1])
+    assert first.read() == (False, None)
+    assert not np.array_equal(SyntheticCapture(frames=1, width=160, height=120, seed=4).read()[1], frames[0])
+
+
+def test_stage_recorder_skips_warmup(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(benchmark.time, 'perf_counter', lambda: clock[0])
+    recorder = StageRecorder(warmup=2)
+    for _ in range(6):
+        recorder.begin_frame()
+        recorder.record('inference', 0.004)
+        clock[0] += 0.01
+        recorder.end_frame(True)
+    summary = recorder.summary()
+    assert summary['frame']['count'] == 4
+    assert summary['inference']['count'] == 4
+    assert summary['frame']['p50_ms'] == pytest.approx(10.0)
+    # Isish tugagach 4 kadr 0.04 s da
+    assert recorder.throughput() == pytest.approx(100.0)
+
+
+def test_compare_reports_only_real_regressions():
+    baseline = {
+        'fps': 30.0,
+        'stages': {'inference': stage(20.0, 30.0, 40.0), 'encode': stage(0.2, 0.3, 0.5)},
+        'peak_rss_mb': 500.0,
+    }
+    same = {'fps': 29.0, 'stages': {'inference': stage(21.0, 31.0, 41.0), 'encode': stage(0.9, 0.9, 0.9)},
+            'peak_rss_mb': 510.0}
+    assert compare(same, baseline, threshold=0.1) == []
+
+    worse = {'fps': 20.0, 'stages': {'inference': stage(20.0, 40.0, 40.0)}, 'peak_rss_mb': 700.0}
+    assert compare(worse, baseline, threshold=0.1) == [
+        'fps: 30.0 -> 20.0',
+        'inference.p95_ms: 30.0 -> 40.0',
+        'peak_rss_mb: 500.0 -> 700.0',
+    ]
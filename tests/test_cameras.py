@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+import cameras
+from cameras import CameraRegistry, HotplugMonitor
+
+MODES = [
+    {'format': 'YUYV', 'width': 1280, 'height': 720, 'fps': [10.0]},
+    {'format': 'MJPG', 'width': 1280, 'height': 720, 'fps': [30.0, 15.0]},
+    {'format': 'MJPG', 'width': 640, 'height': 480, 'fps': [30.0]},
+]
+
+
+class FakeSysfs:
+    """tmp papkadagi /sys/class/video4linux; query_modes chaqiruvlari yoziladi"""
+
+    def __init__(self, root):
+        self.root = root
+        self.queried = []
+
+    def add(self, name, label, dev):
+        node = self.root / name
+        node.mkdir()
+        (node / 'name').write_text(label + '\n')
+        (node / 'dev').write_text(dev + '\n')
+
+    def query_modes(self, path):
+        self.queried.append(path)
+        return {'capture': True, 'modes': MODES}
+
+
+@pytest.fixture
+def sysfs(tmp_path, monkeypatch):
+    sysfs = FakeSysfs(tmp_path / 'video4linux')
+    sysfs.root.mkdir()
+    monkeypatch.setattr(cameras, 'SYSFS_ROOT', str(sysfs.root))
+    monkeypatch.setattr(cameras, 'stable_ids', lambda: {})
+    monkeypatch.setattr(cameras, 'query_modes', sysfs.query_modes)
+    return sysfs
+
+
+def test_refresh_lists_devices_without_opening_them(sysfs):
+    sysfs.add('video0', 'USB Camera', '81:0')
+    sysfs.add('video2', 'Other', '81:2')
+    registry = CameraRegistry()
+    registry.refresh()
+    assert sorted(registry.devices) == [0, 2]
+    assert registry.get(0)['modes'] is None
+    assert sysfs.queried == []
+
+
+def test_modes_are_queried_lazily_once(sysfs):
+    sysfs.add('video0', 'USB Camera', '81:0')
+    registry = CameraRegistry()
+    registry.refresh()
+    assert [device['name'] for device in registry.list_devices()] == ['USB Camera']
+    registry.list_devices()
+    assert sysfs.queried == ['/dev/video0']
+    assert registry.get(0)['modes'] == MODES
+
+
+def test_device_in_use_is_not_queried(sysfs):
+    sysfs.add('video0', 'USB Camera', '81:0')
+    registry = CameraRegistry()
+    registry.refresh()
+    registry.acquire(0)
+    registry.acquire(0)
+    assert registry.pick_mode(0) is None
+    registry.release(0)
+    assert registry.ensure_modes(0)['modes'] is None
+    registry.release(0)
+    assert registry.ensure_modes(0)['modes'] == MODES
+    assert sysfs.queried == ['/dev/video0']
+
+
+def test_replugged_device_is_requeried(sysfs):
+    sysfs.add('video0', 'USB Camera', '81:0')
+    registry = CameraRegistry()
+    registry.refresh()
+    registry.ensure_modes(0)
+    registry.refresh()
+    assert registry.get(0)['modes'] == MODES
+
+    (sysfs.root / 'video0' / 'dev').write_text('81:5\n')
+    registry.refresh()
+    assert registry.get(0)['modes'] is None
+    registry.ensure_modes(0)
+    assert len(sysfs.queried) == 2
+
+
+def test_pick_mode_prefers_closest_size_then_fps_then_mjpg(sysfs):
+    sysfs.add('video0', 'USB Camera', '81:0')
+    registry = CameraRegistry()
+    registry.refresh()
+    assert registry.pick_mode(0) == {'format': 'MJPG', 'width': 1280, 'height': 720, 'fps': 30.0}
+    assert registry.pick_mode(0, width=640, height=480, fps=30) == {
+        'format': 'MJPG', 'width': 640, 'height': 480, 'fps': 30.0
+    }
+    assert registry.pick_mode(7) is None
+
+
+def test_inotify_monitor_reports_video_nodes(tmp_path, monkeypatch):
+    monkeypatch.setattr(cameras, 'pyudev', None)
+    monkeypatch.setattr(cameras, 'DEV_ROOT', str(tmp_path))
+    monitor = HotplugMonitor()
+    if monitor.kind is None:
+        pytest.skip("inotify mavjud emas")
+    try:
+        assert monitor.kind == 'inotify'
+        assert not monitor.wait(0.05)
+        (tmp_path / 'ttyUSB0').write_text('')
+        assert not monitor.wait(0.2)
+        (tmp_path / 'video3').write_text('')
+        assert monitor.wait(1.0)
+        os.remove(tmp_path / 'video3')
+        assert monitor.wait(1.0)
+    finally:
+        monitor.close()
@@ -0,0 +1,121 @@
+import threading
+import time
+
+from capture import FrameGrabber
+
+
+class FakeCapture:
+    """cv2.VideoCapture o'rniga: kadrlar raqamlar, tugagach (False, None)"""
+
+    def __init__(self, frames, delay=0.0, block=None):
+        self.frames = list(frames)
+        self.delay = delay
+        # Berilsa read() shu hodisa kelguncha bloklanadi (RTSP timeout kabi)
+        self.block = block
+        self.releases = 0
+        self.reading = threading.Event()
+
+    def read(self):
+        self.reading.set()
+        if self.block is not None:
+            self.block.wait()
+        if self.delay:
+            time.sleep(self.delay)
+        if not self.frames:
+            return False, None
+        return True, self.frames.pop(0)
+
+    def release(self):
+        self.releases += 1
+
+
+def read_all(grabber, limit=100):
+    frames = []
+    while not grabber.is_exhausted() and len(frames) < limit:
+        item = grabber.read(timeout=1.0)
+        if item is not None:
+            frames.append(item)
+    return frames
+
+
+def test_file_source_delivers_every_frame_then_eof():
+    cap = FakeCapture(range(20))
+    grabber = FrameGrabber(cap, buffer_size=2, latest_only=False, drop_oldest=False, stop_on_eof=True).start()
+    items = read_all(grabber)
+    assert [frame for _, frame in items] == list(range(20))
+    assert [frame_id for frame_id, _ in items] == list(range(1, 21))
+    assert grabber.dropped_frames == 0
+    assert grabber.is_exhausted()
+    grabber.thread.join(timeout=1.0)
+    assert cap.releases == 1
+
+
+def test_live_source_drops_oldest_when_reader_is_slow():
+    cap = FakeCapture(range(10))
+    grabber = FrameGrabber(cap, buffer_size=2, latest_only=False, drop_oldest=True, stop_on_eof=True).start()
+    grabber.thread.join(timeout=1.0)
+    # O'quvchi yo'q: buferda oxirgi ikkitasi qoladi
+    assert grabber.dropped_frames == 8
+    assert [frame for _, frame in read_all(grabber)] == [8, 9]
+
+
+def test_latest_only_returns_newest_frame():
+    cap = FakeCapture(range(5))
+    grabber = FrameGrabber(cap, buffer_size=3, latest_only=True, drop_oldest=True, stop_on_eof=True).start()
+    grabber.thread.join(timeout=1.0)
+    frame_id, frame = grabber.read()
+    assert frame == 4
+    assert grabber.read(timeout=0.05) is None
+    # 0, 1 bufer to'lganda, 2, 3 read() da tashlangan
+    assert grabber.dropped_frames == 4
+
+
+def test_read_times_out_without_frames():
+    block = threading.Event()
+    grabber = FrameGrabber(FakeCapture([], block=block), stop_on_eof=True).start()
+    started = time.monotonic()
+    assert grabber.read(timeout=0.1) is None
+    assert time.monotonic() - started < 1.0
+    block.set()
+    grabber.stop()
+
+
+def test_stop_never_releases_under_a_blocked_read():
+    block = threading.Event()
+    released = []
+    cap = FakeCapture([1, 2], block=block)
+    grabber = FrameGrabber(cap, on_release=lambda: released.append(True)).start()
+    cap.reading.wait(timeout=1.0)
+    thread = grabber.thread
+
+    grabber.stop(timeout=0.1)
+    # read() hali bloklangan - manba capture threaddan tashqarida yopilmaydi
+    assert cap.releases == 0
+    block.set()
+    thread.join(timeout=1.0)
+    assert cap.releases == 1
+    assert released == [True]
+
+    grabber.stop()
+    assert cap.releases == 1
+
+
+def test_stop_before_start_releases():
+    cap = FakeCapture([])
+    FrameGrabber(cap).stop()
+    assert cap.releases == 1
+
+
+def test_read_errors_do_not_kill_the_thread():
+    class Flaky(FakeCapture):
+        def read(self):
+            if self.frames and self.frames[0] == 'boom':
+                self.frames.pop(0)
+                raise RuntimeError('decoder')
+            return super().read()
+
+    cap = Flaky(['boom', 1, 2])
+    grabber = FrameGrabber(cap, latest_only=False, drop_oldest=False, stop_on_eof=False).start()
+    items = [grabber.read(timeout=1.0) for _ in range(2)]
+    grabber.stop()
+    assert [frame for _, frame in items] == [1, 2]
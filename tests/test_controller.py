@@ -0,0 +1,74 @@
+import pytest
+
+import controller as controller_module
+from controller import QUALITY_LEVELS, LatencyController
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run(controller, clock, frames, latency):
+    detected = []
+    for _ in range(frames):
+        controller.begin_frame()
+        detect = controller.should_detect()
+        clock.now += latency
+        controller.end_frame(detect)
+        detected.append(detect)
+    return detected
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(controller_module.time, 'perf_counter', clock)
+    return clock
+
+
+def test_degrades_over_budget_and_waits_for_cooldown(clock):
+    controller = LatencyController(budget_ms=100, cooldown_frames=10)
+    run(controller, clock, 9, 0.3)
+    assert controller.level == 0
+    run(controller, clock, 1, 0.3)
+    assert controller.level == 1
+    run(controller, clock, 9, 0.3)
+    assert controller.level == 1
+    run(controller, clock, 100, 0.3)
+    assert controller.level == len(QUALITY_LEVELS) - 1
+    assert (controller.stride, controller.imgsz) == QUALITY_LEVELS[-1]
+
+
+def test_recovers_only_below_headroom(clock):
+    controller = LatencyController(budget_ms=100, cooldown_frames=5, smoothing=1.0)
+    controller.set_level(3)
+    run(controller, clock, 20, 0.08)
+    # Byudjet ichida, lekin headroom (60%) dan yuqori - daraja o'zgarmaydi
+    assert controller.level == 3
+    run(controller, clock, 50, 0.03)
+    assert controller.level == 0
+
+
+def test_stride_controls_detection_frames(clock):
+    controller = LatencyController(levels=[(3, 320)])
+    detected = run(controller, clock, 7, 0.01)
+    assert detected == [True, False, False, True, False, False, True]
+
+
+def test_end_frame_records_latency_and_status(clock):
+    controller = LatencyController(budget_ms=150)
+    controller.begin_frame()
+    controller.record('detect', 0.02)
+    clock.now += 0.05
+    controller.end_frame(detected=True)
+    status = controller.get_status()
+    assert status['budget_ms'] == 150.0
+    assert status['latency_ms'] == 50.0
+    assert status['detect_latency_ms'] == 50.0
+    assert status['stages_ms'] == {'detect': 20.0}
+    controller.reset()
+    assert controller.get_status()['latency_ms'] is None
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from detectors import OnnxDetector, letterbox, load_detector
+
+
+def test_letterbox_keeps_aspect_and_pads_with_gray():
+    frame = np.zeros((360, 640, 3), dtype=np.uint8)
+    frame[..., 2] = 255
+    blob, gain, pad = letterbox(frame, 320)
+    assert blob.shape == (3, 320, 320)
+    assert blob.dtype == np.float32
+    assert gain == 0.5
+    assert pad == (0, 70)
+    # To'ldirilgan qism 114, rasm qismi RGB tartibida
+    assert blob[0, 0, 0] == pytest.approx(114 / 255)
+    assert blob[:, 160, 160].tolist() == [1.0, 0.0, 0.0]
+
+
+def make_detector(conf=0.25, iou=0.7):
+    # Sessiyasiz: faqat postprocess tekshiriladi
+    detector = OnnxDetector.__new__(OnnxDetector)
+    detector.conf = conf
+    detector.iou = iou
+    detector.names = {0: 'person', 1: 'fire'}
+    return detector
+
+
+def raw_output(rows):
+    """(cx, cy, w, h, score0, score1) qatorlari -> YOLOv8 chiqishi (4 + nc, N)"""
+    return np.array(rows, dtype=np.float32).T
+
+
+def test_postprocess_filters_nms_and_maps_back_to_frame():
+    output = raw_output([
+        (100, 100, 40, 40, 0.9, 0.1),
+        (102, 101, 40, 40, 0.8, 0.1),   # birinchisi bilan ustma-ust - NMS tashlaydi
+        (102, 101, 40, 40, 0.1, 0.7),   # boshqa class - qoladi
+        (200, 200, 20, 20, 0.2, 0.1),   # conf dan past
+    ])
+    detections = make_detector().postprocess(output, gain=0.5, pad=(0, 70), shape=(360, 640))
+    assert list(detections.class_id) == [0, 1]
+    assert list(detections.data['class_name']) == ['person', 'fire']
+    np.testing.assert_allclose(detections.xyxy[0], [160, 20, 240, 100])
+    np.testing.assert_allclose(detections.confidence, [0.9, 0.7], rtol=1e-6)
+
+
+def test_postprocess_clips_to_frame_and_handles_empty():
+    detector = make_detector()
+    edge = detector.postprocess(raw_output([(5, 5, 40, 40, 0.9, 0.0)]), gain=1.0, pad=(0, 0), shape=(100, 100))
+    assert edge.xyxy[0].tolist() == [0, 0, 25, 25]
+    empty = detector.postprocess(raw_output([(5, 5, 40, 40, 0.1, 0.0)]), gain=1.0, pad=(0, 0), shape=(100, 100))
+    assert len(empty) == 0
+    assert len(empty.data['class_name']) == 0
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        load_detector('model.pt', backend='tensorrt')
@@ -0,0 +1,72 @@
+import numpy as np
+
+import frame_hub
+from encoder import QUALITY_STEPS, encode_variants, mjpeg_part, resize_to_tier
+from frame_hub import FrameHub, pick_variant
+
+
+def frame(width=1280, height=720):
+    return np.zeros((height, width, 3), dtype=np.uint8)
+
+
+def test_resize_to_tier_keeps_aspect_and_never_upscales():
+    assert resize_to_tier(frame(), 'w640').shape == (360, 640, 3)
+    assert resize_to_tier(frame(), 'thumb').shape == (180, 320, 3)
+    small = frame(200, 100)
+    assert resize_to_tier(small, 'thumb') is small
+    original = frame()
+    assert resize_to_tier(original, 'full') is original
+
+
+def test_encode_variants_produces_each_requested_pair():
+    variants = encode_variants(frame(), {('full', 85), ('full', 40), ('thumb', 70)})
+    assert set(variants) == {('full', 85), ('full', 40), ('thumb', 70)}
+    assert all(data.startswith(b'\xff\xd8') for data in variants.values())
+
+
+def test_pick_variant_falls_back_to_nearest_quality():
+    variants = {('full', 85): b'a', ('full', 40): b'b', ('thumb', 70): b'c'}
+    assert pick_variant(variants, 'full', 85) == b'a'
+    assert pick_variant(variants, 'full', 55) == b'b'
+    assert pick_variant(variants, 'thumb', 85) == b'c'
+    assert pick_variant(variants, 'w640', 85) is None
+
+
+def test_wanted_variants_follow_subscribers():
+    hub = FrameHub()
+    hub.subscribe(tier='full')
+    hub.subscribe(tier='thumb')
+    assert hub.wanted_variants() == {('full', QUALITY_STEPS[0]), ('thumb', QUALITY_STEPS[0])}
+
+
+def publish_windows(hub, subscriber, windows, read, clock):
+    # Har oraliqda 8 ta kadr (vaqt qadami ikkilikda aniq); read - tomoshabin o'qiydigan kadrlar soni
+    for _ in range(windows):
+        for index in range(8):
+            hub.publish({('full', q): b'x' for q in QUALITY_STEPS})
+            if index < read:
+                subscriber.get(timeout=0)
+            clock[0] += frame_hub.ADAPT_INTERVAL / 8
+
+
+def test_quality_steps_down_for_lagging_viewer_and_recovers(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(frame_hub.time, 'monotonic', lambda: clock[0])
+    hub = FrameHub()
+    subscriber = hub.subscribe()
+
+    publish_windows(hub, subscriber, 2, read=3, clock=clock)
+    assert subscriber.quality == QUALITY_STEPS[1]
+
+    publish_windows(hub, subscriber, 10, read=3, clock=clock)
+    assert subscriber.quality == QUALITY_STEPS[-1]
+
+    publish_windows(hub, subscriber, frame_hub.UPGRADE_WINDOWS + 1, read=8, clock=clock)
+    assert subscriber.quality == QUALITY_STEPS[-2]
+    assert hub.wanted_variants() == {('full', QUALITY_STEPS[-2])}
+
+
+def test_mjpeg_part_framing():
+    assert mjpeg_part(b'JPEG', b'X-Detections: []\r\n') == (
+        b'--frame\r\nContent-Type: image/jpeg\r\nX-Detections: []\r\n\r\nJPEG\r\n'
+    )
@@ -0,0 +1,118 @@
+import time
+
+import numpy as np
+import pytest
+import supervision as sv
+
+from events import EventStore, parse_time
+from registry import ClassRegistry
+
+
+@pytest.fixture
+def registry():
+    registry = ClassRegistry()
+    # Person - trek qilinadi, Fire - trek qilinmaydi
+    registry.register_model('model', {0: 'Person', 1: 'Fire'})
+    return registry
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EventStore(str(tmp_path / 'events.db'), thumbnail_folder=str(tmp_path / 'thumbs'), idle_timeout=5.0)
+    yield store
+    store.stop()
+
+
+def detections(confidence, class_ids=(0, 1), tracker_ids=(7, -1)):
+    count = len(class_ids)
+    return sv.Detections(
+        xyxy=np.tile(np.array([[100, 100, 400, 500]], dtype=np.float32), (count, 1)),
+        confidence=np.full(count, confidence, dtype=np.float32),
+        class_id=np.array(class_ids),
+        tracker_id=np.array(tracker_ids),
+    )
+
+
+FRAME = np.zeros((720, 1280, 3), dtype=np.uint8)
+
+
+def test_queue_holds_boxes_and_small_crops_only(store, registry):
+    store.record('cam', detections(0.5), FRAME, registry, timestamp=100.0)
+    store.record('cam', detections(0.4), FRAME, registry, timestamp=101.0)
+    first, second = list(store.queue.queue)
+    # Kadr navbatga tushmaydi; rasm faqat ishonch oshganda va kichraytirilgan
+    for _, rows in (first, second):
+        for _, _, crop in rows:
+            assert crop is None or max(crop.shape[:2]) <= 256
+    assert all(crop is not None for _, _, crop in first[1])
+    assert all(crop is None for _, _, crop in second[1])
+
+
+def test_unconfirmed_track_is_skipped(store, registry):
+    assert not store.record('cam', detections(0.9, class_ids=(0,), tracker_ids=(-1,)), FRAME, registry)
+    assert store.queue.qsize() == 0
+
+
+def test_stop_drains_queue_and_writes_open_tracks(store, registry):
+    store.start()
+    for i, confidence in enumerate((0.5, 0.9, 0.7)):
+        store.record('cam', detections(confidence), FRAME, registry, timestamp=100.0 + i)
+    store.stop()
+
+    tracks = store.query(start=0)
+    assert {track['class_name'] for track in tracks} == {'Person', 'Fire'}
+    person = next(track for track in tracks if track['class_name'] == 'Person')
+    assert person['tracker_id'] == 7
+    assert person['frames'] == 3
+    assert person['first_seen'] == 100.0 and person['last_seen'] == 102.0
+    assert person['max_confidence'] == pytest.approx(0.9)
+    assert person['thumbnail'] is not None
+    assert not person['open']
+
+
+def test_stop_without_worker_still_flushes(store, registry):
+    store.record('cam', detections(0.6), FRAME, registry, timestamp=100.0)
+    store.stop()
+    assert len(store.query()) == 2
+
+
+def test_query_filters_and_open_tracks(store, registry):
+    store.record('cam1', detections(0.6), FRAME, registry, timestamp=100.0)
+    store.record('cam2', detections(0.6, class_ids=(0,), tracker_ids=(3,)), FRAME, registry, timestamp=200.0)
+    store._drain()
+
+    # Yozilmagan treklar ham ochiq sifatida qaytadi
+    tracks = store.query()
+    assert [track['last_seen'] for track in tracks] == [200.0, 100.0, 100.0]
+    assert all(track['open'] for track in tracks)
+
+    store._flush(close_all=True)
+    assert [track['camera'] for track in store.query(camera='cam2')] == ['cam2']
+    assert [track['class_name'] for track in store.query(class_name='Fire')] == ['Fire']
+    assert len(store.query(start=150)) == 1
+    assert len(store.query(end=150)) == 2
+    assert len(store.query(limit=1)) == 1
+
+    summary = {row['class_name']: row for row in store.summary()}
+    assert summary['Person']['tracks'] == 2
+    assert summary['Fire']['frames'] == 1
+    event_id = store.query(camera='cam2')[0]['id']
+    assert store.get(event_id)['tracker_id'] == 3
+
+
+def test_idle_tracks_close_and_reopen(store, registry):
+    now = time.time()
+    store.record('cam', detections(0.6), FRAME, registry, timestamp=now - 10)
+    store._drain()
+    assert store._flush() == 2
+    # Yopilgan trek uchun eng yaxshi ishonch unutiladi - yangi davr yana rasm oladi
+    store.record('cam', detections(0.3), FRAME, registry, timestamp=now)
+    _, rows = store.queue.get_nowait()
+    assert all(crop is not None for _, _, crop in rows)
+
+
+def test_parse_time():
+    assert parse_time(None) is None
+    assert parse_time('') is None
+    assert parse_time('1700000000.5') == 1700000000.5
+    assert parse_time('2026-10-16T08:30') == pytest.approx(time.mktime((2026, 10, 16, 8, 30, 0, 0, 0, -1)))
@@ -0,0 +1,66 @@
+import threading
+
+from frame_hub import FrameHub, Subscriber
+
+
+def test_publish_fans_out_one_encoding_to_every_subscriber():
+    hub = FrameHub()
+    first = hub.subscribe()
+    second = hub.subscribe()
+    hub.publish({('full', 85): b'jpeg'}, b'[]')
+    assert first.get(timeout=0.1) == (b'jpeg', b'[]')
+    assert second.get(timeout=0.1) == (b'jpeg', b'[]')
+    assert hub.published == 1
+
+
+def test_new_subscriber_sees_latest_frame():
+    hub = FrameHub()
+    hub.publish({('full', 85): b'one'})
+    hub.publish({('full', 85): b'two'})
+    assert hub.subscribe().get(timeout=0.1) == (b'two', None)
+
+
+def test_slow_subscriber_drops_oldest_frames():
+    hub = FrameHub(queue_size=2)
+    subscriber = hub.subscribe()
+    for index in range(5):
+        hub.publish({('full', 85): bytes([index])})
+    assert subscriber.dropped_frames == 3
+    assert [subscriber.get(timeout=0.1)[0] for _ in range(2)] == [b'\x03', b'\x04']
+    assert hub.get_stats()['dropped'] == 3
+
+
+def test_unsubscribe_and_close():
+    hub = FrameHub()
+    gone = hub.subscribe()
+    hub.unsubscribe(gone)
+    hub.publish({('full', 85): b'jpeg'})
+    assert gone.closed
+    assert gone.get(timeout=0.05) is None
+
+    viewer = hub.subscribe()
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(viewer))
+    reader.start()
+    hub.close()
+    reader.join(timeout=2.0)
+    assert not reader.is_alive()
+    assert received == [(b'jpeg', None)]
+    assert hub.subscriber_count() == 0
+    assert hub.latest is None
+
+
+def test_publish_without_variants_is_ignored():
+    hub = FrameHub()
+    subscriber = hub.subscribe()
+    hub.publish({})
+    assert hub.published == 0
+    assert subscriber.get(timeout=0.05) is None
+
+
+def test_subscriber_put_never_blocks():
+    subscriber = Subscriber(None, queue_size=1)
+    subscriber.put((b'a', None))
+    subscriber.put((b'b', None))
+    assert subscriber.get(timeout=0.1) == (b'b', None)
+    assert subscriber.dropped_frames == 1
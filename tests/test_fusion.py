@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+import supervision as sv
+
+from fusion import FusionEngine, box_iou_matrix
+from registry import ClassRegistry
+
+MODEL_KEYS = ['person', 'ppe', 'fire_smoke']
+MODEL_NAMES = [
+    {0: 'Person', 1: 'Helmet', 2: 'No-Helmet'},
+    {0: 'Helmet', 1: 'No-Helmet', 2: 'Vest', 3: 'No-Vest', 4: 'Person-Fall', 5: 'Person'},
+    {0: 'Fire', 1: 'Smoke', 2: 'Helmet'},
+]
+
+
+def compute_iou(box1, box2):
+    x1, y1, x2, y2 = box1
+    x1g, y1g, x2g, y2g = box2
+    xi1 = max(x1, x1g)
+    yi1 = max(y1, y1g)
+    xi2 = min(x2, x2g)
+    yi2 = min(y2, y2g)
+    inter_area = max(0, xi2 - xi1) * max(0, yi2 - yi1)
+    box1_area = (x2 - x1) * (y2 - y1)
+    box2_area = (x2g - x1g) * (y2g - y1g)
+    union_area = box1_area + box2_area - inter_area
+    return inter_area / union_area if union_area > 0 else 0
+
+
+def merge_detections(detections_list, names_list):
+    """camera-tracking.py dagi avvalgi merge_detections (class nomlarini ham qaytaradi)"""
+    final = []
+    det1, names1 = detections_list[0], names_list[0]
+    for xyxy, conf, cls in zip(det1.xyxy, det1.confidence, det1.class_id):
+        if names1[cls] == "Person":
+            final.append((xyxy, conf, "Person"))
+
+    for cls_name in ["Helmet", "No-Helmet", "Vest", "No-Vest", "Person-Fall", "Fire", "Smoke"]:
+        detections_by_pos = []
+        for det, names in zip(detections_list, names_list):
+            for xyxy, conf, cls in zip(det.xyxy, det.confidence, det.class_id):
+                if names[cls] == cls_name:
+                    detections_by_pos.append((xyxy, conf, cls))
+
+        for i, (xyxy, conf, cls) in enumerate(detections_by_pos):
+            keep = True
+            for j, (other_xyxy, other_conf, other_cls) in enumerate(detections_by_pos):
+                if i != j:
+                    iou = compute_iou(xyxy, other_xyxy)
+                    if iou > 0.5 and other_conf > conf:
+                        keep = False
+                        break
+            if keep:
+                final.append((xyxy, conf, cls_name))
+    return final
+
+
+def build_engine(policy='nms'):
+    registry = ClassRegistry()
+    for key, names in zip(MODEL_KEYS, MODEL_NAMES):
+        registry.register_model(key, names)
+    return registry, FusionEngine(registry, MODEL_KEYS, policy=policy)
+
+
+def random_detections(rng, names, centers):
+    """Bir nechta markaz atrofida ustma-ust qutilar - suppression ishlashi uchun"""
+    count = int(rng.integers(0, 8))
+    center = centers[rng.integers(0, len(centers), count)]
+    size = rng.uniform(40, 120, (count, 2))
+    jitter = rng.uniform(-15, 15, (count, 2))
+    xy1 = center + jitter - size / 2
+    xyxy = np.concatenate([xy1, xy1 + size], axis=1).astype(np.float32)
+    return sv.Detections(
+        xyxy=xyxy,
+        confidence=rng.uniform(0.3, 0.99, count).astype(np.float32),
+        class_id=rng.integers(0, len(names), count),
+    )
+
+
+def assert_same(fused, expected, registry):
+    assert len(fused) == len(expected)
+    if not expected:
+        return
+    np.testing.assert_array_equal(fused.xyxy, np.stack([xyxy for xyxy, _, _ in expected]))
+    np.testing.assert_array_equal(fused.confidence, np.array([conf for _, conf, _ in expected]))
+    names = [name for _, _, name in expected]
+    assert list(fused.data['class_name']) == names
+    np.testing.assert_array_equal(fused.class_id, [registry.get_id(name) for name in names])
+
+
+def test_nms_matches_old_merge_on_overlapping_boxes():
+    registry, engine = build_engine()
+    rng = np.random.default_rng(1234)
+    centers = np.array([[100, 100], [130, 110], [400, 300]], dtype=np.float64)
+    suppressed = 0
+    for _ in range(300):
+        detections_list = [random_detections(rng, names, centers) for names in MODEL_NAMES]
+        expected = merge_detections(detections_list, MODEL_NAMES)
+        fused = engine.fuse(detections_list)
+        assert_same(fused, expected, registry)
+        suppressed += sum(len(d) for d in detections_list) - len(expected)
+    # Tasodifiy kadrlarda suppression haqiqatan ishlagan
+    assert suppressed > 0
+
+
+def test_nms_handcrafted_frame():
+    registry, engine = build_engine()
+    box = [10, 10, 110, 110]
+    near = [15, 12, 112, 108]
+    detections_list = [
+        sv.Detections(xyxy=np.array([box, near, box], dtype=np.float32),
+                      confidence=np.array([0.9, 0.6, 0.8], dtype=np.float32),
+                      class_id=np.array([0, 1, 0])),
+        sv.Detections(xyxy=np.array([near, box, [300, 300, 350, 350]], dtype=np.float32),
+                      confidence=np.array([0.7, 0.95, 0.5], dtype=np.float32),
+                      class_id=np.array([0, 5, 2])),
+        sv.Detections(xyxy=np.array([box, near], dtype=np.float32),
+                      confidence=np.array([0.4, 0.65], dtype=np.float32),
+                      class_id=np.array([0, 2])),
+    ]
+    fused = engine.fuse(detections_list)
+    assert_same(fused, merge_detections(detections_list, MODEL_NAMES), registry)
+    # Person faqat birinchi modeldan, Helmet eng ishonchlisi qoladi
+    assert list(fused.data['class_name']) == ['Person', 'Person', 'Helmet', 'Vest', 'Fire']
+
+
+def test_empty_inputs():
+    _, engine = build_engine()
+    assert len(engine.fuse([sv.Detections.empty()] * 3)) == 0
+
+
+def test_unknown_policy_rejected():
+    registry, _ = build_engine()
+    with pytest.raises(ValueError):
+        FusionEngine(registry, MODEL_KEYS, policy='soft')
+
+
+def test_box_iou_matrix():
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=np.float32)
+    iou = box_iou_matrix(boxes, boxes)
+    np.testing.assert_allclose(np.diag(iou), 1.0)
+    assert iou[0, 1] == pytest.approx(50 / 150)
+    assert iou[0, 2] == 0
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from inference import BatchScheduler, MultiModelExecutor
+
+
+class FakeModel:
+    """predict() chaqiruvlarini yozadigan model; natija - kadrning o'zi"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def predict(self, frames, imgsz=640):
+        self.calls.append((len(frames), imgsz))
+        if self.fail:
+            raise RuntimeError('model')
+        return list(frames)
+
+
+def submit_together(scheduler, requests):
+    """Hamma so'rovlarni bir vaqtda yuborib, natijalarni kutish"""
+    barrier = threading.Barrier(len(requests))
+    results = [None] * len(requests)
+
+    def worker(index, stream_id, imgsz):
+        barrier.wait()
+        results[index] = scheduler.infer(stream_id, np.full(1, index), imgsz=imgsz, timeout=5.0)
+
+    threads = [threading.Thread(target=worker, args=(i, *request)) for i, request in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.fixture
+def model():
+    return FakeModel()
+
+
+def test_frames_from_several_sources_share_one_batch(model):
+    scheduler = BatchScheduler(model, max_batch_size=8, max_wait_ms=200)
+    for stream_id in range(4):
+        scheduler.register(stream_id)
+        # Har bir manba avval kadr yuborgan - navbatdagi kadri kutiladi
+        scheduler.submit(stream_id, np.zeros(1)).done.set()
+    scheduler.requests.queue.clear()
+    try:
+        results = submit_together(scheduler, [(stream_id, None) for stream_id in range(4)])
+    finally:
+        scheduler.stop()
+    assert [int(result[0]) for result in results] == [0, 1, 2, 3]
+    assert model.calls == [(4, 640)]
+    assert scheduler.get_stats()['batch_sizes'] == {'4': 1}
+
+
+def test_single_source_does_not_wait_for_idle_ones(model):
+    scheduler = BatchScheduler(model, max_wait_ms=2000)
+    scheduler.register('idle')
+    try:
+        result = scheduler.infer('busy', np.ones(1), timeout=1.0)
+    finally:
+        scheduler.stop()
+    assert result[0] == 1
+    assert model.calls == [(1, 640)]
+
+
+def test_different_sizes_are_predicted_separately(model):
+    scheduler = BatchScheduler(model, max_batch_size=4, max_wait_ms=200)
+    for stream_id in range(3):
+        scheduler.register(stream_id)
+        scheduler.submit(stream_id, np.zeros(1)).done.set()
+    scheduler.requests.queue.clear()
+    try:
+        submit_together(scheduler, [(0, 640), (1, 320), (2, 640)])
+    finally:
+        scheduler.stop()
+    assert sorted(model.calls) == [(1, 320), (2, 640)]
+
+
+def test_model_error_is_raised_in_every_caller():
+    scheduler = BatchScheduler(FakeModel(fail=True), max_wait_ms=1)
+    try:
+        with pytest.raises(RuntimeError, match='model'):
+            scheduler.infer(0, np.zeros(1), timeout=1.0)
+    finally:
+        scheduler.stop()
+
+
+def test_stop_releases_pending_requests(model):
+    scheduler = BatchScheduler(model)
+    request = scheduler.submit(0, np.zeros(1))
+    # To'xtatilgan scheduler tsikli navbatda qolgan so'rovlarni xatolik bilan yakunlaydi
+    scheduler._loop()
+    with pytest.raises(RuntimeError, match="to'xtatildi"):
+        request.wait(0)
+
+
+class SlowModel:
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+
+    def predict(self, frames, imgsz=640):
+        time.sleep(self.delay)
+        return [self.name for _ in frames]
+
+
+def test_executor_runs_models_concurrently_in_model_order():
+    schedulers = [BatchScheduler(SlowModel(name, 0.2), max_wait_ms=1).start() for name in ('person', 'ppe', 'fire')]
+    executor = MultiModelExecutor(schedulers, names=['person', 'ppe', 'fire'])
+    try:
+        started = time.perf_counter()
+        results = executor.run(0, np.zeros(1), timeout=5.0)
+        elapsed = time.perf_counter() - started
+    finally:
+        for scheduler in schedulers:
+            scheduler.stop()
+    assert results == ['person', 'ppe', 'fire']
+    # Ketma-ket bo'lsa ~0.6 s
+    assert elapsed < 0.45
+    stats = executor.get_stats()
+    assert stats['speedup'] > 1.3
+    assert set(stats['models']) == {'person', 'ppe', 'fire'}
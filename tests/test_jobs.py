@@ -0,0 +1,163 @@
+import json
+
+import pytest
+
+from jobs import JobQueue, JobStore
+from result_cache import ResultCache
+
+
+class FakeJob:
+    def __init__(self, job_id, work_dir):
+        self.id = job_id
+        self.status = 'queued'
+        self.error = None
+        self.listener = None
+        self.progress = 0.0
+        self.total_frames = 0
+        self.work_dir = str(work_dir)
+        self.output_video = str(work_dir / 'video.mp4')
+        self.output_detections = str(work_dir / 'detections.jsonl')
+        self.output_summary = str(work_dir / 'summary.json')
+
+    def outputs(self):
+        return {'video': self.output_video, 'detections': self.output_detections, 'summary': self.output_summary}
+
+
+class FakeEngine:
+    """OfflineEngine o'rniga: run() natijasi testda belgilanadi"""
+
+    model_path = 'model.pt'
+
+    def __init__(self, tmp_path, outcome='done'):
+        self.tmp_path = tmp_path
+        self.outcome = outcome
+        self.removed = []
+
+    def create_job(self, video_path, job_id=None):
+        work_dir = self.tmp_path / job_id
+        work_dir.mkdir(exist_ok=True)
+        return FakeJob(job_id, work_dir)
+
+    def run(self, job):
+        if self.outcome == 'raise':
+            raise RuntimeError('pool buzildi')
+        if self.outcome == 'done':
+            for path in job.outputs().values():
+                with open(path, 'w') as f:
+                    f.write('{"total_frames": 10}')
+        job.status = self.outcome
+        return job
+
+    def remove_job(self, job_id):
+        self.removed.append(job_id)
+
+    def result_params(self):
+        return {'imgsz': 640}
+
+    def cancel(self, job_id):
+        return True
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs.db'))
+
+
+def test_claim_next_is_fifo_and_counts_attempts(store):
+    first = store.create('a.mp4')
+    second = store.create('b.mp4')
+    claimed = store.claim_next()
+    assert claimed['id'] == first['id']
+    assert claimed['status'] == 'running'
+    assert claimed['attempts'] == 1
+    assert store.claim_next()['id'] == second['id']
+    assert store.claim_next() is None
+
+
+def test_interrupted_jobs_resume_after_restart(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    store = JobStore(db_path)
+    job = store.create('a.mp4')
+    store.claim_next()
+
+    # Server to'satdan to'xtadi: yangi jarayon xuddi shu bazani ochadi
+    restarted = JobStore(db_path)
+    assert restarted.requeue_interrupted() == 1
+    claimed = restarted.claim_next()
+    assert claimed['id'] == job['id']
+    assert claimed['attempts'] == 2
+
+
+def test_cancel_only_queued(store):
+    job = store.create('a.mp4')
+    assert store.cancel_queued(job['id'])
+    assert store.get(job['id'])['status'] == 'cancelled'
+    assert not store.cancel_queued(job['id'])
+    assert store.claim_next() is None
+
+
+def test_find_active_by_cache_key(store):
+    job = store.create('a.mp4', cache_key='k1')
+    assert store.find_active('k1')['id'] == job['id']
+    store.update(job['id'], status='done')
+    assert store.find_active('k1') is None
+
+
+def run_one(queue, store):
+    queue.running = True
+    queue._run(store.claim_next())
+
+
+def test_run_failure_is_written(tmp_path, store):
+    queue = JobQueue(FakeEngine(tmp_path, outcome='raise'), store)
+    job = store.create('a.mp4')
+    run_one(queue, store)
+    row = store.get(job['id'])
+    assert row['status'] == 'failed'
+    assert 'pool buzildi' in row['error']
+    # Tugagan job qayta ishga tushganda navbatga qaytmaydi
+    assert store.requeue_interrupted() == 0
+
+
+def test_cache_error_still_finishes_job(tmp_path, store):
+    class BrokenCache:
+        def put(self, *args, **kwargs):
+            raise OSError('disk to\'la')
+
+    queue = JobQueue(FakeEngine(tmp_path), store, cache=BrokenCache())
+    job = store.create('a.mp4', cache_key='k1')
+    run_one(queue, store)
+    row = store.get(job['id'])
+    assert row['status'] == 'done'
+    assert row['output_summary'].endswith('summary.json')
+
+
+def test_cancel_during_shutdown_keeps_job_running(tmp_path, store):
+    queue = JobQueue(FakeEngine(tmp_path, outcome='cancelled'), store)
+    job = store.create('a.mp4')
+    queue._run(store.claim_next())
+    # running=False: server to'xtatilmoqda - job keyingi safar davom etadi
+    assert store.get(job['id'])['status'] == 'running'
+
+
+def test_submit_reuses_cached_result(tmp_path, store):
+    video = tmp_path / 'a.mp4'
+    video.write_bytes(b'video')
+    cache = ResultCache(str(tmp_path / 'cache'))
+    queue = JobQueue(FakeEngine(tmp_path), store, cache=cache)
+
+    job = queue.submit(str(video))
+    assert job['status'] == 'queued'
+    # Xuddi shu video yana yuborilsa navbatdagi job qaytadi
+    assert queue.submit(str(video))['id'] == job['id']
+
+    run_one(queue, store)
+    assert store.get(job['id'])['status'] == 'done'
+    assert queue.is_cached(str(video))
+
+    cached = queue.submit(str(video))
+    assert cached['id'] != job['id']
+    assert cached['status'] == 'done'
+    assert cached['cached'] == 1
+    with open(cached['output_summary']) as f:
+        assert json.load(f)['total_frames'] == 10
@@ -0,0 +1,88 @@
+import pytest
+
+import live
+from frame_hub import FrameHub
+from live import LiveClient, parse_watch
+
+
+class FakeProcessor:
+    def __init__(self, source=0):
+        self.current_source = source
+        self.hub = FrameHub()
+        self.raw_hub = FrameHub()
+
+
+class FakeManager:
+    def __init__(self, streams):
+        self.streams = streams
+
+    def get_stream(self, stream_id):
+        return self.streams.get(stream_id)
+
+
+@pytest.fixture
+def manager():
+    return FakeManager({'1': FakeProcessor(), 'idle': FakeProcessor(source=None)})
+
+
+def test_parse_watch_defaults(manager):
+    (processor, hub, tier, window), error = parse_watch(manager, {'stream': '1'}, 2)
+    assert error is None
+    assert hub is processor.hub
+    assert (tier, window) == ('full', 2)
+
+
+def test_parse_watch_raw_hub_and_window_limits(manager):
+    (processor, hub, tier, window), _ = parse_watch(manager, {'stream': '1', 'overlay': False,
+                                                             'tier': 'thumb', 'window': 100}, 2)
+    assert hub is processor.raw_hub
+    assert (tier, window) == ('thumb', 8)
+    assert parse_watch(manager, {'stream': '1', 'window': 0}, 2)[0][3] == 1
+
+
+@pytest.mark.parametrize('data, message', [
+    (None, 'Oqim topilmadi'),
+    ({'stream': 'missing'}, 'Oqim topilmadi'),
+    ({'stream': 'idle'}, 'Oqim topilmadi'),
+    ({'stream': '1', 'tier': '640p'}, "Noma'lum tier: 640p"),
+])
+def test_parse_watch_errors(manager, data, message):
+    result, error = parse_watch(manager, data, 2)
+    assert result is None
+    assert error == {'status': 'error', 'message': message}
+
+
+def make_client(window=2):
+    hub = FrameHub()
+    return LiveClient('sid', '1', FakeProcessor(), hub, hub.subscribe(), window=window)
+
+
+def test_ack_window_limits_frames_in_flight():
+    client = make_client(window=2)
+    assert client.wait_credit(0)
+    first = client.begin_send()
+    client.begin_send()
+    assert not client.wait_credit(0.01)
+    client.ack(first)
+    assert client.wait_credit(0)
+    stats = client.get_stats()
+    assert (stats['sent'], stats['acked'], stats['in_flight']) == (2, 1, 1)
+    assert stats['rtt_ms'] is not None
+
+
+def test_lost_acks_expire(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(live.time, 'monotonic', lambda: clock[0])
+    client = make_client(window=1)
+    client.begin_send()
+    assert not client.wait_credit(0.01)
+    clock[0] += live.ACK_TIMEOUT + 1
+    assert client.wait_credit(0)
+    assert client.timeouts == 1
+
+
+def test_close_unsubscribes():
+    client = make_client()
+    client.close()
+    assert client.subscriber.closed
+    assert client.hub.subscriber_count() == 0
@@ -0,0 +1,79 @@
+import re
+
+from metrics import Counter, Histogram, MetricsRegistry, format_labels
+from registry import ClassRegistry
+from tracking import VideoProcessor
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*"(,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*")*\})? \S+$')
+
+
+def assert_exposition_format(text):
+    """Prometheus matn formati: har bir oila HELP, TYPE va namunalar"""
+    assert text.endswith('\n')
+    for line in text.rstrip('\n').split('\n'):
+        if line.startswith('# HELP ') or line.startswith('# TYPE '):
+            continue
+        assert SAMPLE.match(line), line
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('stage_seconds', 'Bosqichlar', ('camera', 'stage'), buckets=(0.01, 0.1))
+    for value in (0.005, 0.05, 0.05, 5.0):
+        histogram.observe(('cam', 'inference'), value)
+    lines = histogram.collect()
+    assert lines == [
+        'stage_seconds_bucket{camera="cam",stage="inference",le="0.01"} 1',
+        'stage_seconds_bucket{camera="cam",stage="inference",le="0.1"} 3',
+        'stage_seconds_bucket{camera="cam",stage="inference",le="+Inf"} 4',
+        'stage_seconds_sum{camera="cam",stage="inference"} 5.105',
+        'stage_seconds_count{camera="cam",stage="inference"} 4',
+    ]
+
+
+def test_bucket_bound_is_inclusive():
+    histogram = Histogram('h', 'h', ('camera',), buckets=(0.1, 1.0))
+    histogram.observe(('cam',), 0.1)
+    assert histogram.collect()[0] == 'h_bucket{camera="cam",le="0.1"} 1'
+
+
+def test_counter_and_label_escaping():
+    counter = Counter('frames_total', 'Kadrlar', ('camera',))
+    counter.inc(('rtsp://a"b\\c\n',))
+    counter.inc(('rtsp://a"b\\c\n',), 2)
+    assert counter.collect() == ['frames_total{camera="rtsp://a\\"b\\\\c\\n"} 3']
+    assert format_labels({}) == ''
+
+
+def test_registry_render_includes_collectors():
+    registry = MetricsRegistry()
+    registry.counter('frames_total', 'Kadrlar', ('camera',)).inc(('0',))
+    registry.histogram('stage_seconds', 'Bosqichlar', ('camera', 'stage')).observe(('0', 'encode'), 0.002)
+    registry.register_collector(lambda: [('viewers', 'gauge', 'Tomoshabinlar', [({'camera': '0'}, 3), ({}, 1)])])
+
+    def broken():
+        raise RuntimeError('scrape xatolik')
+    registry.register_collector(broken)
+
+    text = registry.render()
+    assert_exposition_format(text)
+    assert '# TYPE frames_total counter\nframes_total{camera="0"} 1\n' in text
+    assert '# TYPE stage_seconds histogram\n' in text
+    assert '# HELP viewers Tomoshabinlar\n# TYPE viewers gauge\nviewers{camera="0"} 3\nviewers 1\n' in text
+
+
+class FakeGrabber:
+    def __init__(self, dropped):
+        self.dropped_frames = dropped
+
+
+def test_capture_dropped_total_survives_grabber_swaps():
+    processor = VideoProcessor(registry=ClassRegistry(), stream_id='cam')
+    processor.grabber = FakeGrabber(5)
+    assert processor.capture_dropped_frames() == 5
+    with processor.camera_lock:
+        processor.retire_grabber()
+    processor.grabber = FakeGrabber(2)
+    assert processor.capture_dropped_frames() == 7
+    with processor.camera_lock:
+        processor.retire_grabber()
+    assert processor.capture_dropped_frames() == 7
@@ -0,0 +1,48 @@
+import numpy as np
+
+from motion import MotionGate
+
+
+def scene(value=0):
+    return np.full((240, 320, 3), value, dtype=np.uint8)
+
+
+def test_first_frame_is_always_detected():
+    assert MotionGate().should_detect(scene())
+
+
+def test_static_scene_is_skipped_until_max_skip():
+    gate = MotionGate(max_skip=3)
+    decisions = [gate.should_detect(scene()) for _ in range(9)]
+    # Birinchi kadr, keyin har 4-kadrda majburiy detection
+    assert decisions == [True, False, False, False, True, False, False, False, True]
+    assert gate.get_stats()['skipped'] == 6
+    assert gate.inferences == 3
+
+
+def test_motion_triggers_detection():
+    gate = MotionGate()
+    gate.should_detect(scene())
+    assert not gate.should_detect(scene())
+    moved = scene()
+    moved[60:180, 80:240] = 255
+    assert gate.should_detect(moved)
+    assert gate.last_motion > gate.sensitivity
+    assert gate.last_motion_time is not None
+
+
+def test_slow_drift_accumulates_against_last_detected_frame():
+    gate = MotionGate(max_skip=1000)
+    gate.should_detect(scene(0))
+    detections = [gate.should_detect(scene(value)) for value in range(10, 100, 10)]
+    # Qo'shni kadrlar farqi chegaradan past, lekin oxirgi detection kadriga nisbatan yig'iladi
+    assert not detections[0]
+    assert any(detections)
+
+
+def test_reset_forces_detection():
+    gate = MotionGate()
+    gate.should_detect(scene())
+    assert not gate.should_detect(scene())
+    gate.reset()
+    assert gate.should_detect(scene())
@@ -0,0 +1,109 @@
+import cv2
+import numpy as np
+import pytest
+
+import offline
+from offline import match_overlap, open_at, plan_chunks, stitch_tracks
+
+REAL_CAPTURE = cv2.VideoCapture
+
+
+@pytest.fixture
+def video(tmp_path):
+    # Har kadr yorqinligi uning raqamini bildiradi (MJPG - har kadr keyframe)
+    path = str(tmp_path / 'frames.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (64, 48))
+    for index in range(60):
+        writer.write(np.full((48, 64, 3), index * 4, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def frame_index(frame):
+    return int(round(frame.mean() / 4))
+
+
+class KeyframeSeekCapture:
+    """Seek eng yaqin oldingi keyframe ga (har 10-kadr) tushadigan FFmpeg capture"""
+
+    def __init__(self, path):
+        self.cap = REAL_CAPTURE(path)
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            value = int(value) - int(value) % 10
+        return self.cap.set(prop, value)
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def test_open_at_returns_requested_frame(video):
+    for start in (0, 1, 37):
+        ok, frame = open_at(video, start).read()
+        assert ok
+        assert frame_index(frame) == start
+
+
+def test_open_at_decodes_forward_from_inexact_seek(video, monkeypatch):
+    monkeypatch.setattr(offline, 'SEEK_PREROLL_FRAMES', 5)
+    monkeypatch.setattr(offline.cv2, 'VideoCapture', KeyframeSeekCapture)
+    ok, frame = open_at(video, 37).read()
+    assert ok
+    assert frame_index(frame) == 37
+
+
+def test_open_at_falls_back_to_start_of_file(video, monkeypatch):
+    # start < SEEK_PREROLL_FRAMES - oldinroq seek qilinadigan joy yo'q
+    monkeypatch.setattr(offline.cv2, 'VideoCapture', KeyframeSeekCapture)
+    ok, frame = open_at(video, 37).read()
+    assert ok
+    assert frame_index(frame) == 37
+
+
+def test_plan_chunks_covers_video():
+    chunks = plan_chunks(1000, fps=25, workers=4, chunk_seconds=20, overlap=15)
+    assert chunks == [(0, 250), (250, 500), (500, 750), (750, None)]
+    assert plan_chunks(0, fps=25, workers=4) == [(0, None)]
+    # Bo'lak overlap dan kamida 4 baravar uzun
+    assert plan_chunks(100, fps=25, workers=8, overlap=15) == [(0, 60), (60, None)]
+
+
+def chunk(start, rows):
+    frames, boxes, ids = zip(*rows)
+    return {
+        'start': start,
+        'arrays': {
+            'frame': np.array(frames, dtype=np.int64),
+            'xyxy': np.array(boxes, dtype=np.float32),
+            'confidence': np.ones(len(rows), dtype=np.float32),
+            'class_id': np.zeros(len(rows), dtype=np.int64),
+            'tracker_id': np.array(ids, dtype=np.int64),
+        },
+    }
+
+
+LEFT = (0, 0, 10, 10)
+RIGHT = (50, 50, 60, 60)
+
+
+def test_stitch_tracks_joins_ids_across_overlap():
+    first = chunk(0, [(0, LEFT, 7), (1, LEFT, 7), (2, LEFT, 7), (2, RIGHT, -1)])
+    # Ikkinchi bo'lak 2-kadrdan (overlap) boshlanadi, o'z lokal IDlari bilan
+    second = chunk(3, [(2, LEFT, 1), (3, LEFT, 1), (3, RIGHT, 2), (4, RIGHT, 2)])
+    result = stitch_tracks([first, second])
+
+    assert list(result['frame']) == [0, 1, 2, 2, 3, 3, 4]
+    assert list(result['tracker_id']) == [1, 1, 1, -1, 1, 2, 2]
+
+
+def test_match_overlap_requires_same_class():
+    previous = chunk(0, [(2, LEFT, 5)])['arrays']
+    current = chunk(3, [(2, LEFT, 1)])['arrays']
+    assert match_overlap(previous, current, 3) == {1: 5}
+    current['class_id'][:] = 1
+    assert match_overlap(previous, current, 3) == {}
+
+
+def test_stitch_tracks_without_chunks():
+    assert len(stitch_tracks([])['frame']) == 0
@@ -0,0 +1,86 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+import supervision as sv
+
+from pipeline import PipelineManager
+from tracking import build_registry, parse_source
+
+
+class FakeModel:
+    names = {0: 'Person'}
+
+    def predict(self, frames, imgsz=640):
+        return [sv.Detections.empty() for _ in frames]
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / 'clip.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (64, 48))
+    for index in range(30):
+        writer.write(np.full((48, 64, 3), index, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def manager():
+    manager = PipelineManager()
+    # Og'irliklar yuklanmaydi - load_model tayyor modelni qayta ishlatadi
+    manager.model = FakeModel()
+    manager.registry = build_registry(manager.model)
+    yield manager
+    manager.stop_all()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_streams_share_one_model_and_scheduler(manager, video):
+    first = manager.add_stream('a', video)
+    second = manager.add_stream('b', video)
+    assert first is not second
+    assert first.model is second.model is manager.model
+    assert first.scheduler is second.scheduler is manager.scheduler
+    assert manager.get_stream('a') is first
+    # Fayl manbasi tomoshabin kelguncha kutadi
+    viewers = [first.hub.subscribe(), second.hub.subscribe()]
+    assert wait_for(lambda: set(manager.get_inference_stats()['sources']) == {'a', 'b'})
+    assert all(viewer.get(timeout=2.0) is not None for viewer in viewers)
+    assert sorted(status['id'] for status in manager.list_streams()) == ['a', 'b']
+
+
+def test_replacing_source_keeps_processor(manager, video):
+    processor = manager.add_stream('a', video)
+    assert manager.add_stream('a', video) is processor
+    assert len(manager.list_streams()) == 1
+
+
+def test_bad_source_is_not_registered(manager, tmp_path):
+    assert manager.add_stream('missing', str(tmp_path / 'missing.avi')) is None
+    assert manager.get_stream('missing') is None
+
+
+def test_remove_and_stop_all(manager, video):
+    manager.add_stream('a', video)
+    manager.add_stream('b', video)
+    assert manager.remove_stream('a')
+    assert not manager.remove_stream('a')
+    manager.stop_all()
+    assert manager.list_streams() == []
+    assert manager.scheduler is None
+
+
+def test_parse_source():
+    assert parse_source('0') == 0
+    assert parse_source(' 2 ') == 2
+    assert parse_source('rtsp://camera/1') == 'rtsp://camera/1'
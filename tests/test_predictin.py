@@ -0,0 +1,61 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+import supervision as sv
+
+from predictin import JsonlWriter, collect_images, detection_records, open_writer, prefetch_batches
+
+
+@pytest.fixture
+def images(tmp_path):
+    for folder in ('a', 'a/nested'):
+        (tmp_path / folder).mkdir(exist_ok=True)
+    for name in ('a/1.jpg', 'a/2.png', 'a/nested/3.jpg'):
+        cv2.imwrite(str(tmp_path / name), np.zeros((12, 16, 3), dtype=np.uint8))
+    (tmp_path / 'a' / 'notes.txt').write_text('')
+    return tmp_path
+
+
+def test_collect_images_from_folders_and_globs(images):
+    folder = str(images / 'a')
+    assert [p.rsplit('/', 1)[-1] for p in collect_images([folder])] == ['1.jpg', '2.png']
+    assert len(collect_images([folder], recursive=True)) == 3
+    assert len(collect_images([str(images / '**' / '*.jpg')])) == 2
+    assert len(collect_images([folder], recursive=True, limit=1)) == 1
+
+
+def test_prefetch_batches_keeps_order_and_unreadable_images(images):
+    paths = collect_images([str(images / 'a')], recursive=True) + [str(images / 'missing.jpg')]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        batches = list(prefetch_batches(pool, paths, batch_size=3, depth=2))
+    assert [len(batch) for batch in batches] == [3, 1]
+    assert [path for batch in batches for path, _ in batch] == paths
+    assert batches[0][0][1].shape == (12, 16, 3)
+    assert batches[1][0][1] is None
+
+
+def test_jsonl_writer_records_every_image(tmp_path):
+    detections = sv.Detections(
+        xyxy=np.array([[1, 2, 3, 4]], dtype=np.float32),
+        confidence=np.array([0.87654], dtype=np.float32),
+        class_id=np.array([1]),
+    )
+    image = np.zeros((12, 16, 3), dtype=np.uint8)
+    output = str(tmp_path / 'out.jsonl')
+    writer = open_writer(output)
+    assert isinstance(writer, JsonlWriter)
+    writer.write('x.jpg', image, detection_records('x.jpg', image, detections, {1: 'fire'}))
+    writer.write('y.jpg', image, [])
+    writer.close()
+
+    rows = [json.loads(line) for line in open(output)]
+    assert rows[0] == {
+        'image': 'x.jpg', 'width': 16, 'height': 12,
+        'detections': [{'class_id': 1, 'class_name': 'fire', 'confidence': 0.8765,
+                        'x1': 1.0, 'y1': 2.0, 'x2': 3.0, 'y2': 4.0}],
+    }
+    assert rows[1]['detections'] == []
+    assert open_writer(None) is None
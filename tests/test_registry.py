@@ -0,0 +1,54 @@
+import numpy as np
+import supervision as sv
+
+from registry import ClassRegistry
+
+
+def make_registry():
+    registry = ClassRegistry()
+    registry.register_model('zakladchik', {0: 'oddiy_harakat', 1: 'shubhali_harakat', 2: 'qurol_aslahasi'})
+    # Ikkinchi modelda umumiy nom va siyrak lokal idlar
+    registry.register_model('other', {0: 'Person', 3: 'shubhali_harakat', 5: 'unknown_class'})
+    return registry
+
+
+def test_shared_names_get_one_global_id():
+    registry = make_registry()
+    assert len(registry) == 5
+    assert registry.get_id('shubhali_harakat') == 1
+    assert registry.get_id('missing') == -1
+    assert list(registry.luts['other']) == [3, -1, -1, 1, -1, 4]
+    assert list(registry.model_class_ids('other')) == [1, 3, 4]
+
+
+def test_specs_and_fallback_for_unknown_names():
+    registry = make_registry()
+    assert list(registry.track) == [True, True, False, True, False]
+    assert list(registry.alert) == [False, True, True, False, False]
+    assert registry.display_names[registry.get_id('qurol_aslahasi')] == 'Qurol-Aslaha'
+    assert registry.display_names[registry.get_id('unknown_class')] == 'unknown_class'
+    assert registry.colors_bgr.shape == (5, 3)
+
+
+def test_to_global_marks_unknown_and_out_of_range_ids():
+    registry = make_registry()
+    assert list(registry.to_global('other', [0, 1, 3, 5, 9, -2])) == [3, -1, 1, 4, -1, -1]
+    assert registry.to_global('other', []).shape == (0,)
+
+
+def test_map_detections_drops_unmapped_rows():
+    registry = make_registry()
+    detections = sv.Detections(
+        xyxy=np.array([[0, 0, 10, 10], [5, 5, 15, 15], [1, 1, 2, 2]], dtype=np.float32),
+        confidence=np.array([0.9, 0.8, 0.7], dtype=np.float32),
+        class_id=np.array([3, 1, 0]),
+    )
+    mapped = registry.map_detections('other', detections)
+    assert list(mapped.class_id) == [1, 3]
+    assert list(mapped.confidence) == [np.float32(0.9), np.float32(0.7)]
+    assert list(registry.names_array[mapped.class_id]) == ['shubhali_harakat', 'Person']
+
+
+def test_count_ignores_unknown_ids():
+    registry = make_registry()
+    assert list(registry.count([0, 1, 1, -1, 4])) == [1, 2, 0, 0, 1]
@@ -0,0 +1,81 @@
+import numpy as np
+import supervision as sv
+
+from registry import ClassRegistry
+from render import Renderer, detection_metadata
+
+
+def make_registry():
+    registry = ClassRegistry()
+    registry.register_model('model', {0: 'Person', 1: 'Fire'})
+    return registry
+
+
+def detections(tracker_ids=None):
+    return sv.Detections(
+        xyxy=np.array([[10, 40, 60, 90], [100, 30, 150, 80]], dtype=np.float32),
+        confidence=np.array([0.91, 0.42], dtype=np.float32),
+        class_id=np.array([0, 1]),
+        tracker_id=None if tracker_ids is None else np.array(tracker_ids),
+    )
+
+
+def frame():
+    return np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+def test_render_leaves_input_frame_untouched():
+    renderer = Renderer(make_registry())
+    source = frame()
+    out = renderer.render(source, detections([3, -1]))
+    assert not source.any()
+    assert out.any()
+    assert out is not source
+
+
+def test_buffers_are_reused_in_rotation():
+    renderer = Renderer(make_registry(), buffer_count=2)
+    first = renderer.render(frame(), None)
+    second = renderer.render(frame(), None)
+    assert first is not second
+    assert renderer.render(frame(), None) is first
+    # O'lcham o'zgarsa yangi bufer
+    assert renderer.render(np.zeros((60, 80, 3), dtype=np.uint8), None).shape == (60, 80, 3)
+
+
+def test_label_sprites_are_cached_per_class_track_and_confidence_step():
+    renderer = Renderer(make_registry())
+    renderer.render(frame(), detections([3, -1]))
+    assert renderer.get_stats() == {'sprites': 2, 'hits': 0, 'misses': 2}
+    renderer.render(frame(), detections([3, -1]))
+    assert renderer.get_stats()['hits'] == 2
+    assert renderer.label_text(0, 3, 18) == 'Person 90% ID:3'
+    assert renderer.label_text(1, -1, -1) == 'Fire'
+
+
+def test_sprite_cache_is_bounded():
+    renderer = Renderer(make_registry(), max_sprites=3)
+    for tracker_id in range(10):
+        renderer.label_sprite(0, tracker_id, 18)
+    assert len(renderer.sprites) == 3
+
+
+def test_label_is_drawn_in_class_color_and_clipped_to_frame():
+    registry = make_registry()
+    renderer = Renderer(registry, show_confidence=False, show_track_id=False)
+    edge = sv.Detections(xyxy=np.array([[-20, 0, 30, 50]], dtype=np.float32),
+                         confidence=np.array([0.9], dtype=np.float32), class_id=np.array([1]))
+    out = renderer.render(frame(), edge)
+    # Yozuv kadr ichiga surilgan: chap yuqori burchak class rangida
+    assert tuple(out[1, 1]) == tuple(registry.colors_bgr[1])
+
+
+def test_detection_metadata_columns():
+    registry = make_registry()
+    metadata = detection_metadata(detections([3, -1]), registry, (120, 160, 3), frame_index=5)
+    assert metadata['frame'] == 5
+    assert metadata['xyxy'] == [[10, 40, 60, 90], [100, 30, 150, 80]]
+    assert metadata['class'] == ['Person', 'Fire']
+    assert metadata['tracker_id'] == [3, -1]
+    assert metadata['color'][1] == list(registry.colors_bgr[1][::-1])
+    assert detection_metadata(None, registry, (120, 160, 3))['xyxy'] == []
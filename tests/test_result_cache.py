@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache, hash_file
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(root=str(tmp_path / 'cache'), max_bytes=250)
+
+
+def outputs(tmp_path, name, size=100):
+    path = tmp_path / f"{name}.json"
+    path.write_bytes(b'x' * size)
+    return {'detections': str(path)}
+
+
+def test_put_and_get_round_trip(cache, tmp_path):
+    entry = cache.put('ab' * 32, outputs(tmp_path, 'one'), summary={'total_frames': 3}, source='v.mp4')
+    assert entry['summary'] == {'total_frames': 3}
+    assert entry['source'] == 'v.mp4'
+    with open(entry['files']['detections'], 'rb') as f:
+        assert f.read() == b'x' * 100
+    assert cache.contains('ab' * 32)
+    assert cache.get('cd' * 32) is None
+
+
+def test_lru_eviction_keeps_recently_used(cache, tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'time', lambda: clock[0])
+    for name in ('a', 'b'):
+        cache.put(name * 64, outputs(tmp_path, name))
+        clock[0] += 1
+    cache.get('a' * 64)
+    clock[0] += 1
+    cache.put('c' * 64, outputs(tmp_path, 'c'))
+
+    assert cache.contains('a' * 64)
+    assert not cache.contains('b' * 64)
+    assert not os.path.exists(cache.entry_dir('b' * 64))
+    assert cache.get_stats()['entries'] == 2
+
+
+def test_entry_larger_than_limit_is_kept(cache, tmp_path):
+    cache.put('d' * 64, outputs(tmp_path, 'big', size=1000))
+    assert cache.contains('d' * 64)
+
+
+def test_missing_files_drop_index_entry(cache, tmp_path):
+    cache.put('e' * 64, outputs(tmp_path, 'e'))
+    os.remove(os.path.join(cache.entry_dir('e' * 64), 'manifest.json'))
+    assert cache.get('e' * 64) is None
+    assert not cache.contains('e' * 64)
+
+
+def test_file_hash_is_remembered_until_file_changes(cache, tmp_path):
+    video = tmp_path / 'video.mp4'
+    video.write_bytes(b'frames')
+    assert cache.known_hash(str(video)) is None
+    digest = cache.file_hash(str(video))
+    assert digest == hash_file(str(video))
+    assert cache.known_hash(str(video)) == digest
+
+    video.write_bytes(b'other frames')
+    assert cache.known_hash(str(video)) is None
+
+
+def test_key_depends_on_content_weights_and_params(cache, tmp_path):
+    weights = tmp_path / 'model.pt'
+    weights.write_bytes(b'weights')
+    key = cache.make_key('hash', str(weights), {'conf': 0.25})
+    assert key == cache.make_key('hash', str(weights), {'conf': 0.25})
+    assert key != cache.make_key('other', str(weights), {'conf': 0.25})
+    assert key != cache.make_key('hash', str(weights), {'conf': 0.5})
+    weights.write_bytes(b'new weights')
+    assert key != cache.make_key('hash', str(weights), {'conf': 0.25})
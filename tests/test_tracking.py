@@ -0,0 +1,47 @@
+import numpy as np
+import supervision as sv
+
+from registry import ClassRegistry
+from tracking import associate_tracks
+
+
+def make_registry():
+    registry = ClassRegistry()
+    # Person - trek qilinadi, Helmet - yo'q
+    registry.register_model('model', {0: 'Person', 1: 'Helmet'})
+    return registry
+
+
+def detections(rows):
+    boxes, classes = zip(*rows) if rows else ((), ())
+    return sv.Detections(
+        xyxy=np.array(boxes, dtype=np.float32).reshape(-1, 4),
+        confidence=np.full(len(rows), 0.9, dtype=np.float32),
+        class_id=np.array(classes, dtype=np.int64),
+    )
+
+
+PERSON_A = (10, 10, 60, 120)
+PERSON_B = (200, 20, 250, 130)
+HELMET = (20, 10, 40, 30)
+
+
+def test_ids_follow_their_boxes_and_skip_untracked_classes():
+    registry = make_registry()
+    tracker = sv.ByteTrack(frame_rate=25)
+    ids = None
+    for _ in range(3):
+        ids = associate_tracks(tracker, detections([(PERSON_A, 0), (HELMET, 1), (PERSON_B, 0)]), registry)
+    assert ids[1] == -1
+    assert ids[0] >= 0 and ids[2] >= 0 and ids[0] != ids[2]
+
+    # Tartib o'zgarsa ham ID o'z boxida qoladi
+    swapped = associate_tracks(tracker, detections([(PERSON_B, 0), (PERSON_A, 0), (HELMET, 1)]), registry)
+    assert list(swapped) == [ids[2], ids[0], -1]
+
+
+def test_empty_frame_returns_empty_ids():
+    registry = make_registry()
+    ids = associate_tracks(sv.ByteTrack(), detections([]), registry)
+    assert ids.shape == (0,)
+    assert ids.dtype == np.int64
@@ -0,0 +1,110 @@
+import hashlib
+import io
+import struct
+
+import pytest
+
+from uploads import OffsetMismatch, UploadManager, mp4_is_streamable
+
+
+def box(kind, payload=b''):
+    return struct.pack('>I', 8 + len(payload)) + kind + payload
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return UploadManager(str(tmp_path), max_size=1000)
+
+
+def test_write_appends_at_offset_and_hashes(manager):
+    session = manager.create('clip.mp4', size=10)
+    assert session.write(io.BytesIO(b'hello'), 0) == 5
+    assert session.write(io.BytesIO(b'world'), 5) == 10
+    content_hash = session.finish()
+    assert content_hash == hashlib.sha256(b'helloworld').hexdigest()
+    with open(session.final_path, 'rb') as f:
+        assert f.read() == b'helloworld'
+    assert session.path == session.final_path
+
+
+def test_wrong_offset_reports_expected(manager):
+    session = manager.create('clip.mp4')
+    session.write(io.BytesIO(b'abc'), 0)
+    with pytest.raises(OffsetMismatch) as error:
+        session.write(io.BytesIO(b'def'), 0)
+    assert error.value.expected == 3
+
+
+def test_declared_size_is_enforced(manager):
+    session = manager.create('clip.mp4', size=4)
+    with pytest.raises(ValueError):
+        session.write(io.BytesIO(b'toolong'), 0)
+    assert session.offset == 0
+
+    session = manager.create('clip.mp4', size=10)
+    session.write(io.BytesIO(b'half'), 0)
+    with pytest.raises(ValueError):
+        session.finish()
+
+
+def test_undeclared_size_is_capped(manager):
+    session = manager.create('clip.mkv')
+    session.write(io.BytesIO(b'x' * 1000), 0)
+    with pytest.raises(ValueError):
+        session.write(io.BytesIO(b'x'), 1000)
+    assert session.offset == 1000
+
+
+def test_session_restored_after_restart(tmp_path):
+    session = UploadManager(str(tmp_path), max_size=1000).create('clip.mkv')
+    session.write(io.BytesIO(b'partial'), 0)
+
+    restored = UploadManager(str(tmp_path), max_size=1000).get(session.id)
+    assert restored.offset == 7
+    assert restored.max_size == 1000
+    restored.write(io.BytesIO(b'-rest'), 7)
+    assert restored.finish() == hashlib.sha256(b'partial-rest').hexdigest()
+
+
+def test_abort_removes_partial_files(manager):
+    session = manager.create('clip.mp4')
+    session.write(io.BytesIO(b'abc'), 0)
+    session.abort()
+    assert manager.get('missing') is None
+    with pytest.raises(OffsetMismatch):
+        session.write(io.BytesIO(b'd'), 3)
+
+
+def write_file(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_mp4_faststart_is_streamable(tmp_path):
+    moov = box(b'moov', b'm' * 100)
+    path = write_file(tmp_path / 'a.mp4', box(b'ftyp', b'isom') + moov + box(b'mdat', b'd' * 50))
+    assert mp4_is_streamable(path)
+
+
+def test_mp4_moov_at_end_is_not_streamable(tmp_path):
+    path = write_file(tmp_path / 'a.mp4', box(b'ftyp', b'isom') + box(b'mdat', b'd' * 50) + box(b'moov'))
+    assert not mp4_is_streamable(path)
+
+
+def test_mp4_partial_moov_is_not_streamable(tmp_path):
+    moov = box(b'moov', b'm' * 100)
+    path = write_file(tmp_path / 'a.mp4', box(b'ftyp', b'isom') + moov[:50])
+    assert not mp4_is_streamable(path)
+
+
+def test_mp4_truncated_header_is_not_streamable(tmp_path):
+    assert not mp4_is_streamable(write_file(tmp_path / 'a.mp4', b'\x00\x00'))
+    assert not mp4_is_streamable(str(tmp_path / 'missing.mp4'))
+
+
+def test_is_streamable_by_container(manager):
+    assert manager.create('clip.mkv').is_streamable()
+    assert not manager.create('clip.avi').is_streamable()
+    session = manager.create('clip.mp4')
+    session.write(io.BytesIO(box(b'ftyp', b'isom') + box(b'moov', b'm' * 10)), 0)
+    assert session.is_streamable()
@@ -1,107 +1,259 @@
 import cv2
+import json
 import numpy as np
 import supervision as sv
-from ultralytics import YOLO
-from supervision.draw.color import Color
 import threading
 import time
+from capture import FrameGrabber
+from frame_hub import FrameHub
+from detectors import load_detector
+from config import get_detector_backend, get_int8_calibration
+from registry import ClassRegistry
+from metrics import STAGE_SECONDS, FRAMES_TOTAL
+from cameras import get_camera_registry
+from render import Renderer, detection_metadata
+from encoder import encode_variants, mjpeg_part
 
-CLASS_NAMES_UZ = {
-    'oddiy_harakat': 'Oddiy Harakat',
-    'shubhali_harakat': 'Shubhali Harakat',
-    'jabrlangan_shaxs': 'Jabrlangan Shaxs',
-    'qurol_aslahasi': 'Qurol-Aslaha',
-}
+MODEL_PATH = "models/zakladchik_model.pt"
 
-CLASS_COLORS = {
-    'oddiy_harakat': Color.from_hex('#00FF00'),
-    'shubhali_harakat': Color.from_hex('#FFA500'),
-    'jabrlangan_shaxs': Color.from_hex('#FF0000'),
-    'qurol_aslahasi': Color.from_hex('#8A2BE2'),
-}
+# Class nomlari, ranglari va flaglari registry.CLASS_SPECS da
+MODEL_KEY = 'zakladchik'
 
-TRACK_CLASSES = ['oddiy_harakat', 'shubhali_harakat', 'jabrlangan_shaxs']
+CONFIDENCE_THRESHOLD = 0.35
+NMS_IOU_THRESHOLD = 0.3
+
+def parse_source(source):
+    """Manbani aniqlash: kamera indeksi (int), fayl yo'li yoki RTSP/HTTP URL"""
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source.strip())
+    return source
+
+def is_live_source(source):
+    if isinstance(source, int):
+        return True
+    return isinstance(source, str) and source.lower().startswith(('rtsp://', 'rtmp://', 'http://', 'https://'))
+
+def get_available_cameras():
+    """Keshdagi kameralar indekslari - qurilmalar har so'rovda ochilmaydi"""
+    registry = get_camera_registry()
+    registry.wait_ready(timeout=2.0)
+    return [device['index'] for device in registry.list_devices()]
+
+def build_registry(model):
+    registry = ClassRegistry()
+    registry.register_model(MODEL_KEY, model.names)
+    return registry
+
+def associate_tracks(tracker, detections, registry):
+    """Faqat track classlari trackerga beriladi; IDlar detections tartibida (-1 - ID yo'q)"""
+    tracker_ids = np.full(len(detections), -1, dtype=np.int64)
+    track_mask = registry.track[detections.class_id] if len(detections) else np.zeros(0, dtype=bool)
+    track_detections = detections[track_mask]
+    # ByteTrack mos kelmagan boxlarni tashlab yuboradi, lekin kirishdagi tracker_id ni
+    # kirish tartibida to'ldiradi - shu orqali IDlar o'z boxiga qaytariladi.
+    # Bo'sh kadr ham beriladi, aks holda yo'qolgan treklar eskirmaydi
+    track_detections.tracker_id = np.full(len(track_detections), -1, dtype=np.int64)
+    tracker.update_with_detections(track_detections)
+    tracker_ids[track_mask] = track_detections.tracker_id
+    return tracker_ids
 
 class VideoProcessor:
-    def __init__(self):
-        self.model = None
+    def __init__(self, stream_id=None, model=None, registry=None, scheduler=None, motion_gate=None,
+                 controller=None, alert_dispatcher=None, event_store=None, encoder=None, buffer_size=2,
+                 latest_only=True):
+        self.stream_id = stream_id
+        # Model va class registri PipelineManager tomonidan barcha manbalar uchun bitta yuklanadi
+        self.model = model
+        self.registry = registry
+        # Scheduler bo'lsa kadrlar boshqa manbalar bilan bitta batchda ishlanadi
+        self.scheduler = scheduler
+        # Statik sahnada YOLO ni o'tkazib yuborish (ixtiyoriy)
+        self.motion_gate = motion_gate
+        # Kechikish byudjeti bo'yicha stride/imgsz boshqaruvi (ixtiyoriy)
+        self.controller = controller
+        # registry.alert classlari (shubhali_harakat, qurol_aslahasi) uchun ogohlantirish (ixtiyoriy)
+        self.alert_dispatcher = alert_dispatcher
+        # Treklar hayot siklini bazaga yozish (ixtiyoriy)
+        self.event_store = event_store
+        # JPEG kodlash pulida (ixtiyoriy); bo'lmasa producer threadida kodlanadi
+        self.encoder = encoder
+        # Oldingi kadrning tugallanmagan kodlash ishi
+        self.encode_job = None
+        self.last_detections = None
         self.tracker = None
-        self.camera_cap = None
+        self.grabber = None
+        # Almashtirilgan grabberlarda tashlangan kadrlar - /metrics dagi counter manba almashganda kamaymaydi
+        self.retired_dropped_frames = 0
+        self.buffer_size = buffer_size
+        self.latest_only = latest_only
         self.processing_active = False
-        self.current_camera_index = None
+        self.current_source = None
+        # /metrics dagi camera label
+        self.metrics_label = None
+        self.fps_current = 0.0
         self.camera_lock = threading.Lock()
-        self.sent_tracker_ids = set()
-        self.bounding_box_annotator = sv.BoxAnnotator()
-        self.label_annotator = sv.LabelAnnotator(
-            text_position=sv.Position.TOP_LEFT,
-            text_scale=0.5,
-            text_padding=5
-        )
+        self.hub = FrameHub(queue_size=2)
+        # overlay=0 tomoshabinlari: chizilmagan kadr + detection metadata (boxlarni o'zlari chizadi)
+        self.raw_hub = FrameHub(queue_size=2)
+        self.latest_metadata = None
+        self.producer_thread = None
+        # stop_source da oshiriladi: vaqtida to'xtamagan eski producer yangi sessiya hublarini yopmaydi
+        self.producer_generation = 0
+        # Registry ma'lum bo'lganda (load_model dan keyin) yaratiladi
+        self.renderer = None
         
     def load_model(self):
         if self.model is None:
             print("Model yuklanmoqda...")
-            self.model = YOLO("models/zakladchik_model.pt")
+            calibration = get_int8_calibration()
+            self.model = load_detector(
+                MODEL_PATH,
+                backend=get_detector_backend(),
+                int8=calibration is not None,
+                calibration_source=calibration
+            )
             print(f"Model yuklandi! {len(self.model.names)} ta class")
+        if self.registry is None:
+            self.registry = build_registry(self.model)
+    
+    def open_capture(self, source):
+        if isinstance(source, int):
+            # Qurilma qo'llab-quvvatlaydigan rejim registrdan - sinab ko'rish shart emas
+            registry = get_camera_registry()
+            registry.wait_ready(timeout=1.0)
+            mode = registry.pick_mode(source, width=1280, height=720, fps=30)
+            cap = cv2.VideoCapture(source, cv2.CAP_V4L2)
+            if cap.isOpened():
+                # Ochiq qurilmaning rejimlari registrda so'ralmaydi
+                registry.acquire(source)
+                if mode is not None:
+                    # Format o'lchamdan oldin: MJPG da katta o'lchamlar USB ga sig'adi
+                    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*mode['format']))
+                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, mode['width'])
+                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, mode['height'])
+                    if mode['fps']:
+                        cap.set(cv2.CAP_PROP_FPS, mode['fps'])
+                else:
+                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+                # Drayver ichidagi navbatni kamaytirish - kadrlar inference ortida yig'ilmasin
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            return cap
+        return cv2.VideoCapture(source)
     
-    def set_camera(self, camera_index):
+    def set_source(self, source, cap=None):
+        source = parse_source(source)
+        
+        # Yangi manba avval ochib tekshiriladi - ochilmasa joriy oqim o'zgarmaydi.
+        # cap berilsa (masalan, yuklanayotgan fayl uchun GrowingFileCapture) o'shandan o'qiladi
+        camera = None
+        if cap is None:
+            cap = self.open_capture(source)
+            if isinstance(source, int) and cap.isOpened():
+                camera = source
+        
+        if not cap.isOpened():
+            cap.release()
+            print(f"Manba ochilmadi: {source}")
+            return False
+        
+        # Eski capture threadni lock ostida emas, tashqarida to'xtatish
         with self.camera_lock:
-            if self.camera_cap is not None:
-                self.camera_cap.release()
-            
-            self.current_camera_index = camera_index
-            self.sent_tracker_ids.clear()
-            
-            self.camera_cap = cv2.VideoCapture(camera_index, cv2.CAP_V4L2)
-            
-            if not self.camera_cap.isOpened():
-                print(f"Kamera ochilmadi: {camera_index}")
-                return False
-            
-            self.camera_cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-            self.camera_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-            
-            fps = self.camera_cap.get(cv2.CAP_PROP_FPS) or 30
+            old_grabber = self.retire_grabber()
+        if old_grabber is not None:
+            old_grabber.stop()
+        
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        live = is_live_source(source)
+        self.metrics_label = str(self.stream_id or source)
+        # Jonli manbada eng so'nggi kadr, faylda esa har bir kadr qayta ishlanadi
+        grabber = FrameGrabber(
+            cap,
+            buffer_size=self.buffer_size,
+            latest_only=self.latest_only and live,
+            drop_oldest=live,
+            stop_on_eof=not live,
+            name=f"stream-{self.stream_id or source}",
+            metrics_label=self.metrics_label,
+            on_release=(lambda: get_camera_registry().release(camera)) if camera is not None else None
+        ).start()
+        
+        with self.camera_lock:
+            self.grabber = grabber
+            self.current_source = source
             self.tracker = sv.ByteTrack(frame_rate=fps)
-            
+            self.last_detections = None
+            if self.motion_gate is not None:
+                self.motion_gate.reset()
+            if self.controller is not None:
+                self.controller.reset()
             self.processing_active = True
-            print(f"Kamera ochildi: index={camera_index}, FPS={fps}")
-            return True
+        
+        if self.scheduler is not None:
+            self.scheduler.register(self.stream_id)
+        self.start_producer()
+        print(f"Manba ochildi: {source}, FPS={fps}")
+        return True
+    
+    def retire_grabber(self):
+        """camera_lock ostida: joriy grabberni olib, tashlagan kadrlarini umumiy songa qo'shish"""
+        grabber, self.grabber = self.grabber, None
+        if grabber is not None:
+            self.retired_dropped_frames += grabber.dropped_frames
+        return grabber
     
-    def stop_camera(self):
+    def capture_dropped_frames(self):
+        """Oqim boshidan capture buferida tashlangan kadrlar - grabber almashganda kamaymaydi"""
         with self.camera_lock:
-            self.processing_active = False
-            if self.camera_cap is not None:
-                self.camera_cap.release()
-                self.camera_cap = None
-            self.current_camera_index = None
-            print("Kamera to'xtatildi")
+            grabber = self.grabber
+            return self.retired_dropped_frames + (grabber.dropped_frames if grabber is not None else 0)
     
-    def get_available_cameras(self):
-        available_cameras = []
-        for i in range(5):
-            cap = cv2.VideoCapture(i, cv2.CAP_V4L2)
-            if cap.isOpened():
-                available_cameras.append(i)
-                cap.release()
-        return available_cameras
+    def start_producer(self):
+        """Manba uchun yagona qayta ishlash threadini ishga tushirish"""
+        with self.camera_lock:
+            if self.producer_thread is not None and self.producer_thread.is_alive():
+                return
+            self.producer_thread = threading.Thread(
+                target=self._producer_loop,
+                args=(self.producer_generation,),
+                name=f"video-producer-{self.stream_id}",
+                daemon=True
+            )
+            self.producer_thread.start()
     
-    def draw_corner_lines(self, frame, x1, y1, x2, y2, color, thickness):
-        line_len_x = (x2 - x1) // 4
-        line_len_y = (y2 - y1) // 4
-        
-        corners = [
-            ((x1, y1), (x1 + line_len_x, y1), (x1, y1 + line_len_y)),
-            ((x2, y1), (x2 - line_len_x, y1), (x2, y1 + line_len_y)),
-            ((x1, y2), (x1 + line_len_x, y2), (x1, y2 - line_len_y)),
-            ((x2, y2), (x2 - line_len_x, y2), (x2, y2 - line_len_y))
-        ]
-        
-        for start, end_x, end_y in corners:
-            cv2.line(frame, start, end_x, color, thickness)
-            cv2.line(frame, start, end_y, color, thickness)
-        
-        return frame
+    def stop_source(self):
+        with self.camera_lock:
+            self.processing_active = False
+            self.producer_generation += 1
+            grabber = self.retire_grabber()
+            producer_thread, self.producer_thread = self.producer_thread, None
+            self.current_source = None
+        if grabber is not None:
+            grabber.stop()
+        if self.scheduler is not None:
+            self.scheduler.unregister(self.stream_id)
+        if producer_thread is not None and producer_thread is not threading.current_thread():
+            producer_thread.join(timeout=2.0)
+        self.hub.close()
+        self.raw_hub.close()
+        print(f"Manba to'xtatildi: {self.stream_id}")
+    
+    def get_status(self):
+        grabber = self.grabber
+        return {
+            'id': self.stream_id,
+            'source': self.current_source,
+            'is_processing': self.processing_active,
+            'fps': round(self.fps_current, 1),
+            'viewers': self.viewer_count(),
+            'capture': grabber.get_stats() if grabber is not None else None,
+            'hub': self.hub.get_stats(),
+            'raw_hub': self.raw_hub.get_stats(),
+            'renderer': self.renderer.get_stats() if self.renderer is not None else None,
+            'motion': self.motion_gate.get_stats() if self.motion_gate is not None else None,
+            'controller': self.controller.get_status() if self.controller is not None else None,
+            'inference': self.scheduler.get_stats()['sources'].get(str(self.stream_id)) if self.scheduler is not None else None,
+        }
     
     def create_empty_detections(self):
         """Bo'sh detections obyekti yaratish"""
@@ -112,204 +264,272 @@ class VideoProcessor:
             tracker_id=np.empty((0,), dtype=np.int32)
         )
     
+    def viewer_count(self):
+        return self.hub.subscriber_count() + self.raw_hub.subscriber_count()
+    
+    def get_renderer(self):
+        if self.renderer is None or self.renderer.registry is not self.registry:
+            self.renderer = Renderer(self.registry, label_position='top_left', text_scale=0.5, text_padding=5)
+        return self.renderer
+    
     def annotate_frame(self, frame, detections):
-        # Agar detections bo'sh bo'lsa, faqat asl frameni qaytar
-        if len(detections) == 0 or detections is None:
-            return frame.copy()
-            
-        annotated_frame = frame.copy()
-        labels = []
-        colors = []
-        
-        # Track IDlar uchun massiv yaratish (agar mavjud bo'lmasa)
-        if detections.tracker_id is None:
-            detections.tracker_id = np.array([None] * len(detections.xyxy))
-        
-        for i in range(len(detections.xyxy)):
-            xyxy = detections.xyxy[i]
-            tracker_id = detections.tracker_id[i] if detections.tracker_id is not None else None
-            class_id = int(detections.class_id[i])
-            confidence = detections.confidence[i]
-            
-            x1, y1, x2, y2 = map(int, xyxy)
-            
-            class_name = self.model.names[class_id]
-            uz_name = CLASS_NAMES_UZ.get(class_name, class_name)
-            conf_percent = confidence * 100
-            
-            if tracker_id is not None:
-                label_text = f"{uz_name} {conf_percent:.0f}% ID:{tracker_id}"
-            else:
-                label_text = f"{uz_name} {conf_percent:.0f}%"
-            
-            labels.append(label_text)
-            
-            color = CLASS_COLORS.get(class_name, Color.WHITE)
-            colors.append(color)
-            
-            if class_name in TRACK_CLASSES:
-                annotated_frame = self.draw_corner_lines(
-                    annotated_frame, x1, y1, x2, y2, color.as_bgr(), 2
-                )
-        
-        detections.color = colors
-        
-        # Annotatsiya qilish
-        if len(detections.xyxy) > 0:
-            try:
-                annotated_frame = self.bounding_box_annotator.annotate(
-                    scene=annotated_frame,
-                    detections=detections
-                )
-                
-                annotated_frame = self.label_annotator.annotate(
-                    scene=annotated_frame,
-                    detections=detections,
-                    labels=labels
-                )
-            except Exception as e:
-                print(f"Annotatsiya xatolik: {e}")
+        """Kadr nusxasi rendererning qayta ishlatiladigan buferiga chiziladi (frame o'zgarmaydi)"""
+        return self.get_renderer().render(frame, detections)
+    
+    def draw_overlay(self, annotated_frame, class_counts):
+        """Kamera, FPS va classlar soni - matn spritelari keshdan ko'chiriladi"""
+        renderer = self.get_renderer()
+        y_pos = 30
+        renderer.draw_text(annotated_frame, f"Kamera: {self.stream_id or self.current_source}", (10, y_pos),
+                           (255, 255, 255), 0.7)
+        y_pos += 30
+        renderer.draw_text(annotated_frame, f"FPS: {self.fps_current:.1f}", (10, y_pos), (0, 255, 0), 0.7)
         
+        # Ob'ektlar sonini ko'rsatish
+        y_pos += 40
+        for class_id in np.flatnonzero(class_counts):
+            renderer.draw_text(annotated_frame, f"{self.registry.display_names[class_id]}: {class_counts[class_id]}",
+                               (10, y_pos), self.registry.colors_bgr[class_id], 0.6)
+            y_pos += 25
         return annotated_frame
     
     def count_objects_by_class(self, detections):
-        counts = {class_name: 0 for class_name in CLASS_NAMES_UZ.values()}
-        
-        if len(detections) == 0:
-            return counts
-            
-        for class_id in detections.class_id:
-            class_id = int(class_id)
-            class_name = self.model.names[class_id]
-            uz_name = CLASS_NAMES_UZ.get(class_name, class_name)
-            if uz_name in counts:
-                counts[uz_name] += 1
+        class_counts = self.registry.count(detections.class_id if len(detections) > 0 else [])
+        return {
+            self.registry.display_names[class_id]: int(class_counts[class_id])
+            for class_id in self.registry.model_class_ids(MODEL_KEY)
+        }
+    
+    def generate_frames(self, overlay=True, tier='full'):
+        """MJPEG tomoshabin: tayyor kadrlarni hubdan o'qiydi, o'zi inference qilmaydi.
+        overlay=False - chizilmagan kadr, boxlar har bir qismning X-Detections sarlavhasida (JSON).
+        tier - encoder.TIERS dagi o'lcham; JPEG sifati tomoshabin tezligiga qarab moslashadi"""
+        if self.current_source is None:
+            print("Manba tanlanmagan!")
+            return
         
-        return counts
+        self.start_producer()
+        hub = self.hub if overlay else self.raw_hub
+        subscriber = hub.subscribe(tier=tier)
+        try:
+            for jpeg, metadata in subscriber:
+                headers = b'X-Detections: ' + metadata + b'\r\n' if not overlay and metadata else b''
+                yield mjpeg_part(jpeg, headers)
+        finally:
+            hub.unsubscribe(subscriber)
+    
+    def detect(self, frame, imgsz=640):
+        if self.scheduler is not None:
+            detections = self.scheduler.infer(self.stream_id, frame, imgsz=imgsz)
+        else:
+            detections = self.model.predict([frame], imgsz=imgsz)[0]
+        # Model class idlari global registr idlariga o'tkaziladi
+        return self.registry.map_detections(MODEL_KEY, detections)
+    
+    def need_detection(self, frame):
+        """Stride va harakat filtri bo'yicha shu kadrda YOLO kerakmi"""
+        if self.last_detections is None:
+            return True
+        if self.controller is not None and not self.controller.should_detect():
+            return False
+        if self.motion_gate is not None and not self.motion_gate.should_detect(frame):
+            return False
+        return True
+    
+    def has_alerts(self, detections):
+        return self.alert_dispatcher is not None and len(detections) > 0 and \
+            bool(np.any(self.registry.alert[detections.class_id]))
     
-    def generate_frames(self):
-        if self.current_camera_index is None:
-            print("Kamera tanlanmagan!")
+    def dispatch_alerts(self, detections, annotated_frame):
+        """Ogohlantiriladigan classlarni dispatcher navbatiga berish - kadr kutib qolmaydi"""
+        if not self.has_alerts(detections):
             return
         
+        alert_indices = np.flatnonzero(self.registry.alert[detections.class_id])
+        for i in alert_indices:
+            # Trek qilinmaydigan classlar (qurol_aslahasi) faqat class cooldown bo'yicha cheklanadi
+            tracker_id = detections.tracker_id[i] if detections.tracker_id is not None else None
+            tracker_id = int(tracker_id) if tracker_id is not None and tracker_id >= 0 else None
+            name = self.registry.names[detections.class_id[i]]
+            # Bir kadrdan bitta rasm yetarli
+            if self.alert_dispatcher.notify(self.stream_id or self.current_source, name, tracker_id, annotated_frame):
+                break
+    
+    def encode_and_publish(self, jobs, metadata):
+        """Har bir hub uchun kerakli (daraja, sifat) variantlari kodlanib tarqatiladi"""
+        stage_start = time.perf_counter()
+        for hub, image in jobs:
+            wanted = hub.wanted_variants()
+            if wanted:
+                hub.publish(encode_variants(image, wanted), metadata)
+        self.record_stage('encode', stage_start)
+    
+    def wait_encoding(self):
+        """Oldingi kadr kodlanishini kutish: kadrlar tartibi saqlanadi va renderer buferi bo'shaydi"""
+        job, self.encode_job = self.encode_job, None
+        if job is not None:
+            try:
+                job.result()
+            except Exception:
+                # Xatolik EncodePool da chop etilgan
+                pass
+    
+    def record_stage(self, stage, started):
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe((self.metrics_label, stage), elapsed)
+        if self.controller is not None:
+            self.controller.record(stage, elapsed)
+    
+    def is_current_producer(self, generation):
+        return generation == self.producer_generation
+    
+    def _producer_loop(self, generation):
         self.load_model()
         
-        CONFIDENCE_THRESHOLD = 0.35
-        NMS_IOU_THRESHOLD = 0.3
-        
         frame_count = 0
         start_time = time.time()
         
         try:
-            while self.processing_active:
+            while self.processing_active and self.is_current_producer(generation):
                 with self.camera_lock:
-                    if self.camera_cap is None or not self.camera_cap.isOpened():
-                        break
-                    
-                    ret, frame = self.camera_cap.read()
+                    grabber = self.grabber
+                
+                if grabber is None:
+                    # Kamera almashtirilmoqda
+                    time.sleep(0.05)
+                    continue
                 
-                if not ret:
-                    time.sleep(0.1)
+                # Faylda tomoshabin kelguncha kadrlar saqlanib turadi
+                if not grabber.drop_oldest and self.viewer_count() == 0:
+                    time.sleep(0.05)
                     continue
                 
+                # Kadr capture threaddan olinadi - lock ostida bloklanuvchi o'qish yo'q
+                item = grabber.read(timeout=1.0)
+                if item is None:
+                    if grabber.is_exhausted():
+                        # Fayl tugadi
+                        with self.camera_lock:
+                            if self.is_current_producer(generation):
+                                self.processing_active = False
+                        break
+                    continue
+                
+                # Jonli manbada detection, tracking va ogohlantirishlar tomoshabin bo'lmasa ham ishlaydi -
+                # tomoshabinsiz faqat chizish va JPEG kodlash o'tkazib yuboriladi
+                _, frame = item
+                
                 frame_count += 1
+                FRAMES_TOTAL.inc((self.metrics_label,))
+                if self.controller is not None:
+                    self.controller.begin_frame()
+                detected = False
                 
                 # YOLO modeli orqali detection
                 try:
-                    results = self.model(frame, imgsz=(640, 640), verbose=False)[0]
-                    detections = sv.Detections.from_ultralytics(results)
-                    
-                    # Confidence threshold qo'llash
-                    if len(detections) > 0:
-                        detections = detections[detections.confidence > CONFIDENCE_THRESHOLD]
-                    
-                    # NMS qo'llash
-                    if len(detections) > 0:
-                        detections = detections.with_nms(NMS_IOU_THRESHOLD)
-                    
-                    # Tracking qilish
-                    if len(detections) > 0:
-                        track_mask = np.array([
-                            self.model.names[int(class_id)] in TRACK_CLASSES 
-                            for class_id in detections.class_id
-                        ])
+                    stage_start = time.perf_counter()
+                    if self.need_detection(frame):
+                        imgsz = self.controller.imgsz if self.controller is not None else 640
+                        detections = self.detect(frame, imgsz=imgsz)
+                        detected = True
+                        self.record_stage('inference', stage_start)
+                        
+                        stage_start = time.perf_counter()
+                        # Confidence threshold qo'llash
+                        if len(detections) > 0:
+                            detections = detections[detections.confidence > CONFIDENCE_THRESHOLD]
                         
-                        if np.any(track_mask):
-                            track_detections = detections[track_mask]
-                            
-                            # Track qilish uchun XYXY formatida koordinatalar kerak
-                            if len(track_detections.xyxy) > 0:
-                                try:
-                                    tracked_detections = self.tracker.update_with_detections(track_detections)
-                                    
-                                    # Track IDlarni asosiy detections ga qo'shish
-                                    if detections.tracker_id is None:
-                                        detections.tracker_id = np.array([None] * len(detections))
-                                    
-                                    track_idx = 0
-                                    for i in range(len(detections)):
-                                        if track_mask[i] and track_idx < len(tracked_detections):
-                                            if tracked_detections.tracker_id is not None:
-                                                detections.tracker_id[i] = tracked_detections.tracker_id[track_idx]
-                                            track_idx += 1
-                                except Exception as e:
-                                    print(f"Tracking xatolik: {e}")
-                                    detections.tracker_id = np.array([None] * len(detections))
+                        # NMS qo'llash
+                        if len(detections) > 0:
+                            detections = detections.with_nms(NMS_IOU_THRESHOLD)
+                        self.record_stage('nms', stage_start)
+                        
+                        self.last_detections = detections
                     else:
+                        # Sahna o'zgarmagan - oldingi detectionlar nusxasi trackerga beriladi,
+                        # ByteTrack treklari va IDlari saqlanib qoladi
+                        detections = self.last_detections[np.arange(len(self.last_detections))]
+                        detections.tracker_id = None
+                    
+                    # Tracking qilish: IDlar o'z boxiga, ID yo'qlar -1
+                    stage_start = time.perf_counter()
+                    if len(detections) == 0:
                         # Agar detections bo'sh bo'lsa, bo'sh detections yaratish
                         detections = self.create_empty_detections()
+                    try:
+                        detections.tracker_id = associate_tracks(self.tracker, detections, self.registry)
+                    except Exception as e:
+                        print(f"Tracking xatolik: {e}")
+                        detections.tracker_id = np.full(len(detections), -1, dtype=np.int64)
+                    self.record_stage('tracking', stage_start)
                         
                 except Exception as e:
                     print(f"Detection xatolik: {e}")
                     detections = self.create_empty_detections()
                 
-                # Annotatsiya qilish
-                try:
-                    annotated_frame = self.annotate_frame(frame, detections)
-                except Exception as e:
-                    print(f"Annotatsiya xatolik: {e}")
-                    annotated_frame = frame.copy()
+                # Treklar hayot sikli har bir qayta ishlangan kadrda yoziladi - tomoshabin, chizish va
+                # ogohlantirish bosqichlariga bog'liq emas
+                if self.event_store is not None:
+                    try:
+                        self.event_store.record(self.stream_id or self.current_source, detections, frame, self.registry)
+                    except Exception as e:
+                        print(f"Hodisa yozish xatolik: {e}")
                 
                 # Statistik ma'lumotlar
-                counts = self.count_objects_by_class(detections)
+                class_counts = self.registry.count(detections.class_id)
                 
                 elapsed_time = time.time() - start_time
-                fps_current = frame_count / elapsed_time if elapsed_time > 0 else 0
+                self.fps_current = frame_count / elapsed_time if elapsed_time > 0 else 0
                 
-                # FPS va ma'lumotlarni chizish
-                y_pos = 30
-                cv2.putText(annotated_frame, f"Kamera: {self.current_camera_index}", (10, y_pos), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                y_pos += 30
-                cv2.putText(annotated_frame, f"FPS: {fps_current:.1f}", (10, y_pos), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                # Chizilgan kadr faqat overlay tomoshabinlari yoki ogohlantirish rasmi uchun kerak
+                annotated_frame = None
+                alerts = self.has_alerts(detections)
+                if self.hub.subscriber_count() > 0 or alerts:
+                    stage_start = time.perf_counter()
+                    try:
+                        annotated_frame = self.annotate_frame(frame, detections)
+                        self.draw_overlay(annotated_frame, class_counts)
+                    except Exception as e:
+                        print(f"Annotatsiya xatolik: {e}")
+                        annotated_frame = frame.copy()
+                    self.record_stage('annotate', stage_start)
+                if alerts:
+                    self.dispatch_alerts(detections, annotated_frame)
                 
-                # Ob'ektlar sonini ko'rsatish
-                y_pos += 40
-                for class_name_uz, count in counts.items():
-                    if count > 0:
-                        color_key = next((k for k, v in CLASS_NAMES_UZ.items() if v == class_name_uz), class_name_uz)
-                        color = CLASS_COLORS.get(color_key, Color.WHITE).as_bgr()
-                        
-                        cv2.putText(annotated_frame, f"{class_name_uz}: {count}", (10, y_pos), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                        y_pos += 25
-                
-                # Frame'ni encode qilish
-                ret, buffer = cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                if not ret:
-                    continue
-                    
-                frame_bytes = buffer.tobytes()
-                
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                # Frame'ni encode qilish: har bir ko'rinish bir marta kodlanadi, barcha tomoshabinlarga tarqatiladi
+                jobs = []
+                if annotated_frame is not None and self.hub.subscriber_count() > 0:
+                    jobs.append((self.hub, annotated_frame))
+                if self.raw_hub.subscriber_count() > 0:
+                    jobs.append((self.raw_hub, frame))
+                self.wait_encoding()
+                if jobs:
+                    # Kadr bilan birga yuboriladigan boxlar va sonlar (overlay=0 MJPEG sarlavhasi, WebSocket).
+                    # Koordinatalar asl kadr o'lchamida - kichik darajalarda mijoz width/height bo'yicha masshtablaydi
+                    metadata = detection_metadata(detections, self.registry, frame.shape, frame_count)
+                    metadata['counts'] = self.count_objects_by_class(detections)
+                    self.latest_metadata = metadata
+                    metadata = json.dumps(metadata, separators=(',', ':')).encode()
+                    if self.encoder is not None:
+                        # Kodlash pulda, producer esa keyingi kadr inferencesiga o'tadi
+                        self.encode_job = self.encoder.submit(self.encode_and_publish, jobs, metadata)
+                    else:
+                        self.encode_and_publish(jobs, metadata)
+                if self.controller is not None:
+                    self.controller.end_frame(detected)
         
         except Exception as e:
             print(f"Generate frames xatolik: {e}")
             import traceback
             traceback.print_exc()
+            with self.camera_lock:
+                if self.is_current_producer(generation):
+                    self.processing_active = False
         
         finally:
-            self.processing_active = False
+            # Eski sessiyaning hublari stop_source da yopilgan - hozirgi hublar yangi tomoshabinlarniki
+            if self.is_current_producer(generation):
+                self.wait_encoding()
+                self.hub.close()
+                self.raw_hub.close()
             print("Video qayta ishlash tugadi!")
\ No newline at end of file
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import cv2
+
+# Yozilayotgan fayldan o'qib bo'ladigan konteynerlar (indeks fayl oxirida emas)
+STREAMABLE_EXTENSIONS = {'ts', 'mkv', 'webm', 'flv'}
+WRITE_BLOCK_SIZE = 1024 * 1024
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, expected):
+        super().__init__(f"Kutilgan offset: {expected}")
+        self.expected = expected
+
+
+def mp4_is_streamable(path):
+    """moov atomi mdat dan oldin bo'lsa (faststart/fragmented) MP4 ni oxirigacha kutmasdan o'qish mumkin.
+    moov to'liq yuklanmaguncha fayl ochilmaydi - shuning uchun uning oxiri ham kelgan bo'lishi kerak"""
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            position = 0
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return False
+                size = int.from_bytes(header[:4], 'big')
+                kind = header[4:8]
+                if size == 1:
+                    size = int.from_bytes(f.read(8), 'big')
+                if kind == b'moov':
+                    # size=0 - atom fayl oxirigacha
+                    return size == 0 or position + size <= file_size
+                if kind == b'mdat':
+                    return False
+                if size < 8:
+                    return False
+                position += size
+                f.seek(position)
+    except OSError:
+        return False
+
+
+class UploadSession:
+    """Bo'laklab yuklanayotgan fayl: diskka to'g'ridan-to'g'ri yoziladi, xesh yo'l-yo'lakay hisoblanadi"""
+
+    def __init__(self, folder, upload_id, filename, size=None, mode='live', created_at=None, max_size=None):
+        self.folder = folder
+        self.id = upload_id
+        self.filename = filename
+        self.size = size
+        # Hajm e'lon qilinmagan yuklash uchun yuqori chegara
+        self.max_size = max_size
+        self.mode = mode
+        self.created_at = created_at or time.time()
+        self.part_path = os.path.join(folder, '.partial', f"{upload_id}.part")
+        self.meta_path = os.path.join(folder, '.partial', f"{upload_id}.json")
+        self.final_path = os.path.join(folder, filename)
+
+        self.lock = threading.Lock()
+        # Yangi bayt kelganda o'quvchilarga (GrowingFileCapture) xabar beriladi
+        self.growth = threading.Condition()
+        self.complete = False
+        self.content_hash = None
+        self.stream_started = False
+        # Erta ochish muvaffaqiyatsiz bo'lgan hajm - yangi baytlar kelmaguncha qayta urinilmaydi
+        self.stream_failed_offset = None
+        self.hasher = hashlib.sha256()
+        self.offset = 0
+
+    @property
+    def path(self):
+        # Yuklash tugagach fayl yakuniy joyiga ko'chiriladi
+        return self.final_path if self.complete else self.part_path
+
+    @property
+    def extension(self):
+        return self.filename.rsplit('.', 1)[-1].lower() if '.' in self.filename else ''
+
+    def restore(self):
+        """Server qayta ishga tushgach: offset - diskdagi haqiqiy hajm, xesh qayta hisoblanadi"""
+        self.offset = os.path.getsize(self.part_path) if os.path.exists(self.part_path) else 0
+        self.hasher = hashlib.sha256()
+        if self.offset:
+            with open(self.part_path, 'rb') as f:
+                for block in iter(lambda: f.read(WRITE_BLOCK_SIZE), b''):
+                    self.hasher.update(block)
+        return self
+
+    def save_meta(self):
+        meta = {
+            'id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'mode': self.mode,
+            'created_at': self.created_at,
+        }
+        with open(self.meta_path, 'w') as f:
+            json.dump(meta, f)
+
+    def write(self, stream, offset):
+        """So'rov tanasini bloklab diskka yozish; offset joriy hajmga teng bo'lishi shart"""
+        with self.lock:
+            if self.complete:
+                raise OffsetMismatch(self.offset)
+            if offset != self.offset:
+                raise OffsetMismatch(self.offset)
+            with open(self.part_path, 'ab') as f:
+                while True:
+                    block = stream.read(WRITE_BLOCK_SIZE)
+                    if not block:
+                        break
+                    if self.size is not None and self.offset + len(block) > self.size:
+                        raise ValueError("Yuklanayotgan ma'lumot e'lon qilingan hajmdan katta")
+                    if self.size is None and self.max_size is not None and self.offset + len(block) > self.max_size:
+                        raise ValueError(f"Fayl hajmi juda katta. Maksimal: {self.max_size} bayt")
+                    f.write(block)
+                    f.flush()
+                    self.hasher.update(block)
+                    self.offset += len(block)
+                    with self.growth:
+                        self.growth.notify_all()
+            return self.offset
+
+    def finish(self):
+        """Yuklashni yakunlash: hajmni tekshirish, faylni joyiga ko'chirish va xeshni qaytarish"""
+        with self.lock:
+            if self.complete:
+                return self.content_hash
+            if self.size is not None and self.offset != self.size:
+                raise ValueError(f"Fayl to'liq emas: {self.offset}/{self.size} bayt")
+            os.replace(self.part_path, self.final_path)
+            self.content_hash = self.hasher.hexdigest()
+            self.complete = True
+            os.remove(self.meta_path)
+        with self.growth:
+            self.growth.notify_all()
+        return self.content_hash
+
+    def abort(self):
+        with self.lock:
+            for path in (self.part_path, self.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.complete = True
+        with self.growth:
+            self.growth.notify_all()
+
+    def wait_for_growth(self, known_offset, timeout):
+        with self.growth:
+            return self.growth.wait_for(lambda: self.offset > known_offset or self.complete, timeout)
+
+    def is_streamable(self):
+        if self.extension in STREAMABLE_EXTENSIONS:
+            return True
+        if self.extension in ('mp4', 'mov'):
+            return mp4_is_streamable(self.part_path)
+        return False
+
+    def get_status(self):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'offset': self.offset,
+            'size': self.size,
+            'mode': self.mode,
+            'complete': self.complete,
+            'progress': round(self.offset / self.size, 4) if self.size else None,
+            'sha256': self.content_hash,
+            'stream_started': self.stream_started,
+        }
+
+
+class UploadManager:
+    """Yuklash sessiyalari; tugallanmaganlari .partial papkada saqlanib, keyin davom ettiriladi"""
+
+    def __init__(self, folder, max_size=None):
+        self.folder = folder
+        self.max_size = max_size
+        os.makedirs(os.path.join(folder, '.partial'), exist_ok=True)
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def create(self, filename, size=None, mode='live'):
+        session = UploadSession(self.folder, uuid.uuid4().hex[:16], filename, size=size, mode=mode,
+                                max_size=self.max_size)
+        open(session.part_path, 'wb').close()
+        session.save_meta()
+        with self.lock:
+            self.sessions[session.id] = session
+        return session
+
+    def get(self, upload_id):
+        with self.lock:
+            session = self.sessions.get(upload_id)
+            if session is not None:
+                return session
+            # Server qayta ishga tushgan bo'lsa sessiya diskdan tiklanadi
+            meta_path = os.path.join(self.folder, '.partial', f"{os.path.basename(upload_id)}.json")
+            if not os.path.exists(meta_path):
+                return None
+            with open(meta_path) as f:
+                meta = json.load(f)
+            session = UploadSession(
+                self.folder, meta['id'], meta['filename'], size=meta['size'], mode=meta['mode'],
+                created_at=meta['created_at'], max_size=self.max_size
+            ).restore()
+            self.sessions[session.id] = session
+            return session
+
+    def remove(self, upload_id):
+        with self.lock:
+            return self.sessions.pop(upload_id, None)
+
+
+class GrowingFileCapture:
+    """Hali yuklanayotgan fayldan kadr o'qish: ma'lumot tugasa yangi baytlarni kutib, qayta ochadi"""
+
+    def __init__(self, session, stall_timeout=60.0, poll_interval=0.5):
+        self.session = session
+        # Shuncha vaqt yangi bayt kelmasa fayl tugagan deb hisoblanadi
+        self.stall_timeout = stall_timeout
+        self.poll_interval = poll_interval
+        self.position = 0
+        self.closed = False
+        self.opened_offset = session.offset
+        self.cap = cv2.VideoCapture(session.path)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def reopen(self):
+        self.cap.release()
+        self.opened_offset = self.session.offset
+        self.cap = cv2.VideoCapture(self.session.path)
+        if self.position:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.position)
+
+    def read(self):
+        waited = 0.0
+        while not self.closed:
+            ret, frame = self.cap.read()
+            if ret:
+                self.position += 1
+                return ret, frame
+
+            # Ochilgandan keyin yangi baytlar kelgan bo'lsa qayta ochib, joyidan davom etish
+            if self.session.offset > self.opened_offset:
+                self.reopen()
+                continue
+            if self.session.complete or waited >= self.stall_timeout:
+                return False, None
+            if not self.session.wait_for_growth(self.opened_offset, self.poll_interval):
+                waited += self.poll_interval
+        return False, None
+
+    def release(self):
+        self.closed = True
+        self.cap.release()